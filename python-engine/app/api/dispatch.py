@@ -0,0 +1,455 @@
+import asyncio
+import base64
+import logging
+import os
+import struct
+import tempfile
+from contextvars import ContextVar
+from typing import Literal, Optional
+import numpy as np
+from fastapi import Header, HTTPException, Query, Request
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.engine import OcrEngine, UnknownProfileError
+from app.core.inference import InferencePool, EngineBusyError, InferenceTimeoutError, LANES
+from app.core.metrics import timed
+from app.services import pipelines
+from app.services.image_processing import ImageProcessor
+from app.services.image_cache import ImageCache
+from app.services.result_cache import ResultCache
+from app.services.incremental import FrameDiff, PreviousResults
+from app.services.scroll import ArchiveTooLarge, ScrollTracker, open_frames
+
+logger = logging.getLogger(__name__)
+
+
+def _load_bytes(data):
+    """Hashes the encoded image and decodes it, unless the same bytes are already cached."""
+    if data is None:
+        return None, None
+    handle = ImageCache.content_hash(data)
+    cache = ImageCache.get_instance()
+    img = cache.get(handle)
+    if img is None:
+        img = ImageProcessor.bytes_to_cv2(data)
+        cache.put(handle, img)
+    return img, handle
+
+
+def _load_base64(image_b64: str):
+    return _load_bytes(ImageProcessor.base64_to_bytes(image_b64))
+
+
+async def decode_image(image_b64: str):
+    """
+    Decodes the Base64 payload off the event loop. Raises 400 on invalid input.
+    Returns (img, image_handle).
+    """
+    with timed("decode"):
+        img, handle = await run_in_threadpool(_load_base64, image_b64)
+    if img is None:
+        raise HTTPException(status_code=400, detail="Invalid Image")
+    return img, handle
+
+
+def resolve_handle(handle: str):
+    """Returns the cached screenshot of an image handle. Raises 410 when it expired."""
+    img = ImageCache.get_instance().get(handle)
+    if img is None:
+        raise HTTPException(status_code=410, detail="Image handle expired or unknown, resend the image")
+    return img
+
+
+async def read_upload(request: Request):
+    """
+    Reads a binary image upload without Base64:
+    - raw body (application/octet-stream, image/png, ...), or
+    - multipart/form-data with an `image` file part (+ small text parts, e.g. `regions`).
+    Returns (image_bytes, text_fields).
+    A multipart body may carry an `imageHandle` text part instead of the image,
+    in which case image_bytes is None.
+    """
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        fields = {k: v for k, v in form.items() if isinstance(v, str)}
+        upload = form.get("image")
+        if upload is None or isinstance(upload, str):
+            await form.close()
+            if "imageHandle" in fields:
+                return None, fields
+            raise HTTPException(status_code=400, detail="Missing 'image' file part")
+        data = await upload.read()
+        await form.close()
+    else:
+        data = await request.body()
+        fields = {}
+
+    if not data:
+        raise HTTPException(status_code=400, detail="Empty image body")
+    return data, fields
+
+
+async def decode_bytes(data: bytes):
+    """Decodes an encoded image off the event loop. Raises 400 on invalid input."""
+    with timed("decode"):
+        img, handle = await run_in_threadpool(_load_bytes, data)
+    if img is None:
+        raise HTTPException(status_code=400, detail="Invalid Image")
+    return img, handle
+
+
+async def decode_upload(request: Request):
+    """
+    Reads and decodes a binary upload off the event loop.
+    Returns (img, image_handle, text_fields).
+    """
+    data, fields = await read_upload(request)
+    if data is None:
+        handle = fields["imageHandle"]
+        return resolve_handle(handle), handle, fields
+
+    img, handle = await decode_bytes(data)
+    return img, handle, fields
+
+
+async def iter_frames(request: Request):
+    """
+    Yields the encoded frames of a multi-image upload, as they arrive:
+    - application/octet-stream: frames back to back, each prefixed by its
+      length (4-byte big-endian unsigned int). Sent chunked, the first frame
+      is available before the client has finished uploading the last one.
+    - multipart/form-data: one `image` file part per frame (parsed up front).
+    Raises ValueError on a truncated stream.
+    """
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        try:
+            for upload in form.getlist("image"):
+                if not isinstance(upload, str):
+                    yield await upload.read()
+        finally:
+            await form.close()
+        return
+
+    buf = bytearray()
+    async for chunk in request.stream():
+        buf += chunk
+        while len(buf) >= 4:
+            (size,) = struct.unpack_from(">I", buf)
+            if len(buf) < 4 + size:
+                break
+            frame = bytes(buf[4:4 + size])
+            del buf[:4 + size]
+            if frame:
+                yield frame
+    if buf:
+        raise ValueError(f"Truncated frame stream ({len(buf)} trailing bytes)")
+
+
+async def spool_upload(request: Request, limit_mb: int = None) -> str:
+    """
+    Streams a large upload (screen recording, zip of screenshots) to a temporary file
+    instead of memory: the raw body, or the `file` part of a multipart body.
+    Returns the file path; the caller deletes it. Raises 400 when empty and 413 above
+    `limit_mb` (default SCROLL_MAX_UPLOAD_MB).
+    """
+    limit_mb = limit_mb or settings.SCROLL_MAX_UPLOAD_MB
+    limit = limit_mb * 1024 * 1024
+    fd, path = tempfile.mkstemp(prefix="rok_upload_")
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as f:
+            content_type = request.headers.get("content-type", "")
+            if content_type.startswith("multipart/form-data"):
+                form = await request.form()
+                try:
+                    upload = form.get("file")
+                    if upload is None or isinstance(upload, str):
+                        raise HTTPException(status_code=400, detail="Missing 'file' part")
+                    while chunk := await upload.read(1024 * 1024):
+                        size += len(chunk)
+                        if size > limit:
+                            break
+                        f.write(chunk)
+                finally:
+                    await form.close()
+            else:
+                async for chunk in request.stream():
+                    size += len(chunk)
+                    if size > limit:
+                        break
+                    f.write(chunk)
+        if size > limit:
+            raise HTTPException(status_code=413, detail=f"Upload above {limit_mb}MB")
+        if size == 0:
+            raise HTTPException(status_code=400, detail="Empty upload")
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path
+
+
+# (lane, client deadline) of the current request, set by the `priority` dependency
+_priority = ContextVar("rok_priority", default=("interactive", None))
+
+
+def priority(lane: str):
+    """
+    Route dependency: the request's OCR jobs go to the `lane` priority lane, unless
+    the client asks for another one with `X-Priority`. `X-Request-Deadline` (Unix time,
+    seconds) is when the client stops waiting: jobs still queued then are dropped (504).
+    """
+    async def dependency(x_priority: Optional[str] = Header(None),
+                         x_request_deadline: Optional[float] = Header(None)):
+        chosen = x_priority or lane
+        if chosen not in LANES:
+            raise HTTPException(status_code=400, detail=f"Unknown priority '{chosen}' (available: {', '.join(LANES)})")
+        set_priority(chosen, x_request_deadline)
+    return dependency
+
+
+def set_priority(lane: str, deadline: float = None):
+    """Lane (and deadline) of the OCR jobs submitted from the current task and the tasks it starts."""
+    _priority.set((lane, deadline))
+
+
+class BlockFormat:
+    """
+    Route dependency: layout of the `blocks` of a response, from the query string.
+      - format=json (default): a list of {"text", "box", "conf", ...} objects;
+      - format=columnar: one list per field ({"text": [...], "conf": [...], ...}) and
+        `box` as ONE flat integer list (8 values per block, 4 with boxes=rect);
+      - format=packed: columnar, with `box` as base64 little-endian int32 and `conf`
+        as base64 little-endian float32.
+    boxes=rect turns every 4-point quad into its enclosing [x_min, y_min, x_max, y_max].
+    Results are cached and remembered in the default layout; only the response changes.
+    """
+
+    def __init__(self, format: Literal["json", "columnar", "packed"] = Query("json"),
+                 boxes: Literal["quad", "rect"] = Query("quad")):
+        self.format = format
+        self.boxes = boxes
+
+    def apply(self, result: dict) -> dict:
+        blocks = result.get("blocks")
+        if (self.format == "json" and self.boxes == "quad") or not isinstance(blocks, list):
+            return result
+
+        # Every box in one array: one op to rescale, round or reduce them all
+        quads = np.asarray([b["box"] for b in blocks], dtype=np.float64).reshape(-1, 4, 2)
+        if self.boxes == "rect":
+            boxes = np.concatenate([np.floor(quads.min(axis=1)), np.ceil(quads.max(axis=1))], axis=1)
+        else:
+            boxes = np.rint(quads).reshape(-1, 8)
+        boxes = boxes.astype("<i4")
+
+        if self.format == "json":
+            blocks = [dict(b, box=box) for b, box in zip(blocks, boxes.tolist())]
+            return dict(result, blocks=blocks)
+
+        columns = {}
+        for i, block in enumerate(blocks):
+            for key, value in block.items():
+                if key != "box":
+                    columns.setdefault(key, [None] * len(blocks))[i] = value
+        if self.format == "packed":
+            columns["box"] = base64.b64encode(boxes.tobytes()).decode("ascii")
+            if "conf" in columns:
+                conf = np.asarray(columns["conf"], dtype="<f4")
+                columns["conf"] = base64.b64encode(conf.tobytes()).decode("ascii")
+        else:
+            columns["box"] = boxes.ravel().tolist()
+            if "conf" in columns:
+                columns["conf"] = [float(c) for c in columns["conf"]]
+        return dict(result, blocks=columns, block_format={"format": self.format, "boxes": self.boxes,
+                                                          "count": len(blocks)})
+
+
+def resolve_profile(profile: str = None, detection: bool = True) -> str:
+    """
+    Validates the engine profile picked by a request (None = "default").
+    Raises 400 for an unknown profile and 422 for a recognition-only profile
+    where the pipeline needs text detection.
+    """
+    profile = profile or "default"
+    try:
+        spec = OcrEngine.profile(profile)
+    except UnknownProfileError as e:
+        raise HTTPException(status_code=400, detail=e.args[0])
+    if detection and spec.get("rec_only"):
+        raise HTTPException(status_code=422, detail=f"Engine profile '{profile}' is recognition-only")
+    return profile
+
+
+async def run_inference(fn, *args, profile: str = "default", units: int = 0):
+    """
+    Runs a pipeline on the inference pool, in the request's priority lane, and maps
+    pool errors to HTTP: full lane -> 503 + Retry-After, timeout or client deadline
+    -> 504, pipeline failure -> 500. `units` > 0 lets the pool coalesce the job.
+    """
+    pool = InferencePool.get_instance()
+    lane, deadline = _priority.get()
+    try:
+        return await pool.submit(fn, *args, profile=profile, lane=lane, deadline=deadline, units=units)
+    except EngineBusyError as e:
+        logger.warning(f"⏳ Queue full ({pool.queue_depth} waiting), rejecting {fn.__name__} ({lane})")
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except InferenceTimeoutError as e:
+        logger.warning(f"⌛ {e} ({fn.__name__})")
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        logger.error(f"🔥 {fn.__name__.capitalize()} Processing Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+async def cached_inference(route: str, params: dict, img, handle: str, fn, *args, is_valid=None,
+                           profile: str = "default", units: int = 0):
+    """
+    run_inference behind the optional result cache: a repeated screenshot with the
+    same pipeline parameters (and engine profile) is answered from the cache without
+    touching the pool.
+    Pipelines returning (result, arrays...) only get `result` cached: a hit returns
+    the bare dict, a fresh run the whole tuple.
+    """
+    cache = ResultCache.get_instance()
+    if not cache.enabled:
+        return await run_inference(fn, img, *args, profile=profile, units=units)
+
+    if profile != "default":
+        params = dict(params, profile=profile)
+    key = await run_in_threadpool(cache.make_key, route, img, handle, params)
+    result = await run_in_threadpool(cache.get, key, is_valid, img, handle)
+    if result is not None:
+        return result
+
+    result = await run_inference(fn, img, *args, profile=profile, units=units)
+    await run_in_threadpool(cache.put, key, result[0] if isinstance(result, tuple) else result, handle)
+    return result
+
+
+# Screens clients poll (profile before/after, AP bar...): how their full_text is joined
+_POLLED = {"governor": "\n", "inventory": " | "}
+
+
+async def screen_inference(route: str, img, handle: str, fn, previous: str = None, profile: str = "default"):
+    """
+    cached_inference for the polled screens (governor, inventory), with an incremental
+    mode: given the image handle of a previous capture of the same screen, only the
+    tiles that changed since (FrameDiff) are read again; the other blocks are reused.
+    Blocks of an incremental response carry `fresh` (true = read by this request) and
+    the response an `incremental` summary. Falls back to a full analysis when the
+    previous capture expired, is not comparable, or most of the screen changed.
+    """
+    store = PreviousResults.get_instance()
+    summary = None
+    if previous:
+        summary = {"previous": previous}
+        prev_img = ImageCache.get_instance().get(previous)
+        prev_blocks = store.get(route, profile, previous)
+        if prev_img is None or prev_blocks is None:
+            summary["fallback"] = "previous image expired or unknown"
+        else:
+            with timed("frame_diff"):
+                diff = await run_in_threadpool(FrameDiff.compare, prev_img, img)
+            if diff is None:
+                summary["fallback"] = "frames not comparable"
+            elif diff.share > settings.INCREMENTAL_MAX_CHANGED:
+                summary["fallback"] = f"{diff.share:.0%} of the screen changed"
+            else:
+                reused, stale = diff.split(prev_blocks)
+                regions = diff.regions(img.shape, stale)
+                fresh = await run_inference(pipelines.incremental, img, regions, route, profile=profile) if regions else []
+                blocks = FrameDiff.merge(reused, fresh)
+                store.put(route, profile, handle, blocks)
+                summary.update(changed_tiles=int(diff.changed.sum()), tiles=int(diff.changed.size),
+                               shift=[diff.dx, diff.dy], reused=len(blocks) - len(fresh), fresh=len(fresh))
+                result = {
+                    "success": True,
+                    "full_text": _POLLED[route].join(b["text"] for b in blocks),
+                    "blocks": blocks,
+                    "incremental": summary,
+                }
+                if route == "governor":
+                    result["mode"] = "incremental"
+                return result
+
+    result = await cached_inference(route, pipelines.PARAMS[route], img, handle, fn, profile=profile)
+    store.put(route, profile, handle, result["blocks"])
+    if summary is not None:
+        result["blocks"] = [dict(b, fresh=True) for b in result["blocks"]]
+        result["incremental"] = summary
+    return result
+
+
+def _next_keyframes(frames, tracker: ScrollTracker, max_frames: int):
+    """
+    Decodes frames until the tracker picks some. Returns [(keyframe, img), ...], [] at the
+    end of the capture; once `max_frames` were read, no other frame is decoded.
+    """
+    while tracker.frames < max_frames:
+        item = next(frames, None)
+        if item is None:
+            break
+        picked = tracker.feed(*item)
+        if picked:
+            return picked
+    return tracker.finish()
+
+
+def _hold_frame(img):
+    """Keyframes get an image handle too (Magnifier rescans via /batch/process)."""
+    handle = ImageCache.content_hash(img)
+    ImageCache.get_instance().put(handle, img)
+    return handle
+
+
+async def scroll_inference(path: str, route: str, fn, profile: str, sample_fps: float):
+    """
+    Reads a scroll capture (screen recording or zip of screenshots, see open_frames):
+    only the keyframes ScrollTracker picks are analyzed by `fn` (cached_inference of
+    `route`). Returns (keyframes, results, frames decoded); the caller merges the results.
+    A failed keyframe carries `success: false`, `status` and `error`, and an empty result.
+    """
+    frames = open_frames(path, sample_fps, (settings.SCROLL_MAX_UPLOAD_MB * 1024 * 1024,
+                                            settings.SCROLL_MAX_IMAGE_MB * 1024 * 1024))
+    tracker = ScrollTracker()
+    # Keyframes in flight: decoding and picking go on while the workers read the last ones
+    window = asyncio.Semaphore(InferencePool.get_instance().workers + 1)
+    keyframes, tasks = [], []
+
+    async def run(keyframe, img):
+        try:
+            handle = await run_in_threadpool(_hold_frame, img)
+            result = await cached_inference(route, pipelines.PARAMS[route], img, handle, fn, profile=profile)
+            keyframe["image_handle"] = handle
+            return result
+        except HTTPException as e:
+            keyframe.update(success=False, status=e.status_code, error=e.detail)
+            return {"blocks": []}
+        finally:
+            window.release()
+
+    try:
+        while True:
+            with timed("scroll_select"):
+                try:
+                    picked = await run_in_threadpool(_next_keyframes, frames, tracker, settings.SCROLL_MAX_FRAMES)
+                except ArchiveTooLarge as e:
+                    raise HTTPException(status_code=413, detail=str(e))
+                except ValueError as e:
+                    raise HTTPException(status_code=400, detail=str(e))
+            if not picked:
+                break
+            for keyframe, img in picked:
+                await window.acquire()
+                keyframes.append(keyframe)
+                tasks.append(asyncio.create_task(run(keyframe, img)))
+        results = await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        frames.close()
+    return keyframes, results, tracker.frames
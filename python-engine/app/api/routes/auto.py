@@ -0,0 +1,50 @@
+from fastapi import APIRouter, BackgroundTasks, Depends, Request
+from starlette.concurrency import run_in_threadpool
+
+from app.schemas.requests import ReportRequest
+from app.services import pipelines
+from app.services.classifier import ScreenClassifier
+from app.core.metrics import timed
+from app.api.dispatch import decode_image, decode_upload, screen_inference, resolve_profile, BlockFormat
+from app.api.routes import reports
+
+router = APIRouter()
+
+async def _analyze(img, handle, save: bool, background_tasks: BackgroundTasks, profile: str):
+    # Classification is a few ms on a thumbnail: no OCR pass is spent on guessing
+    with timed("classify"):
+        classification = await run_in_threadpool(ScreenClassifier.classify, img)
+
+    kind = classification["type"]
+    if kind == "report":
+        result = await reports.analyze_frame(img, handle, save, background_tasks, profile)
+    else:
+        fn = pipelines.governor if kind == "governor" else pipelines.inventory
+        # Remembered like the dedicated routes: a later capture can name this one as previousHandle
+        result = await screen_inference(kind, img, handle, fn, profile=profile)
+
+    result["image_handle"] = handle
+    result["classification"] = classification
+    return result
+
+
+@router.post("/analyze")
+async def analyze_auto(request: ReportRequest, background_tasks: BackgroundTasks, fmt: BlockFormat = Depends()):
+    """
+    Detects the screenshot type (report, governor profile or generic UI / inventory)
+    and runs the matching pipeline. The response is that pipeline's response plus
+    `classification` ({"type", "confidence", "features"}).
+    `saveProcessedImage` only applies when the frame is a report.
+    """
+    profile = resolve_profile(request.profile)
+    img, handle = await decode_image(request.imageBase64)
+    return fmt.apply(await _analyze(img, handle, request.saveProcessedImage, background_tasks, profile))
+
+
+@router.post("/analyze/raw")
+async def analyze_auto_raw(request: Request, background_tasks: BackgroundTasks, saveProcessedImage: bool = True,
+                           profile: str = None, fmt: BlockFormat = Depends()):
+    """Same as /analyze, but the screenshot is sent as raw bytes or multipart (no Base64)."""
+    profile = resolve_profile(profile)
+    img, handle, _ = await decode_upload(request)
+    return fmt.apply(await _analyze(img, handle, saveProcessedImage, background_tasks, profile))
@@ -1,54 +1,73 @@
-from fastapi import APIRouter, HTTPException
-from app.schemas.requests import BatchAnalyzeRequest
-from app.services.image_processing import ImageProcessor
-from app.core.engine import OcrEngine
+from fastapi import APIRouter, HTTPException, Request
+from pydantic import TypeAdapter, ValidationError
+from typing import List
+from app.schemas.requests import BatchAnalyzeRequest, CropRegion
+from app.services import pipelines
+from app.api.dispatch import decode_image, decode_upload, resolve_handle, cached_inference, resolve_profile
+import asyncio
 import logging
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+_regions_adapter = TypeAdapter(List[CropRegion])
+
+async def _run_batch(full_img, handle, regions, profile=None):
+    # Regions are grouped by engine profile: one job per profile, run concurrently
+    groups = {}
+    for idx, region in enumerate(regions):
+        if region.digits:
+            # Digit regions default to the whitelisted recognizer and never need a detector
+            region_profile = resolve_profile(region.profile or "digits", detection=False)
+        else:
+            region_profile = resolve_profile(region.profile or profile, detection=region.det)
+        groups.setdefault(region_profile, []).append(idx)
+
+    async def run_group(group_profile, indices):
+        group = [regions[i] for i in indices]
+        # Region ids are client-side labels: they stay out of the cache key and are re-applied
+        params = dict(pipelines.PARAMS["batch"], regions=[[r.box, r.strategy, r.det, r.digits] for r in group])
+        # Small groups may share a recognition pass with other queued Magnifier calls
+        return await cached_inference("batch", params, full_img, handle, pipelines.batch, group,
+                                      profile=group_profile, units=len(group))
+
+    outputs = await asyncio.gather(*(run_group(p, indices) for p, indices in groups.items()))
+
+    results = [None] * len(regions)
+    for indices, output in zip(groups.values(), outputs):
+        for idx, item in zip(indices, output["results"]):
+            results[idx] = dict(item, id=regions[idx].id)
+    return {"success": True, "results": results}
+
 @router.post("/process")
 async def process_batch(request: BatchAnalyzeRequest):
-    # 1. Decode Full Image once
-    full_img = ImageProcessor.base64_to_cv2(request.imageBase64)
-    if full_img is None:
-        raise HTTPException(status_code=400, detail="Invalid Image")
-
-    ocr = OcrEngine.get_instance()
-    results = []
-
-    for region in request.regions:
-        x, y, w, h = region.box
-        
-        # Crop & Filter
-        processed_crop = ImageProcessor.process_region(
-            full_img, int(x), int(y), int(w), int(h), region.strategy
-        )
-
-        if processed_crop is None:
-            results.append({"id": region.id, "text": "", "conf": 0.0, "strategy": region.strategy})
-            continue
-
-        # --- CRITICAL CHANGE: det=True ---
-        # We enable detection so it finds the "lost" number inside the crop
-        ocr_res = ocr.ocr(processed_crop, cls=False, det=True)
-
-        text = ""
-        conf = 0.0
-        
-        # The format with det=True is: [[ [box], (text, conf) ], ... ]
-        if ocr_res and ocr_res[0]:
-            # We take the block with the highest confidence or concatenate if more than one.
-            # For XP, it is usually a single number. We take the best candidate.
-            best_line = max(ocr_res[0], key=lambda x: x[1][1])
-            text = best_line[1][0]
-            conf = float(best_line[1][1])
-
-        results.append({
-            "id": region.id,
-            "text": text,
-            "conf": conf,
-            "strategy": region.strategy
-        })
-
-    return {"success": True, "results": results}
\ No newline at end of file
+    # 1. Decode Full Image once (or reuse the screenshot decoded by the analyze call)
+    if request.imageHandle:
+        full_img, handle = resolve_handle(request.imageHandle), request.imageHandle
+    else:
+        full_img, handle = await decode_image(request.imageBase64)
+
+    # 2. Crop, Filter and OCR every region on a single worker (one per engine profile)
+    result = await _run_batch(full_img, handle, request.regions, request.profile)
+    result["image_handle"] = handle
+    return result
+
+@router.post("/process/raw")
+async def process_batch_raw(request: Request):
+    """
+    Same as /process without Base64: multipart/form-data with an `image` file part
+    (or an `imageHandle` text part), a `regions` text part holding the JSON region list
+    and an optional `profile` text part.
+    """
+    full_img, handle, fields = await decode_upload(request)
+
+    if "regions" not in fields:
+        raise HTTPException(status_code=400, detail="Missing 'regions' part")
+    try:
+        regions = _regions_adapter.validate_json(fields["regions"])
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False))
+
+    result = await _run_batch(full_img, handle, regions, fields.get("profile"))
+    result["image_handle"] = handle
+    return result
@@ -1,42 +1,30 @@
-from fastapi import APIRouter, HTTPException
-from app.schemas.requests import OcrRequest
-from app.services.image_processing import ImageProcessor
-from app.core.engine import OcrEngine
+from fastapi import APIRouter, Depends, Request
+from app.schemas.requests import ScreenRequest
+from app.services import pipelines
+from app.api.dispatch import decode_image, decode_upload, screen_inference, resolve_profile, BlockFormat
 
 router = APIRouter()
 
 @router.post("/analyze")
-async def analyze_governor(request: OcrRequest):
-    img = ImageProcessor.base64_to_cv2(request.imageBase64)
-    if img is None:
-        raise HTTPException(status_code=400, detail="Invalid Image")
+async def analyze_governor(request: ScreenRequest, fmt: BlockFormat = Depends()):
+    profile = resolve_profile(request.profile)
+    img, handle = await decode_image(request.imageBase64)
+    result = await screen_inference("governor", img, handle, pipelines.governor, request.previousHandle,
+                                    profile=profile)
+    # Handle of the decoded screenshot: /batch/process accepts it instead of a re-upload
+    result["image_handle"] = handle
+    return fmt.apply(result)
 
-    # Resize otimiza muito o tempo de inferência do Paddle
-    img_resized, ratio = ImageProcessor.resize_if_needed(img, max_width=1280)
 
-    ocr = OcrEngine.get_instance()
-    result = ocr.ocr(img_resized, cls=False)
-    
-    blocks = []
-    full_text = []
-
-    if result and result[0]:
-        for line in result[0]:
-            # Recupera as coordenadas originais multiplicando pelo ratio
-            # Isso é opcional, mas bom se o C# desenhar caixas na imagem original
-            box = line[0]
-            if ratio != 1.0:
-                 box = [[pt[0]/ratio, pt[1]/ratio] for pt in box]
-
-            blocks.append({
-                "text": line[1][0],
-                "box": box,
-                "conf": line[1][1]
-            })
-            full_text.append(line[1][0])
-
-    return {
-        "success": True,
-        "full_text": "\n".join(full_text),
-        "blocks": blocks
-    }
\ No newline at end of file
+@router.post("/analyze/raw")
+async def analyze_governor_raw(request: Request, profile: str = None, previous: str = None,
+                               fmt: BlockFormat = Depends()):
+    """
+    Same as /analyze, but the screenshot is sent as raw bytes or multipart (no Base64).
+    `previous` = previousHandle.
+    """
+    profile = resolve_profile(profile)
+    img, handle, _ = await decode_upload(request)
+    result = await screen_inference("governor", img, handle, pipelines.governor, previous, profile=profile)
+    result["image_handle"] = handle
+    return fmt.apply(result)
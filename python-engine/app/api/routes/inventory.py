@@ -1,94 +1,160 @@
-from fastapi import APIRouter, HTTPException
-from app.schemas.requests import OcrRequest
-from app.services.image_processing import ImageProcessor
-from app.core.engine import OcrEngine
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from starlette.requests import ClientDisconnect
+from app.schemas.requests import ScreenRequest
+from app.services import pipelines
+from app.services.scroll import ScrollTracker
+from app.core.config import settings
+from app.core.inference import InferencePool
+from app.core.metrics import timed
+from app.api.dispatch import (decode_image, decode_upload, decode_bytes, iter_frames, spool_upload,
+                              cached_inference, screen_inference, scroll_inference, resolve_profile, priority,
+                              BlockFormat)
+import asyncio
+import json
 import logging
-import numpy as np
+import os
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 @router.post("/analyze")
-async def analyze_inventory_ui(request: OcrRequest):
+async def analyze_inventory_ui(request: ScreenRequest, fmt: BlockFormat = Depends()):
     """
     Route specialized for User Interfaces (Inventory, Ranking, Chat).
     Optimized for reading small numbers on complex backgrounds.
     """
-    img = ImageProcessor.base64_to_cv2(request.imageBase64)
-    if img is None:
-        raise HTTPException(status_code=400, detail="Invalid Image")
+    profile = resolve_profile(request.profile)
+    img, handle = await decode_image(request.imageBase64)
+    result = await screen_inference("inventory", img, handle, pipelines.inventory, request.previousHandle,
+                                    profile=profile)
+    result["image_handle"] = handle
+    return fmt.apply(result)
 
+
+@router.post("/analyze/raw")
+async def analyze_inventory_ui_raw(request: Request, profile: str = None, previous: str = None,
+                                   fmt: BlockFormat = Depends()):
+    """
+    Same as /analyze, but the screenshot is sent as raw bytes or multipart (no Base64).
+    `previous` = previousHandle.
+    """
+    profile = resolve_profile(profile)
+    img, handle, _ = await decode_upload(request)
+    result = await screen_inference("inventory", img, handle, pipelines.inventory, previous, profile=profile)
+    result["image_handle"] = handle
+    return fmt.apply(result)
+
+
+class _SessionResponse(StreamingResponse):
+    """
+    StreamingResponse that does not listen for disconnects on `receive`:
+    the session is still reading frames from the request body while it answers,
+    and the base class would swallow them. A gone client surfaces on `send` instead.
+    """
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
+
+
+async def _analyze_frame(index: int, data: bytes, profile: str, fmt: BlockFormat):
+    try:
+        img, handle = await decode_bytes(data)
+        result = await cached_inference("inventory", pipelines.PARAMS["inventory"], img, handle, pipelines.inventory,
+                                        profile=profile)
+        result = fmt.apply(dict(result, image_handle=handle))
+    except HTTPException as e:
+        result = {"success": False, "status": e.status_code, "error": e.detail}
+    return {"frame": index, **result}
+
+
+async def _session_events(request: Request, profile: str, fmt: BlockFormat):
+    # Frames in flight: enough to decode frame N+1 while the workers run frame N,
+    # without flooding the shared queue with a long scroll session
+    window = asyncio.Semaphore(InferencePool.get_instance().workers + 1)
+    done = asyncio.Queue()
+    tasks = []
+
+    async def run(index, data):
+        try:
+            await done.put(await _analyze_frame(index, data, profile, fmt))
+        finally:
+            window.release()
+
+    async def feed():
+        summary = {"done": True, "frames": 0}
+        try:
+            async for data in iter_frames(request):
+                await window.acquire()
+                tasks.append(asyncio.create_task(run(summary["frames"], data)))
+                summary["frames"] += 1
+        except (ValueError, ClientDisconnect) as e:
+            summary["error"] = str(e) or "Client disconnected"
+        await asyncio.gather(*tasks)
+        await done.put(None)
+        return summary
+
+    feeder = asyncio.create_task(feed())
+    try:
+        while (event := await done.get()) is not None:
+            yield json.dumps(event) + "\n"
+        yield json.dumps(await feeder) + "\n"
+    finally:
+        # Client went away: drop the frames that have not been processed yet
+        feeder.cancel()
+        for task in tasks:
+            task.cancel()
+
+
+# Multi-frame captures queue many jobs at once: bulk lane unless the client says otherwise
+@router.post("/session", dependencies=[Depends(priority("bulk"))])
+async def analyze_inventory_session(request: Request, profile: str = None, fmt: BlockFormat = Depends()):
+    """
+    Scroll session: every inventory screenshot of a multi-screenshot merge in ONE request.
+    Frames are decoded and analyzed in a pipeline (decode of frame N+1 overlaps OCR of frame N)
+    and each result is streamed back as an NDJSON line as soon as it is ready:
+      {"frame": 0, "success": true, "blocks": [...], ...}
+    Lines follow completion order (use `frame` to re-order); failed frames carry
+    `success: false`, `status` and `error`. The last line is {"done": true, "frames": N}.
+    Body: length-prefixed frames (application/octet-stream) or multipart with repeated `image` parts.
+    """
+    profile = resolve_profile(profile)
+    return _SessionResponse(_session_events(request, profile, fmt), media_type="application/x-ndjson")
+
+
+async def _scroll(path: str, profile: str, sample_fps: float):
+    keyframes, results, frames = await scroll_inference(path, "inventory", pipelines.inventory, profile, sample_fps)
+    with timed("scroll_merge"):
+        blocks = ScrollTracker.merge(keyframes, results)
+    return {
+        "success": True,
+        "frames": frames,
+        "truncated": frames >= settings.SCROLL_MAX_FRAMES,
+        "keyframes": keyframes,
+        "full_text": " | ".join(b["text"] for b in blocks),
+        "blocks": blocks,
+    }
+
+
+@router.post("/scroll", dependencies=[Depends(priority("bulk"))])
+async def analyze_inventory_scroll(request: Request, profile: str = None, sample_fps: float = None,
+                                   fmt: BlockFormat = Depends()):
+    """
+    Scroll capture: a screen recording (mp4, webm, mkv...) or a zip of screenshots
+    of a scrolling inventory / list, as the raw body or a multipart `file` part.
+    Frames are decoded one at a time; only the frames that scrolled in new content
+    (keyframes) are analyzed, and their lines merged with the rows seen twice removed.
+    Response: `keyframes` [{"frame", "offset", "segment", "band", "image_handle"}] and
+    `blocks` like /analyze plus `frame`, `segment` and `area` ("scroll" | "static").
+    Boxes of scrolled content are in content coordinates (frame y + keyframe offset).
+    Video frames are compared at `sample_fps` (default SCROLL_SAMPLE_FPS).
+    """
+    profile = resolve_profile(profile)
+    path = await spool_upload(request)
     try:
-        # 1. Smart Resize (1920px is mandatory for small numbers)
-        img_resized, ratio = ImageProcessor.resize_if_needed(img, max_width=1920)
-
-        # 2. CHANGE 1: Sharpen Filter ENABLED
-        # This helps highlight the white outline of numbers against the colorful background
-        img_final = ImageProcessor.apply_filters(img_resized)
-        if img_final is None:
-            img_final = img_resized # Fallback if error occurs
-
-        # 3. OCR Engine
-        ocr = OcrEngine.get_instance()
-        result = ocr.ocr(img_final, cls=False)
-        
-        blocks = []
-        full_text = []
-
-        if result and result[0]:
-            h_img, w_img = img_final.shape[:2]
-
-            for line in result[0]:
-                text = line[1][0]
-                conf = line[1][1]
-                
-                # 3. CHANGE 2: Drastically reduced minimum confidence
-                # Small numbers on icons often have low confidence (e.g., 0.15).
-                # Lowered to 0.05 to ensure we capture the data.
-                # C# will filter the noise via Regex.
-                if conf < 0.05: 
-                    continue
-
-                box = line[0] 
-                
-                # --- COLOR DETECTION ---
-                xs = [pt[0] for pt in box]
-                ys = [pt[1] for pt in box]
-                x_min, x_max = int(min(xs)), int(max(xs))
-                y_min, y_max = int(min(ys)), int(max(ys))
-
-                # 25px Padding (Kept per previous adjustment)
-                padding = 25 
-                y_min_p = max(0, y_min - padding)
-                y_max_p = min(h_img, y_max + padding)
-                x_min_p = max(0, x_min - padding)
-                x_max_p = min(w_img, x_max + padding)
-
-                crop = img_final[y_min_p:y_max_p, x_min_p:x_max_p]
-                
-                # Detect color in crop (now with sharpen filter applied, which may slightly 
-                # alter color, but HSV dominant logic usually holds up)
-                color_tag = ImageProcessor.detect_dominant_color(crop)
-                # ---------------------
-
-                # Revert coordinates if resized
-                if ratio != 1.0:
-                     box = [[pt[0]/ratio, pt[1]/ratio] for pt in box]
-
-                blocks.append({
-                    "text": text,
-                    "box": box,
-                    "conf": conf,
-                    "color": color_tag
-                })
-                full_text.append(text)
-
-        return {
-            "success": True,
-            "full_text": " | ".join(full_text),
-            "blocks": blocks
-        }
-
-    except Exception as e:
-        logger.error(f"Inventory Processing Error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        return fmt.apply(await _scroll(path, profile, sample_fps or settings.SCROLL_SAMPLE_FPS))
+    finally:
+        os.unlink(path)
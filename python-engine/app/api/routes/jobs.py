@@ -0,0 +1,298 @@
+from typing import Literal
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Path, Query, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from app.services import pipelines
+from app.services.image_cache import ImageCache
+from app.services.image_processing import ImageProcessor
+from app.services.jobs import JOB_ID, JobStore
+from app.core.config import settings
+from app.core.inference import InferencePool
+from app.api.dispatch import spool_upload, cached_inference, resolve_profile, set_priority
+from app.api.routes import reports
+import asyncio
+import json
+import logging
+import os
+import zipfile
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+def _decode(path: str):
+    with open(path, "rb") as f:
+        data = f.read()
+    # Not kept in the image cache: a job's frames are read once, and would push out the interactive ones
+    return ImageProcessor.bytes_to_cv2(data), ImageCache.content_hash(data)
+
+
+async def _report(img, handle, profile: str, options: dict):
+    tasks = BackgroundTasks()
+    # Like the source images, processed ones stay out of the image cache (interactive handles would expire)
+    result = await reports.analyze_frame(img, handle, options.get("saveProcessedImage", True), tasks, profile,
+                                         hold=False)
+    await tasks()  # The processed image is on the shared volume before the item counts as done
+    return result
+
+
+async def _screen(route: str, fn, img, handle, profile: str):
+    return await cached_inference(route, pipelines.PARAMS[route], img, handle, fn, profile=profile)
+
+
+KINDS = {
+    "report": _report,
+    "governor": lambda img, handle, profile, options: _screen("governor", pipelines.governor, img, handle, profile),
+    "inventory": lambda img, handle, profile, options: _screen("inventory", pipelines.inventory, img, handle, profile),
+    "ranking": lambda img, handle, profile, options: _screen("ranking", pipelines.ranking, img, handle, profile),
+}
+
+
+class JobRunner:
+    """
+    Reads the pending items of the job store in the background, oldest job first, in
+    the bulk lane: interactive requests keep their weighted turns on the workers.
+    Up to workers + 1 items are in flight, so the next image is decoded while the
+    workers run the current ones and no worker waits for the runner.
+    A full bulk lane (503) puts the item back and pauses the runner for Retry-After.
+    """
+    _instance = None
+    CLEANUP_EVERY = 600  # Seconds between two TTL sweeps of the finished jobs
+
+    def __init__(self):
+        self._task = None
+        self._inflight = set()
+        self._wake = None
+        self._changed = None
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def start(self):
+        store = JobStore.get_instance()
+        store.requeue()
+        self._wake, self._changed = asyncio.Event(), asyncio.Event()
+        self._task = asyncio.create_task(self._run(store))
+        pending = store.pending()
+        if pending:
+            logger.info(f"📦 Resuming {pending} pending job item(s)")
+
+    async def stop(self):
+        tasks = [self._task, *self._inflight] if self._task else []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+        self._inflight.clear()
+
+    def wake(self):
+        if self._wake is not None:
+            self._wake.set()
+
+    def changed(self) -> asyncio.Event:
+        """Set on the next finished item (of any job)."""
+        return self._changed
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def _run(self, store: JobStore):
+        set_priority("bulk")
+        window = asyncio.Semaphore(InferencePool.get_instance().workers + 1)
+        swept = 0.0
+        while True:
+            loop_time = asyncio.get_running_loop().time()
+            if loop_time - swept > self.CLEANUP_EVERY:
+                await run_in_threadpool(store.cleanup)
+                swept = loop_time
+
+            await window.acquire()
+            self._wake.clear()  # Before the claim: a submission from here on is not missed
+            item = await run_in_threadpool(store.claim)
+            if item is None:
+                window.release()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=self.CLEANUP_EVERY)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            task = asyncio.create_task(self._process(store, item, window))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _process(self, store: JobStore, item: dict, window: asyncio.Semaphore):
+        job_id, idx = item["job_id"], item["idx"]
+        try:
+            try:
+                img, handle = await run_in_threadpool(_decode, item["path"])
+                if img is None:
+                    raise HTTPException(status_code=400, detail="Invalid Image")
+                result = await KINDS[item["kind"]](img, handle, item["profile"], item["options"])
+                result = dict(result, image_handle=handle)
+                ok = True
+            except HTTPException as e:
+                if e.status_code == 503:
+                    await asyncio.sleep(settings.OCR_RETRY_AFTER)
+                    await run_in_threadpool(store.release, job_id, idx)
+                    self.wake()
+                    return
+                result, ok = {"success": False, "status": e.status_code, "error": e.detail}, False
+            except Exception as e:
+                logger.error(f"🔥 Job {job_id} item {idx}: {e}")
+                result, ok = {"success": False, "status": 500, "error": str(e)}, False
+            await run_in_threadpool(store.finish, job_id, idx, result, ok)
+            self._notify()
+        finally:
+            window.release()
+
+
+def _store() -> JobStore:
+    try:
+        return JobStore.get_instance()
+    except Exception as e:
+        logger.error(f"🔥 Job store unavailable: {e}")
+        raise HTTPException(status_code=503, detail="Bulk jobs unavailable (job store cannot be opened)")
+
+
+async def _get_job(store: JobStore, job_id: str) -> dict:
+    job = await run_in_threadpool(store.get, job_id)
+    if job is None or job["status"] == "staging":
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return job
+
+
+def _max_unzipped():
+    """(total, per image) bytes an archive may expand to: a zip bomb is refused before anything is written."""
+    return settings.JOBS_MAX_UPLOAD_MB * 1024 * 1024, settings.JOBS_MAX_IMAGE_MB * 1024 * 1024
+
+
+async def _stage_upload(request: Request, store: JobStore, job_id: str) -> int:
+    """Writes the uploaded images to the job's staging folder. Returns their number."""
+    count = 0
+    try:
+        content_type = request.headers.get("content-type", "")
+        if content_type.startswith("multipart/form-data"):
+            form = await request.form(max_files=settings.JOBS_MAX_ITEMS + 100)
+            try:
+                for key, upload in form.multi_items():
+                    if isinstance(upload, str):
+                        continue
+                    if key == "image":
+                        if count >= settings.JOBS_MAX_ITEMS:
+                            raise ValueError(f"More than {settings.JOBS_MAX_ITEMS} images")
+                        await run_in_threadpool(store.stage_file, job_id, count, upload.filename or "", upload.file)
+                        count += 1
+                    elif key == "file":
+                        count += await run_in_threadpool(store.stage_archive, job_id, upload.file, count,
+                                                         settings.JOBS_MAX_ITEMS, _max_unzipped())
+            finally:
+                await form.close()
+        else:
+            path = await spool_upload(request, settings.JOBS_MAX_UPLOAD_MB)
+            try:
+                count = await run_in_threadpool(store.stage_archive, job_id, path, 0, settings.JOBS_MAX_ITEMS,
+                                                _max_unzipped())
+            finally:
+                os.unlink(path)
+    except zipfile.BadZipFile:
+        raise HTTPException(status_code=400, detail="Expected a zip archive (or multipart `image` / `file` parts)")
+    except ValueError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    if count == 0:
+        raise HTTPException(status_code=400, detail="No images in the upload")
+    return count
+
+
+@router.post("", status_code=202)
+async def submit_job(request: Request, kind: Literal["report", "governor", "inventory", "ranking"] = "report",
+                     profile: str = None, saveProcessedImage: bool = True):
+    """
+    Bulk analysis: many screenshots in ONE request, read in the background.
+    Body: a zip of images (raw body or multipart `file` parts) and/or multipart `image`
+    parts. Images are staged on disk and the job id is returned right away:
+      {"job_id": "...", "status": "queued", "total": N}
+    Follow it with GET /jobs/{id} (progress), /jobs/{id}/events (NDJSON stream of the
+    results as they finish) or /jobs/{id}/results (paged, upload order).
+    Jobs and their results survive restarts; finished jobs are kept JOBS_TTL seconds.
+    """
+    # Rankings are read without the detector, as on /rankings
+    profile = resolve_profile(profile, detection=kind != "ranking")
+    store = _store()
+    job_id = await run_in_threadpool(store.create, kind, profile, {"saveProcessedImage": saveProcessedImage})
+    try:
+        await _stage_upload(request, store, job_id)
+    except BaseException:
+        await run_in_threadpool(store.delete, job_id)
+        raise
+    total = await run_in_threadpool(store.commit, job_id)
+    JobRunner.get_instance().wake()
+    logger.info(f"📦 Job {job_id}: {total} {kind} image(s) queued")
+    return {"job_id": job_id, "status": "queued", "total": total}
+
+
+@router.get("")
+async def list_jobs(limit: int = Query(50, ge=1, le=500)):
+    """Most recent jobs first, with their progress."""
+    return {"jobs": await run_in_threadpool(_store().list, limit)}
+
+
+@router.get("/{job_id}")
+async def get_job(job_id: str = Path(pattern=JOB_ID)):
+    """Progress: status (queued | running | done), total, done, failed."""
+    return await _get_job(_store(), job_id)
+
+
+@router.get("/{job_id}/results")
+async def get_job_results(job_id: str = Path(pattern=JOB_ID), offset: int = Query(0, ge=0),
+                          limit: int = Query(100, ge=1, le=1000)):
+    """
+    Items in upload order: {"index", "name", "state", ...result}. Finished items carry
+    their analysis (or `success: false`, `status`, `error`); pending ones only the state.
+    """
+    store = _store()
+    job = await _get_job(store, job_id)
+    items = await run_in_threadpool(store.items, job_id, offset, limit)
+    return dict(job, offset=offset, items=items)
+
+
+@router.get("/{job_id}/events")
+async def stream_job_events(job_id: str = Path(pattern=JOB_ID), after: int = Query(0, ge=0)):
+    """
+    Results as they finish, one NDJSON line each, in completion order (`seq`).
+    `after` resumes a stream cut short: the items with a higher `seq` are sent.
+    The last line is {"done": true, "job": {...}} (the job as GET /jobs/{id} returns it).
+    """
+    store = _store()
+    await _get_job(store, job_id)
+    runner = JobRunner.get_instance()
+
+    async def events():
+        seq = after
+        while True:
+            changed = runner.changed()  # Taken before the query: nothing finishes unseen in between
+            for item in await run_in_threadpool(store.finished_since, job_id, seq):
+                seq = item["seq"]
+                yield json.dumps(item) + "\n"
+            job = await run_in_threadpool(store.get, job_id)
+            if job is None or job["status"] == "done":
+                yield json.dumps({"done": True, "job": job or {"id": job_id, "status": "deleted"}}) + "\n"
+                return
+            try:
+                await asyncio.wait_for(changed.wait(), timeout=5)
+            except asyncio.TimeoutError:
+                pass
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+@router.delete("/{job_id}")
+async def delete_job(job_id: str = Path(pattern=JOB_ID)):
+    """Cancels a job: its pending items are dropped, its results and staged images deleted."""
+    if not await run_in_threadpool(_store().delete, job_id):
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return {"job_id": job_id, "deleted": True}
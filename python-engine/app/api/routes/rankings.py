@@ -0,0 +1,66 @@
+from fastapi import APIRouter, Depends, Request
+from app.schemas.requests import OcrRequest
+from app.services import pipelines
+from app.services.ranking import TableReader
+from app.core.config import settings
+from app.core.metrics import timed
+from app.api.dispatch import (decode_image, decode_upload, spool_upload, cached_inference, scroll_inference,
+                              resolve_profile, priority, BlockFormat)
+import logging
+import os
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+async def _analyze(img, handle, profile: str):
+    result = await cached_inference("ranking", pipelines.PARAMS["ranking"], img, handle, pipelines.ranking,
+                                    profile=profile)
+    return dict(result, image_handle=handle)
+
+
+@router.post("/analyze")
+async def analyze_ranking(request: OcrRequest, fmt: BlockFormat = Depends()):
+    """
+    Alliance member lists and rankings (KvK, power, kill points...), read row by row:
+      {"columns": [[x_min, x_max], ...],
+       "rows": [{"box": [x_min, y_min, x_max, y_max], "cells": ["1", "Name [TAG]", "123,456,789"], "conf"}],
+       "full_text": one line per row, cells joined by " | ",
+       "blocks": like /inventory/analyze plus `row` and `column`}
+    Stacked lines of a cell (name over alliance tag) are joined by a space. Cells are
+    assigned to columns by x-range, so every row has one text per column ("" when empty).
+    """
+    profile = resolve_profile(request.profile, detection=False)
+    img, handle = await decode_image(request.imageBase64)
+    return fmt.apply(await _analyze(img, handle, profile))
+
+
+@router.post("/analyze/raw")
+async def analyze_ranking_raw(request: Request, profile: str = None, fmt: BlockFormat = Depends()):
+    """Same as /analyze, but the screenshot is sent as raw bytes or multipart (no Base64)."""
+    profile = resolve_profile(profile, detection=False)
+    img, handle, _ = await decode_upload(request)
+    return fmt.apply(await _analyze(img, handle, profile))
+
+
+@router.post("/scroll", dependencies=[Depends(priority("bulk"))])
+async def analyze_ranking_scroll(request: Request, profile: str = None, sample_fps: float = None,
+                                 fmt: BlockFormat = Depends()):
+    """
+    A whole member list or ranking from a scroll capture: a screen recording or a zip
+    of screenshots, as the raw body or a multipart `file` part (see /inventory/scroll).
+    Only the keyframes are read; their rows are placed in content coordinates and the
+    rows seen on two keyframes are kept once (the complete read wins over one cut by
+    the screen edge). Response: like /analyze, plus `frames`, `truncated`, `keyframes`,
+    and `frame`, `segment`, `area` on each row.
+    """
+    profile = resolve_profile(profile, detection=False)
+    path = await spool_upload(request)
+    try:
+        keyframes, results, frames = await scroll_inference(path, "ranking", pipelines.ranking, profile,
+                                                            sample_fps or settings.SCROLL_SAMPLE_FPS)
+    finally:
+        os.unlink(path)
+    with timed("scroll_merge"):
+        table = TableReader.merge(keyframes, results)
+    return fmt.apply(dict(table, frames=frames, truncated=frames >= settings.SCROLL_MAX_FRAMES, keyframes=keyframes))
@@ -1,75 +1,76 @@
-from fastapi import APIRouter, HTTPException
-import uuid
-import os
-import cv2
+from fastapi import APIRouter, BackgroundTasks, Depends, Request
 import logging
-from concurrent.futures import ThreadPoolExecutor
 
-from app.schemas.requests import OcrRequest
-from app.services.image_processing import ImageProcessor
-from app.core.engine import OcrEngine
+from app.schemas.requests import ReportRequest
+from app.services import pipelines
+from app.services.image_cache import ImageCache
+from app.services.storage import ProcessedImageStore
+from app.core.metrics import current_route
+from app.api.dispatch import decode_image, decode_upload, cached_inference, resolve_profile, BlockFormat
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-@router.post("/analyze")
-async def analyze_report(request: OcrRequest):
-    # 1. Decode
-    img_raw = ImageProcessor.base64_to_cv2(request.imageBase64)
-    if img_raw is None:
-        raise HTTPException(status_code=400, detail="Invalid Image")
+async def analyze_frame(img_raw, handle, save: bool, background_tasks: BackgroundTasks, profile: str = "default",
+                        hold: bool = True):
+    """
+    Report pipeline for a decoded frame (also used by /auto/analyze and bulk jobs).
+    `hold=False` keeps the processed image out of the image cache (no `processed_image_handle`).
+    """
+    store = ProcessedImageStore.get_instance()
+
+    def is_valid(result):
+        # A cached report is only valid while its processed image is still on the shared volume
+        return not save or store.exists(result["processed_image_path"])
 
-    try:
-        # 2. Resize (Gain ~300ms on 4K images)
-        # 1920px is enough for RoK text.
-        img_resized, scale_ratio = ImageProcessor.resize_if_needed(img_raw, max_width=1920)
+    processed_name = store.new_name() if save else ""
+    out = await cached_inference("report", pipelines.PARAMS["report"], img_raw, handle,
+                                 pipelines.report, processed_name, is_valid=is_valid, profile=profile)
 
-        # 3. Process Container (Isolate Paper)
-        processed_img, is_isolated = ImageProcessor.isolate_paper(img_resized)
+    # The processed image stays in memory under its own handle: Magnifier rescans
+    # (/batch/process) use it without waiting for (or reading) the file
+    processed_handle = ImageCache.content_hash(f"report:{handle}".encode())
+    held = hold
+    if isinstance(out, tuple):
+        result, final_img = out
+        if hold:
+            ImageCache.get_instance().put(processed_handle, final_img)
+        if save:
+            # Written after the response is sent, off the request path
+            background_tasks.add_task(store.write, processed_name, final_img, current_route())
+    else:
+        # Cache hit: the processed image from the first run is already on disk, and maybe
+        # still in memory (same screenshot, same handle); a dead handle would only cost the client a 410
+        result = out
+        if not save:
+            result["processed_image_path"] = ""
+        held = hold and ImageCache.get_instance().get(processed_handle) is not None
 
-        # 4. Filters (Sharpen)
-        final_img = ImageProcessor.apply_filters(processed_img)
+    if held:
+        result["processed_image_handle"] = processed_handle
+    return result
 
-        # 5. Save to Disk (Optimization: JPG is faster to write than PNG, usually)
-        # Keeping PNG for precision as per requirement, but consider JPG quality=95 for speed.
-        filename = f"proc_{uuid.uuid4().hex}.png"
-        
-        # Path fixed for Docker volume consistency
-        save_path = os.path.join("/app/wwwroot/uploads", filename)
-        
-        # Write to disk
-        cv2.imwrite(save_path, final_img)
+@router.post("/analyze")
+async def analyze_report(request: ReportRequest, background_tasks: BackgroundTasks, fmt: BlockFormat = Depends()):
+    # 1. Decode
+    profile = resolve_profile(request.profile)
+    img_raw, handle = await decode_image(request.imageBase64)
 
-        # 6. OCR Execution
-        ocr = OcrEngine.get_instance()
-        result = ocr.ocr(final_img, cls=False)
-        
-        blocks = []
-        if result and result[0]:
-            for line in result[0]:
-                conf = float(line[1][1])
-                if conf > 0.10: # Filter garbage
-                    # Note: We don't need to upscale coordinates back if C# consumes the saved processed image directly!
-                    # The saved image matches these coordinates.
-                    blocks.append({
-                        "text": str(line[1][0]),
-                        "conf": conf,
-                        "box": line[0] 
-                    })
+    # 2-6. Resize, Isolate, Sharpen and OCR run on an inference worker; the save happens after the response
+    result = await analyze_frame(img_raw, handle, request.saveProcessedImage, background_tasks, profile)
+    result["image_handle"] = handle
+    return fmt.apply(result)
 
-        return {
-            "success": True,
-            "processed_image_path": filename,
-            "container": {
-                "is_isolated": is_isolated,
-                "canvas_size": {
-                    "width": int(final_img.shape[1]),
-                    "height": int(final_img.shape[0])
-                }
-            },
-            "blocks": blocks
-        }
 
-    except Exception as e:
-        logger.error(f"🔥 Report Processing Error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+@router.post("/analyze/raw")
+async def analyze_report_raw(request: Request, background_tasks: BackgroundTasks, saveProcessedImage: bool = True,
+                             profile: str = None, fmt: BlockFormat = Depends()):
+    """
+    Same as /analyze, but the screenshot is sent as raw bytes or multipart (no Base64).
+    `?saveProcessedImage=false` skips writing the processed image to the shared volume.
+    """
+    profile = resolve_profile(profile)
+    img_raw, handle, _ = await decode_upload(request)
+    result = await analyze_frame(img_raw, handle, saveProcessedImage, background_tasks, profile)
+    result["image_handle"] = handle
+    return fmt.apply(result)
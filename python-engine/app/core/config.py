@@ -8,8 +8,80 @@ class Settings:
     OCR_USE_GPU: bool = os.getenv("OCR_USE_GPU", "False").lower() == "true"
     OCR_ENABLE_MKLDNN: bool = os.getenv("OCR_ENABLE_MKLDNN", "True").lower() == "true"
     OCR_CPU_THREADS: int = int(os.getenv("OCR_CPU_THREADS", "4"))
+    OCR_REC_BATCH_SIZE: int = int(os.getenv("OCR_REC_BATCH_SIZE", "16"))  # Text lines per recognition batch
+    OCR_LANG: str = os.getenv("OCR_LANG", "en")
+    OCR_VERSION: str = os.getenv("OCR_VERSION", "PP-OCRv4")
+    OCR_DET_DB_THRESH: float = float(os.getenv("OCR_DET_DB_THRESH", "0.3"))
+    OCR_DET_DB_BOX_THRESH: float = float(os.getenv("OCR_DET_DB_BOX_THRESH", "0.6"))
+    OCR_DET_DB_UNCLIP_RATIO: float = float(os.getenv("OCR_DET_DB_UNCLIP_RATIO", "1.5"))
+    # Local model cache: <dir>/<ocr_version>/<lang>/{det,rec,cls}, filled by `python -m app.core.engine fetch`.
+    # When set, a missing model is a startup error instead of a download ("" = PaddleOCR's ~/.paddleocr cache)
+    OCR_MODEL_DIR: str = os.getenv("OCR_MODEL_DIR", "")
+
+    # Engine profiles (app.core.engine): extra profiles as JSON {"name": {PaddleOCR kwargs...}}
+    OCR_PROFILES: str = os.getenv("OCR_PROFILES", "")
+    OCR_PRELOAD_PROFILES: str = os.getenv("OCR_PRELOAD_PROFILES", "default")  # Loaded at startup (comma-separated)
+    OCR_ENGINE_BUDGET_MB: int = int(os.getenv("OCR_ENGINE_BUDGET_MB", "0"))  # Per worker; LRU profiles unloaded above it (0 = no limit)
+
+    # Governor profiles: read the known profile areas (recognition only) when the panel is found
+    GOVERNOR_ROI: bool = os.getenv("GOVERNOR_ROI", "True").lower() == "true"
+
+    # Reports: paper found on a thumbnail and refined at full resolution, recent layouts reused
+    FAST_PAPER_ISOLATION: bool = os.getenv("FAST_PAPER_ISOLATION", "True").lower() == "true"
+
+    # Reports / inventory above 1920px: native-resolution OCR on the tiles that hold text
+    ADAPTIVE_INFERENCE: bool = os.getenv("ADAPTIVE_INFERENCE", "False").lower() == "true"
+
+    # Incremental re-OCR (previousHandle): above this share of changed tiles the whole screen is read again
+    INCREMENTAL_MAX_CHANGED: float = float(os.getenv("INCREMENTAL_MAX_CHANGED", "0.5"))
+
+    # Scroll captures (/inventory/scroll): video or zip of screenshots, OCR on the frames with new content
+    SCROLL_SAMPLE_FPS: float = float(os.getenv("SCROLL_SAMPLE_FPS", "10"))   # Video frames compared per second of capture
+    SCROLL_MAX_FRAMES: int = int(os.getenv("SCROLL_MAX_FRAMES", "1500"))     # Sampled frames read per upload (the rest is ignored)
+    SCROLL_MAX_UPLOAD_MB: int = int(os.getenv("SCROLL_MAX_UPLOAD_MB", "256"))  # Compressed, and unzipped for zips
+    SCROLL_MAX_IMAGE_MB: int = int(os.getenv("SCROLL_MAX_IMAGE_MB", "64"))     # Per screenshot of a zip, once unzipped
+
+    # Inference Pool (each worker owns its own PaddleOCR instance)
+    # "thread": workers share this process (Paddle releases the GIL during inference)
+    # "process": each worker is a child process; images travel through shared memory
+    OCR_POOL_MODE: str = os.getenv("OCR_POOL_MODE", "thread").lower()
+    OCR_WORKERS: int = int(os.getenv("OCR_WORKERS", "1"))
+    OCR_QUEUE_SIZE: int = int(os.getenv("OCR_QUEUE_SIZE", "16"))       # Jobs waiting for a free worker, per priority lane
+    OCR_LANE_WEIGHTS: str = os.getenv("OCR_LANE_WEIGHTS", "interactive:8,magnifier:4,bulk:1")  # Worker turns per lane
+    OCR_COALESCE_MAX_REGIONS: int = int(os.getenv("OCR_COALESCE_MAX_REGIONS", "32"))  # Queued batch calls merged into one job up to this many regions (0 = off)
+    OCR_REQUEST_TIMEOUT: float = float(os.getenv("OCR_REQUEST_TIMEOUT", "25"))  # Seconds (C# HttpClient gives up at 30s)
+    OCR_RETRY_AFTER: int = int(os.getenv("OCR_RETRY_AFTER", "2"))     # Seconds suggested to clients when the queue is full
+    OCR_WORKER_MAX_JOBS: int = int(os.getenv("OCR_WORKER_MAX_JOBS", "0"))      # Process mode: recycle a worker after N jobs (0 = never)
+    OCR_WORKER_MAX_RSS_MB: int = int(os.getenv("OCR_WORKER_MAX_RSS_MB", "0"))  # Process mode: recycle a worker above this RSS (0 = off)
+
+    # Decoded-image cache (image handles reused by /batch/process)
+    IMAGE_CACHE_MAX_MB: int = int(os.getenv("IMAGE_CACHE_MAX_MB", "512"))
+    IMAGE_CACHE_TTL: float = float(os.getenv("IMAGE_CACHE_TTL", "300"))  # Seconds since last use
+
+    # Result memoization (off | memory | sqlite)
+    RESULT_CACHE_BACKEND: str = os.getenv("RESULT_CACHE_BACKEND", "off").lower()
+    RESULT_CACHE_MAX_MB: int = int(os.getenv("RESULT_CACHE_MAX_MB", "64"))
+    RESULT_CACHE_TTL: float = float(os.getenv("RESULT_CACHE_TTL", "600"))   # Seconds
+    RESULT_CACHE_PATH: str = os.getenv("RESULT_CACHE_PATH", "/app/cache/results.db")
+    RESULT_CACHE_PHASH: bool = os.getenv("RESULT_CACHE_PHASH", "False").lower() == "true"  # Near-duplicates share results
+
+    # Observability (/metrics is always on)
+    RESPONSE_TIMINGS: bool = os.getenv("RESPONSE_TIMINGS", "False").lower() == "true"  # Per-stage `Server-Timing` header
+
+    # Processed report images (shared volume, read by the C# Magnifier)
+    PROCESSED_IMAGE_FORMAT: str = os.getenv("PROCESSED_IMAGE_FORMAT", "png").lower()  # png | webp (lossless) | npy (raw)
+    PROCESSED_IMAGE_PNG_LEVEL: int = int(os.getenv("PROCESSED_IMAGE_PNG_LEVEL", "1"))    # 0-9: higher = smaller, slower
+    PROCESSED_IMAGE_TTL: float = float(os.getenv("PROCESSED_IMAGE_TTL", "3600"))         # Seconds before cleanup
+    PROCESSED_IMAGE_MAX_MB: int = int(os.getenv("PROCESSED_IMAGE_MAX_MB", "1024"))
     
     # Paths
-    UPLOAD_DIR: str = "/app/wwwroot/uploads"
+    UPLOAD_DIR: str = os.getenv("UPLOAD_DIR", "/app/wwwroot/uploads")
+
+    # Bulk jobs (/jobs): queue state and staged images, kept across restarts (shared volume by default)
+    JOBS_DIR: str = os.getenv("JOBS_DIR", os.path.join(UPLOAD_DIR, "jobs"))
+    JOBS_MAX_UPLOAD_MB: int = int(os.getenv("JOBS_MAX_UPLOAD_MB", "1024"))
+    JOBS_MAX_ITEMS: int = int(os.getenv("JOBS_MAX_ITEMS", "2000"))  # Images per job
+    JOBS_MAX_IMAGE_MB: int = int(os.getenv("JOBS_MAX_IMAGE_MB", "64"))  # Per image once unzipped (JOBS_MAX_UPLOAD_MB caps the total)
+    JOBS_TTL: float = float(os.getenv("JOBS_TTL", "86400"))        # Seconds a finished job's results are kept
 
-settings = Settings()
\ No newline at end of file
+settings = Settings()
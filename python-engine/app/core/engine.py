@@ -1,43 +1,236 @@
-import os
+import json
 import logging
+import os
+import sys
+import cv2
 import numpy as np
-from paddleocr import PaddleOCR
+
+from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+class UnknownProfileError(KeyError):
+    """Raised for an engine profile that is neither built in nor in OCR_PROFILES."""
+
+
+class MissingModelError(RuntimeError):
+    """Raised when OCR_MODEL_DIR lacks the model files of a profile (boot never downloads them)."""
+
+
+class WhitelistCTCDecode:
+    """
+    Wraps a PaddleOCR CTC label decoder so the argmax only picks the blank or a
+    whitelisted character: a numeric field can't decode as "O"/"l" instead of "0"/"1".
+    The confidence stays the model's probability of the chosen character, so a
+    forced pick scores low instead of looking certain.
+    """
+
+    def __init__(self, decoder, whitelist: str):
+        self._decoder = decoder
+        # CTC label lists start with the "blank" token
+        self._allowed = np.array([0] + [i for i, c in enumerate(decoder.character) if i > 0 and c in whitelist])
+
+    def __call__(self, preds, *args, **kwargs):
+        if isinstance(preds, (tuple, list)):
+            preds = preds[-1]
+        if not isinstance(preds, np.ndarray):
+            preds = preds.numpy()
+        allowed = preds[:, :, self._allowed]
+        best = allowed.argmax(axis=2)
+        probs = np.take_along_axis(allowed, best[..., None], axis=2)[..., 0]
+        return self._decoder.decode(self._allowed[best], probs, is_remove_duplicate=True)
+
+    def __getattr__(self, name):
+        return getattr(self._decoder, name)
+
+
 class OcrEngine:
-    _instance = None
+    """
+    PaddleOCR factory. An engine profile is a named set of PaddleOCR overrides
+    (lang, ocr_version, det_db_* thresholds, det_model_dir/rec_model_dir for
+    server models...) on top of the settings, plus two registry keys:
+      - rec_only: drops the detector after loading (recognition-only jobs, less RAM);
+      - mem_mb:   memory charged to the worker's budget instead of the measured RSS growth;
+      - rec_whitelist: characters the recognizer may output (see WhitelistCTCDecode).
+    Extra profiles come from OCR_PROFILES (JSON) and may override the built-in ones.
+    """
+
+    BUILTIN_PROFILES = {
+        "default": {},
+        # Magnifier rescans of single-line crops (det=False regions)
+        "rec": {"rec_only": True},
+        # Magnifier `digits` regions: quantities, stats and timers
+        "digits": {"rec_only": True, "rec_whitelist": "0123456789,.:/%+-"},
+    }
+    REGISTRY_KEYS = ("rec_only", "mem_mb", "rec_whitelist")
+
+    _profiles = None
+
+    @classmethod
+    def profiles(cls) -> dict:
+        if cls._profiles is None:
+            profiles = {name: dict(spec) for name, spec in cls.BUILTIN_PROFILES.items()}
+            if settings.OCR_PROFILES:
+                try:
+                    extra = json.loads(settings.OCR_PROFILES)
+                except ValueError as e:
+                    raise ValueError(f"OCR_PROFILES is not valid JSON: {e}")
+                for name, spec in extra.items():
+                    profiles[name] = dict(spec)
+            cls._profiles = profiles
+        return cls._profiles
 
     @classmethod
-    def get_instance(cls):
-        if cls._instance is None:
-            logger.info("🚀 INITIALIZING PADDLEOCR ENGINE...")
-            
-            # Configs via Env
-            use_gpu = os.getenv('OCR_USE_GPU', 'False').lower() == 'true'
-            enable_mkldnn = os.getenv('OCR_ENABLE_MKLDNN', 'True').lower() == 'true'
-            threads = int(os.getenv('OCR_CPU_THREADS', '4'))
-
-            cls._instance = PaddleOCR(
-                use_angle_cls=False, # Mantém False para velocidade
-                lang='en',
-                use_gpu=use_gpu,
-                enable_mkldnn=enable_mkldnn,
-                cpu_threads=threads,
-                show_log=False,
-                ocr_version='PP-OCRv4',
-                # Otimizações de detecção
-                det_db_thresh=0.3,
-                det_db_box_thresh=0.6,
-                det_db_unclip_ratio=1.5
-            )
-            
-            # WARMUP: Passa uma imagem preta minúscula só para carregar os pesos na memória
-            try:
-                dummy = np.zeros((100, 100, 3), dtype=np.uint8)
-                cls._instance.ocr(dummy, cls=False)
-                logger.info("✅ PADDLEOCR WARMUP COMPLETE.")
-            except Exception as e:
-                logger.warning(f"⚠️ Warmup failed: {e}")
-
-        return cls._instance
\ No newline at end of file
+    def profile(cls, name: str) -> dict:
+        try:
+            return cls.profiles()[name]
+        except KeyError:
+            raise UnknownProfileError(f"Unknown engine profile '{name}' (available: {', '.join(cls.profiles())})")
+
+    # Files PaddleOCR needs in every model folder (it downloads the folder when one is missing)
+    MODEL_FILES = ("inference.pdmodel", "inference.pdiparams")
+    # PaddleOCR loads all three, the angle classifier too (even with use_angle_cls=False)
+    MODEL_KINDS = ("det", "rec", "cls")
+
+    @staticmethod
+    def model_dirs(profile: str = "default") -> dict:
+        """
+        {"det": dir, "rec": dir, "cls": dir} of a profile: its own `<kind>_model_dir`, else
+        the OCR_MODEL_DIR layout <dir>/<ocr_version>/<lang>/<kind>. Empty without OCR_MODEL_DIR
+        (PaddleOCR's download cache, folders named after the download URLs).
+        """
+        spec = OcrEngine.profile(profile)
+        dirs = {}
+        for kind in OcrEngine.MODEL_KINDS:
+            if spec.get(f"{kind}_model_dir"):
+                dirs[kind] = spec[f"{kind}_model_dir"]
+            elif settings.OCR_MODEL_DIR:
+                dirs[kind] = os.path.join(settings.OCR_MODEL_DIR, spec.get("ocr_version", settings.OCR_VERSION),
+                                          spec.get("lang", settings.OCR_LANG), kind)
+        return dirs
+
+    @staticmethod
+    def missing_models(profile: str = "default"):
+        """Model files of a profile absent from its folders (see model_dirs)."""
+        return [os.path.join(d, name) for d in OcrEngine.model_dirs(profile).values()
+                for name in OcrEngine.MODEL_FILES if not os.path.isfile(os.path.join(d, name))]
+
+    @staticmethod
+    def create(threads: int = None, profile: str = "default", download: bool = False):
+        """
+        Builds a NEW PaddleOCR instance for an engine profile (warm it up with `warmup`).
+        A PaddleOCR predictor is not safe to share between threads, so every
+        inference worker owns the instances returned here.
+        `threads` overrides OCR_CPU_THREADS (intra-op threads of this instance).
+        With OCR_MODEL_DIR, missing models raise MissingModelError unless `download`.
+        """
+        # Imported here: paddle takes seconds to import, and the API answers /livez without it
+        from paddleocr import PaddleOCR
+
+        spec = OcrEngine.profile(profile)
+        logger.info(f"🚀 INITIALIZING PADDLEOCR ENGINE ({profile})...")
+
+        if threads is None:
+            threads = settings.OCR_CPU_THREADS
+
+        if not download:
+            missing = OcrEngine.missing_models(profile)
+            if missing:
+                raise MissingModelError(f"Profile '{profile}': missing {', '.join(missing)} "
+                                        f"(run `python -m app.core.engine fetch`)")
+
+        kwargs = dict(
+            use_angle_cls=False, # Mantém False para velocidade
+            lang=settings.OCR_LANG,
+            use_gpu=settings.OCR_USE_GPU,
+            enable_mkldnn=settings.OCR_ENABLE_MKLDNN,
+            cpu_threads=threads,
+            show_log=False,
+            ocr_version=settings.OCR_VERSION,
+            # Otimizações de detecção
+            det_db_thresh=settings.OCR_DET_DB_THRESH,
+            det_db_box_thresh=settings.OCR_DET_DB_BOX_THRESH,
+            det_db_unclip_ratio=settings.OCR_DET_DB_UNCLIP_RATIO,
+            # Lines recognized together per forward pass (batch Magnifier packs every region's lines)
+            rec_batch_num=settings.OCR_REC_BATCH_SIZE
+        )
+        kwargs.update({f"{kind}_model_dir": d for kind, d in OcrEngine.model_dirs(profile).items()})
+        kwargs.update({k: v for k, v in spec.items() if k not in OcrEngine.REGISTRY_KEYS})
+        engine = PaddleOCR(**kwargs)
+
+        rec_only = spec.get("rec_only", False)
+        if rec_only:
+            # The detector predictor is the bigger model: free it
+            engine.text_detector = None
+
+        whitelist = spec.get("rec_whitelist")
+        if whitelist:
+            decoder = engine.text_recognizer.postprocess_op
+            if hasattr(decoder, "character") and hasattr(decoder, "decode"):
+                engine.text_recognizer.postprocess_op = WhitelistCTCDecode(decoder, whitelist)
+            else:
+                logger.warning(f"⚠️ Profile '{profile}': {type(decoder).__name__} is not a CTC decoder, rec_whitelist ignored")
+
+        return engine
+
+    # Screenshot size the warmup runs at: the detector and MKLDNN cache their kernels
+    # per input shape, so a tiny frame leaves the first real request to pay for it
+    WARMUP_SIZE = (1920, 1080)
+
+    @staticmethod
+    def warmup_frame():
+        """Synthetic 1080p screenshot: game-like panels with lines of text and numbers of several sizes."""
+        w, h = OcrEngine.WARMUP_SIZE
+        frame = np.full((h, w, 3), (48, 38, 30), dtype=np.uint8)
+        cv2.rectangle(frame, (w // 8, h // 8), (w - w // 8, h - h // 8), (150, 205, 225), -1)
+        y = h // 8 + 60
+        for i in range(24):
+            scale = (0.7, 1.0, 1.4)[i % 3]
+            text = f"Governor {i * 7919 % 100000:05d}  Power 1,{i * 104729 % 1000:03d},{i * 31 % 1000:03d}"
+            cv2.putText(frame, text, (w // 8 + 40 + (i % 2) * (w // 2 - w // 8), y), cv2.FONT_HERSHEY_SIMPLEX, scale,
+                        (40, 40, 40), 2, cv2.LINE_AA)
+            y += int(30 * scale) + 8
+            if y > h - h // 8 - 20:
+                break
+        return frame
+
+    @staticmethod
+    def warmup(engine, profile: str = "default"):
+        """One realistic pass (full frame, or a text line for recognition-only profiles) to load the weights."""
+        frame = OcrEngine.warmup_frame()
+        try:
+            if OcrEngine.profile(profile).get("rec_only"):
+                w, h = OcrEngine.WARMUP_SIZE
+                engine.ocr(frame[h // 8 + 30:h // 8 + 75, w // 8 + 30:w // 8 + 700], det=False, cls=False)
+            else:
+                engine.ocr(frame, det=True, cls=False)
+            logger.info(f"✅ PADDLEOCR WARMUP COMPLETE ({profile}).")
+        except Exception as e:
+            logger.warning(f"⚠️ Warmup failed: {e}")
+
+
+def _models_command(command: str) -> int:
+    """`fetch`: downloads every profile's models into OCR_MODEL_DIR; `verify`: checks they are all there."""
+    if not settings.OCR_MODEL_DIR:
+        print("OCR_MODEL_DIR is not set")
+        return 2
+    seen, missing = set(), []
+    for profile in OcrEngine.profiles():
+        dirs = tuple(sorted(OcrEngine.model_dirs(profile).items()))
+        if dirs in seen:
+            continue
+        seen.add(dirs)
+        if command == "fetch" and OcrEngine.missing_models(profile):
+            OcrEngine.create(threads=1, profile=profile, download=True)
+        for kind, d in dirs:
+            absent = [name for name in OcrEngine.MODEL_FILES if not os.path.isfile(os.path.join(d, name))]
+            print(f"{'MISSING' if absent else 'ok':8} {profile:10} {kind}  {d}")
+            missing += absent
+    return 1 if missing else 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2 or sys.argv[1] not in ("fetch", "verify"):
+        print("usage: python -m app.core.engine fetch|verify")
+        sys.exit(2)
+    sys.exit(_models_command(sys.argv[1]))
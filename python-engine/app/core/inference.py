@@ -0,0 +1,656 @@
+import asyncio
+import contextlib
+import gc
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import traceback
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.engine import OcrEngine
+from app.core.metrics import collect, instrument_engine, observe_stages
+from app.core.shared_frame import SharedFrame, share_values, attach_values
+
+logger = logging.getLogger(__name__)
+
+
+class EngineBusyError(Exception):
+    """Raised when the admission queue is full (backpressure)."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("OCR engine is busy, retry later")
+        self.retry_after = retry_after
+
+
+class InferenceTimeoutError(Exception):
+    """Raised when a job does not finish within the per-request timeout."""
+
+
+class WorkerCrashedError(Exception):
+    """Raised when a worker process dies while running a job."""
+
+
+# Scheduling lanes, most latency-sensitive first (ties go to the earlier lane)
+LANES = ("interactive", "magnifier", "bulk")
+
+
+class _Job:
+    __slots__ = ("fn", "args", "profile", "lane", "units", "future", "deadline", "enqueued", "started", "timings")
+
+    def __init__(self, fn, args, profile: str, timeout: float, lane: str = "interactive", units: int = 0):
+        self.fn = fn
+        self.args = args
+        self.profile = profile
+        self.lane = lane
+        self.units = units  # Coalescing size (batch regions), 0 = always runs alone
+        self.future = Future()
+        self.enqueued = time.monotonic()
+        self.deadline = self.enqueued + timeout
+        self.started = None
+        self.timings = {}
+
+
+class _Scheduler:
+    """
+    Priority lanes in front of the workers, instead of one FIFO:
+      - each lane is a FIFO bounded by `capacity`, so a bulk import filling its lane
+        does not get interactive lookups rejected;
+      - lanes share the workers by weighted fair queueing (stride scheduling): with
+        weights 8/4/1 a busy interactive lane gets 8 turns for every bulk one, and
+        bulk still progresses. A lane that was idle starts at the current virtual
+        time instead of cashing in the turns it did not use.
+    """
+
+    def __init__(self, weights: dict, capacity: int):
+        self._lanes = {lane: deque() for lane in weights}
+        self._stride = {lane: 1.0 / max(weight, 1e-3) for lane, weight in weights.items()}
+        self._pass = dict.fromkeys(weights, 0.0)
+        self._clock = 0.0
+        self._capacity = capacity
+        self._closed = False
+        self._cond = threading.Condition()
+        self.dropped = dict.fromkeys(weights, 0)  # Jobs skipped: caller gone or deadline passed
+
+    def put_nowait(self, job):
+        """Raises queue.Full when the job's lane is full."""
+        with self._cond:
+            lane = self._lanes[job.lane]
+            if len(lane) >= self._capacity:
+                raise queue.Full
+            if not lane:
+                self._pass[job.lane] = max(self._pass[job.lane], self._clock)
+            lane.append(job)
+            self._cond.notify()
+
+    def get(self):
+        """Next job by lane turn (blocks while all lanes are empty). None once closed and drained."""
+        with self._cond:
+            while True:
+                ready = [lane for lane, jobs in self._lanes.items() if jobs]
+                if ready:
+                    lane = min(ready, key=lambda l: self._pass[l])
+                    self._clock = self._pass[lane]
+                    self._pass[lane] += self._stride[lane]
+                    return self._lanes[lane].popleft()
+                if self._closed:
+                    return None
+                self._cond.wait()
+
+    def take_compatible(self, job, max_units: int):
+        """
+        Removes and returns the queued jobs of `job`'s lane that can run in the same call
+        (same pipeline and profile, coalescable), up to `max_units` in total. Each one
+        is charged to the lane like a turn of its own.
+        """
+        if not job.units or job.units >= max_units or getattr(job.fn, "coalesced", None) is None:
+            return []
+        taken, total = [], job.units
+        with self._cond:
+            lane = self._lanes[job.lane]
+            for other in list(lane):
+                if other.fn is job.fn and other.profile == job.profile and other.units \
+                        and total + other.units <= max_units:
+                    lane.remove(other)
+                    taken.append(other)
+                    total += other.units
+                    self._pass[job.lane] += self._stride[job.lane]
+        return taken
+
+    def drop(self, lane: str):
+        with self._cond:
+            self.dropped[lane] += 1
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def depth(self, lane: str = None) -> int:
+        with self._cond:
+            if lane is not None:
+                return len(self._lanes[lane])
+            return sum(len(jobs) for jobs in self._lanes.values())
+
+
+def _lane_weights():
+    """OCR_LANE_WEIGHTS ("interactive:8,magnifier:4,bulk:1") -> {lane: weight}, every lane present."""
+    weights = dict.fromkeys(LANES, 1.0)
+    for item in settings.OCR_LANE_WEIGHTS.split(","):
+        if ":" in item:
+            lane, weight = item.split(":", 1)
+            if lane.strip() in weights:
+                weights[lane.strip()] = float(weight)
+    return weights
+
+
+class EngineRegistry:
+    """
+    The PaddleOCR instances of ONE worker, keyed by engine profile.
+    Profiles load on first use; when the loaded ones exceed the memory budget,
+    the least recently used are unloaded (never the one being requested).
+    Sizes are the RSS growth measured while loading (or the profile's `mem_mb`).
+    `build_lock`, when given, is held around every load (preload and lazy ones).
+    """
+
+    def __init__(self, threads: int, budget_mb: int, preload=("default",), build_lock=None):
+        self._threads = threads
+        self._budget_mb = budget_mb
+        self._build_lock = build_lock or contextlib.nullcontext()
+        self._engines = OrderedDict()  # profile -> (engine, size_mb)
+        self.load_times = {}  # profile -> {"load_s", "warmup_s"} of its last load
+        for profile in preload:
+            self.get(profile)
+
+    def get(self, profile: str):
+        entry = self._engines.get(profile)
+        if entry is not None:
+            self._engines.move_to_end(profile)
+            return entry[0]
+        with self._build_lock:
+            return self._load(profile)
+
+    def _load(self, profile: str):
+        spec = OcrEngine.profile(profile)
+        self._make_room(spec.get("mem_mb", 0))
+        rss_before = _rss_mb(os.getpid())
+        started = time.perf_counter()
+        engine = OcrEngine.create(threads=self._threads, profile=profile)
+        loaded = time.perf_counter()
+        OcrEngine.warmup(engine, profile)
+        engine = instrument_engine(engine)
+        self.load_times[profile] = {"load_s": round(loaded - started, 3),
+                                    "warmup_s": round(time.perf_counter() - loaded, 3)}
+        size_mb = spec.get("mem_mb") or max(0.0, _rss_mb(os.getpid()) - rss_before)
+        self._engines[profile] = (engine, size_mb)
+        logger.info(f"📦 Engine profile '{profile}' loaded (~{size_mb:.0f}MB, {len(self._engines)} loaded, "
+                    f"load {self.load_times[profile]['load_s']:.1f}s + warmup {self.load_times[profile]['warmup_s']:.1f}s)")
+        return engine
+
+    def _make_room(self, incoming_mb: float):
+        if not self._budget_mb:
+            return
+        while self._engines and self.size_mb + incoming_mb > self._budget_mb:
+            profile, (_, size_mb) = self._engines.popitem(last=False)
+            logger.info(f"🗑️ Engine profile '{profile}' unloaded (LRU, {size_mb:.0f}MB)")
+
+    @property
+    def size_mb(self) -> float:
+        return sum(size for _, size in self._engines.values())
+
+    @property
+    def loaded(self):
+        return list(self._engines)
+
+    def close(self):
+        self._engines.clear()
+
+
+def _preload_profiles():
+    return [p.strip() for p in settings.OCR_PRELOAD_PROFILES.split(",") if p.strip()]
+
+
+class _ThreadWorker:
+    """Runs jobs in the calling worker thread with private PaddleOCR instances."""
+
+    # Paddle initialization is not thread-safe: engines are built one at a time,
+    # at startup and when a worker first meets a profile
+    _build_lock = threading.Lock()
+
+    def __init__(self, threads: int):
+        self._engines = EngineRegistry(threads, settings.OCR_ENGINE_BUDGET_MB, _preload_profiles(),
+                                       build_lock=self._build_lock)
+        self.pid = os.getpid()
+        self.load_times = self._engines.load_times
+
+    def run(self, fn, args, profile: str, timeout: float):
+        """Returns (result, stage timings)."""
+        with collect() as timings:
+            return fn(self._engines.get(profile), *args), timings
+
+    def after_job(self):
+        pass
+
+    def close(self):
+        self._engines.close()
+
+
+def _process_main(conn, threads: int):
+    """Child process loop: loads the preloaded profiles once, then serves (fn, args, profile) messages."""
+    try:
+        engines = EngineRegistry(threads, settings.OCR_ENGINE_BUDGET_MB, _preload_profiles())
+    except Exception as e:
+        conn.send(("error", f"{type(e).__name__}: {e}", {}))
+        return
+    conn.send(("ready", os.getpid(), engines.load_times))
+
+    while True:
+        try:
+            msg = conn.recv()
+        except EOFError:
+            break
+        if msg is None:
+            break
+
+        fn, args, profile = msg
+        args, attached = attach_values(args)
+        owned = []
+        result = None
+        try:
+            with collect() as timings:
+                result = fn(engines.get(profile), *args)
+            # Arrays inside tuple results go back through shared memory as well (copied:
+            # a result may be a view of the input frame)
+            if isinstance(result, tuple):
+                result, owned = share_values(result)
+            reply = ("ok", result, timings)
+        except Exception as e:
+            # The failed frames' locals still point into the input blocks
+            traceback.clear_frames(e.__traceback__)
+            reply = ("err", e, {})
+        finally:
+            args = result = None
+            _close_attached(attached)
+
+        try:
+            conn.send(reply)
+        except Exception as e:
+            # Unpicklable exception/result: degrade to a plain message
+            conn.send(("err", RuntimeError(f"{type(e).__name__}: {e}"), {}))
+        for shm in owned:
+            # The parent copies and unlinks the block
+            SharedFrame.release(shm, unlink=False)
+
+
+def _unlink(name: str):
+    try:
+        SharedFrame.release(shared_memory.SharedMemory(name=name))
+    except FileNotFoundError:
+        pass
+
+
+def _close_attached(blocks):
+    """Closes the child's mappings of the input blocks (the parent unlinks them)."""
+    for shm in blocks:
+        try:
+            SharedFrame.release(shm, unlink=False)
+        except BufferError:
+            # A view is still referenced (a cycle, or kept by the pipeline): collect, then give up on it
+            gc.collect()
+            try:
+                SharedFrame.release(shm, unlink=False)
+            except BufferError:
+                logger.warning(f"⚠️ Shared frame {shm.name} still in use after the job, left mapped")
+
+
+def _rss_mb(pid: int) -> float:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    return 0.0
+
+
+class _ProcessWorker:
+    """
+    Owns one child process with its own PaddleOCR instances (EngineRegistry).
+    Decoded images are handed over through shared memory instead of pickling the ndarray.
+    The child is recycled when it crashes, times out, or reaches the job/RSS limits.
+    """
+
+    def __init__(self, threads: int, max_jobs: int, max_rss_mb: int):
+        self._ctx = multiprocessing.get_context("spawn")
+        self._threads = threads
+        self._max_jobs = max_jobs
+        self._max_rss_mb = max_rss_mb
+        self._proc = None
+        self._conn = None
+        self._jobs = 0
+        self.load_times = {}
+        self.spawn()
+
+    def spawn(self):
+        parent_conn, child_conn = self._ctx.Pipe()
+        self._proc = self._ctx.Process(target=_process_main, args=(child_conn, self._threads), daemon=True)
+        self._proc.start()
+        child_conn.close()
+        self._conn = parent_conn
+        self._jobs = 0
+
+    def wait_ready(self, timeout: float = 600):
+        # Model loading can take a while on the first boot (weights download)
+        try:
+            if not self._conn.poll(timeout):
+                raise RuntimeError("OCR worker process did not become ready")
+            status, payload, load_times = self._conn.recv()
+        except EOFError:
+            raise RuntimeError(f"OCR worker process exited during startup (code {self._proc.exitcode})")
+        if status == "error":
+            raise RuntimeError(f"OCR worker process failed to load its engines: {payload}")
+        self.load_times = load_times
+        logger.info(f"✅ OCR worker process {payload} ready")
+
+    def recycle(self, reason: str):
+        logger.warning(f"♻️ Recycling OCR worker process {self._proc.pid}: {reason}")
+        self.close()
+        self.spawn()
+        self.wait_ready()
+
+    def run(self, fn, args, profile: str, timeout: float):
+        shared, blocks = share_values(args)
+        try:
+            try:
+                self._conn.send((fn, shared, profile))
+                if not self._conn.poll(max(0.0, timeout)):
+                    # A hung child cannot be interrupted: replace it
+                    self.recycle("job timeout")
+                    raise InferenceTimeoutError("OCR job exceeded its deadline")
+                status, payload, timings = self._conn.recv()
+            except (EOFError, BrokenPipeError, ConnectionResetError) as e:
+                self.recycle(f"crashed ({e.__class__.__name__})")
+                raise WorkerCrashedError("OCR worker crashed while processing the image")
+        finally:
+            for shm in blocks:
+                SharedFrame.release(shm)
+
+        if status == "ok" and isinstance(payload, tuple):
+            payload = self._collect(payload)
+
+        self._jobs += 1
+        if status == "err":
+            raise payload
+        return payload, timings
+
+    @property
+    def pid(self) -> int:
+        return self._proc.pid
+
+    def after_job(self):
+        """Recycles the child once the caller already has its result."""
+        if self._max_jobs and self._jobs >= self._max_jobs:
+            self.recycle(f"{self._jobs} jobs served")
+        elif self._max_rss_mb and _rss_mb(self._proc.pid) > self._max_rss_mb:
+            self.recycle(f"RSS above {self._max_rss_mb}MB")
+
+    @staticmethod
+    def _collect(values):
+        """Copies arrays returned by the child out of shared memory and frees the blocks."""
+        views, blocks = attach_values(values)
+        out = tuple(np.array(v) if isinstance(v, np.ndarray) else v for v in views)
+        del views
+        for shm in blocks:
+            SharedFrame.release(shm)
+        return out
+
+    def close(self):
+        try:
+            self._conn.send(None)
+        except Exception:
+            pass
+        self._proc.join(timeout=5)
+        if self._proc.is_alive():
+            self._proc.kill()
+            self._proc.join()
+        self._discard_replies(self._conn)
+        self._conn.close()
+
+    @staticmethod
+    def _discard_replies(conn):
+        """
+        Frees the result blocks of replies nobody will read: a job abandoned at its deadline
+        may still have finished before the child stopped. The parent owns those blocks.
+        """
+        try:
+            while conn.poll(0):
+                status, payload, _ = conn.recv()
+                if status == "ok" and isinstance(payload, tuple):
+                    for value in payload:
+                        if isinstance(value, SharedFrame):
+                            _unlink(value.name)
+        except (EOFError, OSError):
+            pass
+
+
+class InferencePool:
+    """
+    Bounded pool of inference workers.
+    Each worker owns its own PaddleOCR instances (one per engine profile in use),
+    either in a thread of this process or in a child process (OCR_POOL_MODE), so
+    blocking OCR/OpenCV work never runs on the event loop and throughput scales
+    with the number of workers. Jobs are callables `fn(ocr, *args)`, where `ocr`
+    is the worker's engine for the job's profile, queued in priority lanes (_Scheduler).
+    A pipeline with a `coalesced` attribute (fn(ocr, *args_1, *args_2, ...) -> one
+    result per job) may run several of its queued jobs as one call.
+    """
+    _instance = None
+
+    def __init__(self, workers: int, queue_size: int, timeout: float, retry_after: int,
+                 mode: str = "thread", threads: int = 4, max_jobs: int = 0, max_rss_mb: int = 0,
+                 weights: dict = None, coalesce_max: int = 0):
+        self.workers = max(1, workers)
+        self.mode = mode
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._threads_per_worker = threads
+        self._max_jobs = max_jobs
+        self._max_rss_mb = max_rss_mb
+        self.queue_size = max(1, queue_size)
+        self.coalesce_max = coalesce_max
+        self._scheduler = _Scheduler(weights or dict.fromkeys(LANES, 1.0), self.queue_size)
+        self._threads = []
+        self._backends = []
+        self._ready_s = []
+        self._started = time.monotonic()
+        self.startup_error = None
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            cls._instance = cls(
+                workers=settings.OCR_WORKERS,
+                queue_size=settings.OCR_QUEUE_SIZE,
+                timeout=settings.OCR_REQUEST_TIMEOUT,
+                retry_after=settings.OCR_RETRY_AFTER,
+                mode=settings.OCR_POOL_MODE,
+                threads=settings.OCR_CPU_THREADS,
+                max_jobs=settings.OCR_WORKER_MAX_JOBS,
+                max_rss_mb=settings.OCR_WORKER_MAX_RSS_MB,
+                weights=_lane_weights(),
+                coalesce_max=settings.OCR_COALESCE_MAX_REGIONS
+            )
+            cls._instance.start()
+        return cls._instance
+
+    def start(self):
+        """
+        Starts the workers and returns at once: each worker thread loads and warms up its
+        engines, then serves jobs (`ready` once all did). Jobs submitted meanwhile queue.
+        """
+        logger.info(f"🧵 Starting inference pool: {self.workers} {self.mode} worker(s) x "
+                    f"{self._threads_per_worker} threads, queue={self.queue_size} per lane")
+        self._started = time.monotonic()
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker_main, args=(i,), name=f"ocr-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def _worker_main(self, index: int):
+        try:
+            if self.mode == "process":
+                # Children load their models in parallel
+                backend = _ProcessWorker(self._threads_per_worker, self._max_jobs, self._max_rss_mb)
+                backend.wait_ready()
+            else:
+                backend = _ThreadWorker(self._threads_per_worker)
+        except Exception as e:
+            logger.error(f"🔥 OCR worker {index} failed to start: {e}")
+            self.startup_error = str(e)
+            return
+
+        ready_s = time.monotonic() - self._started
+        with self._lock:
+            self._backends.append(backend)
+            self._ready_s.append(round(ready_s, 3))
+            ready = len(self._backends) == self.workers
+        if ready:
+            logger.info(f"🚀 Inference pool ready in {ready_s:.1f}s")
+        self._worker_loop(backend)
+
+    @property
+    def ready(self) -> bool:
+        """All workers loaded and warmed up their preloaded engines."""
+        return len(self._backends) == self.workers
+
+    def startup(self) -> dict:
+        """Startup profile: seconds from pool start to each worker being ready, engine load/warmup times."""
+        return {
+            "workers_ready": len(self._backends),
+            "workers": self.workers,
+            "elapsed_s": round(time.monotonic() - self._started, 3),
+            "ready_s": list(self._ready_s),
+            "engines": [backend.load_times for backend in self._backends],
+            "error": self.startup_error,
+        }
+
+    def shutdown(self):
+        # Queued jobs still run, then every worker gets None
+        self._scheduler.close()
+        for t in self._threads:
+            t.join(timeout=10)
+        self._threads.clear()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._scheduler.depth()
+
+    def lanes(self) -> dict:
+        """{lane: {"queued", "dropped"}}"""
+        return {lane: {"queued": self._scheduler.depth(lane), "dropped": self._scheduler.dropped[lane]}
+                for lane in LANES}
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def memory_mb(self) -> float:
+        """Resident memory of the engines: this process plus the worker processes."""
+        pids = {os.getpid()} | {backend.pid for backend in self._backends}
+        return sum(_rss_mb(pid) for pid in pids)
+
+    async def submit(self, fn, *args, profile: str = "default", timeout: float = None,
+                     lane: str = "interactive", deadline: float = None, units: int = 0):
+        """
+        Schedules `fn(ocr, *args)` on a worker and awaits the result.
+        `ocr` is the worker's engine for `profile` (loaded on first use).
+        `lane` is the priority lane (LANES); `deadline` the Unix time the caller
+        stops waiting at, which shortens the timeout; `units` the size of a
+        coalescable job (0 = runs alone).
+        Raises EngineBusyError when the lane is full and
+        InferenceTimeoutError when the job exceeds the timeout or the deadline.
+        """
+        timeout = timeout or self.timeout
+        if deadline is not None:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                self._scheduler.drop(lane)
+                raise InferenceTimeoutError("Client deadline already passed")
+            timeout = min(timeout, remaining)
+        job = _Job(fn, args, profile, timeout, lane, units)
+        try:
+            self._scheduler.put_nowait(job)
+        except queue.Full:
+            raise EngineBusyError(self.retry_after)
+
+        try:
+            result = await asyncio.wait_for(asyncio.wrap_future(job.future), timeout)
+        except asyncio.TimeoutError:
+            # Cancelling only works while queued: a running job finishes and its result is dropped
+            job.future.cancel()
+            raise InferenceTimeoutError(f"OCR job exceeded {timeout:.0f}s")
+        finally:
+            if job.started is not None:
+                observe_stages({"queue_wait": job.started - job.enqueued, **job.timings})
+        return result
+
+    def _start(self, job, now: float) -> bool:
+        """Marks a dequeued job running; False (and the job dropped) when nobody waits for it anymore."""
+        # Skips jobs whose caller already gave up (timeout/disconnect)
+        if not job.future.set_running_or_notify_cancel():
+            self._scheduler.drop(job.lane)
+            return False
+        if job.deadline <= now:
+            # The caller is timing out right now: don't spend a worker on it
+            self._scheduler.drop(job.lane)
+            job.future.set_exception(InferenceTimeoutError("Deadline passed while queued"))
+            return False
+        job.started = now
+        return True
+
+    def _worker_loop(self, backend):
+        while True:
+            job = self._scheduler.get()
+            if job is None:
+                break
+
+            now = time.monotonic()
+            group = [job] + self._scheduler.take_compatible(job, self.coalesce_max)
+            group = [j for j in group if self._start(j, now)]
+            if not group:
+                continue
+            # The dequeued job may have been dropped: the call is built from the first one left
+            head = group[0]
+
+            with self._lock:
+                self._in_flight += len(group)
+            try:
+                timeout = min(j.deadline for j in group) - now
+                if len(group) == 1:
+                    result, timings = backend.run(head.fn, head.args, head.profile, timeout)
+                    results = [result]
+                else:
+                    args = tuple(a for j in group for a in j.args)
+                    results, timings = backend.run(head.fn.coalesced, args, head.profile, timeout)
+                for j, result in zip(group, results):
+                    j.timings = timings
+                    j.future.set_result(result)
+            except BaseException as e:
+                for j in group:
+                    j.future.set_exception(e)
+            finally:
+                with self._lock:
+                    self._in_flight -= len(group)
+            backend.after_job()
+
+        backend.close()
@@ -0,0 +1,238 @@
+"""
+Prometheus-style metrics (text exposition format, no extra dependency).
+
+Stage timers:
+  with stage("resize"): ...
+record into the current pipeline run when one is being collected (`collect()`,
+used by the inference workers, also inside worker processes). The pool hands the
+timings back to the request that submitted the job, where they are observed in
+the `rok_stage_seconds` histogram labeled by route and, with RESPONSE_TIMINGS,
+returned in a `Server-Timing` response header.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from app.core.config import settings
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 25.0)
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues):
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        for labelvalues, series in items:
+            labels = _labels(self.labelnames, labelvalues)
+            for bound, count in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{_labels(self.labelnames, labelvalues, le=bound)} {count}')
+            lines.append(f'{self.name}_bucket{_labels(self.labelnames, labelvalues, le="+Inf")} {series[-1]}')
+            lines.append(f"{self.name}_sum{labels} {series[-2]:.6f}")
+            lines.append(f"{self.name}_count{labels} {series[-1]}")
+        return lines
+
+
+class Gauge:
+    """Value read from a callback at scrape time."""
+
+    def __init__(self, name: str, documentation: str, fn):
+        self.name = name
+        self.documentation = documentation
+        self.fn = fn
+
+    def render(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge", f"{self.name} {self.fn()}"]
+
+
+def _escape(value) -> str:
+    """Label value escaping of the text exposition format (backslash, double quote, newline)."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values, le=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if le is not None:
+        pairs.append(f'le="{le}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+REQUEST_SECONDS = Histogram("rok_request_seconds", "End-to-end request latency.", ("route", "status"))
+STAGE_SECONDS = Histogram("rok_stage_seconds", "Time spent per pipeline stage.", ("route", "stage"))
+
+_gauges = []
+
+
+def register_gauge(name: str, documentation: str, fn):
+    _gauges.append(Gauge(name, documentation, fn))
+
+
+def render() -> str:
+    lines = REQUEST_SECONDS.render() + STAGE_SECONDS.render()
+    for gauge in _gauges:
+        try:
+            lines += gauge.render()
+        except Exception:
+            # A failing gauge must not take down the whole scrape
+            continue
+    return "\n".join(lines) + "\n"
+
+
+# --- Stage timers (pipeline side) ---
+
+_local = threading.local()
+
+
+@contextmanager
+def collect():
+    """Collects the stage timings recorded by this thread while the block runs."""
+    _local.timings = timings = {}
+    try:
+        yield timings
+    finally:
+        _local.timings = None
+
+
+@contextmanager
+def stage(name: str):
+    timings = getattr(_local, "timings", None)
+    if timings is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + time.perf_counter() - t0
+
+
+class _TimedPredictor:
+    """Wraps a PaddleOCR predictor (detector/recognizer) so every call is a stage."""
+
+    def __init__(self, predictor, name: str):
+        self._predictor = predictor
+        self._name = name
+
+    def __call__(self, *args, **kwargs):
+        with stage(self._name):
+            return self._predictor(*args, **kwargs)
+
+    def __getattr__(self, item):
+        return getattr(self._predictor, item)
+
+
+def instrument_engine(ocr):
+    """Times detection and recognition inside every PaddleOCR call (full passes and batches)."""
+    for attr, name in (("text_detector", "ocr_det"), ("text_recognizer", "ocr_rec")):
+        predictor = getattr(ocr, attr, None)
+        if predictor is not None and not isinstance(predictor, _TimedPredictor):
+            setattr(ocr, attr, _TimedPredictor(predictor, name))
+    return ocr
+
+
+# --- Request side ---
+
+def _route_template(scope) -> str:
+    """
+    Path template of the route that matched ("/jobs/{job_id}/events"), "unmatched" before
+    routing or for unknown paths: raw paths with ids would add a metric series per job.
+    Rebuilt from the path parameters, as the matched route's own `path` lacks the router
+    prefix on newer FastAPI versions.
+    """
+    if "endpoint" not in scope:
+        return "unmatched"
+    names = {str(value): name for name, value in scope.get("path_params", {}).items()}
+    return "/".join(f"{{{names[part]}}}" if part in names else part for part in scope["path"].split("/"))
+
+
+class _RequestTimings:
+    __slots__ = ("scope", "timings")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.timings = {}
+
+    @property
+    def route(self) -> str:
+        return _route_template(self.scope)
+
+
+_request = ContextVar("rok_request_timings", default=None)
+
+
+def current_route() -> str:
+    current = _request.get()
+    return current.route if current else "none"
+
+
+def observe_stages(timings: dict, route: str = None):
+    """Adds stage timings (seconds) to the current request and to the histogram."""
+    current = _request.get()
+    route = route or current_route()
+    for name, seconds in timings.items():
+        STAGE_SECONDS.observe(seconds, route, name)
+        if current is not None:
+            current.timings[name] = current.timings.get(name, 0.0) + seconds
+
+
+@contextmanager
+def timed(name: str):
+    """Times a stage that runs in the request's own context (e.g. an awaited decode)."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stages({name: time.perf_counter() - t0})
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware: times every request and, with RESPONSE_TIMINGS,
+    adds a `Server-Timing` header with the stages measured before the response started.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            return await self.app(scope, receive, send)
+
+        current = _RequestTimings(scope)
+        token = _request.set(current)
+        status = [500]
+        t0 = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                if settings.RESPONSE_TIMINGS and current.timings:
+                    value = ", ".join(f"{k};dur={v * 1000:.1f}" for k, v in current.timings.items())
+                    message["headers"] = list(message.get("headers", [])) + [(b"server-timing", value.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUEST_SECONDS.observe(time.perf_counter() - t0, current.route, status[0])
+            _request.reset(token)
@@ -0,0 +1,71 @@
+import numpy as np
+from multiprocessing import shared_memory
+
+
+class SharedFrame:
+    """
+    Picklable handle to an ndarray stored in a SharedMemory block.
+    Only (name, shape, dtype) crosses the process boundary, the pixels never get pickled.
+    The process that publishes a frame owns the block and must release() it.
+    """
+    __slots__ = ("name", "shape", "dtype")
+
+    def __init__(self, name: str, shape: tuple, dtype: str):
+        self.name = name
+        self.shape = shape
+        self.dtype = dtype
+
+    def __getstate__(self):
+        return (self.name, self.shape, self.dtype)
+
+    def __setstate__(self, state):
+        self.name, self.shape, self.dtype = state
+
+    @classmethod
+    def publish(cls, arr: np.ndarray):
+        """Copies `arr` into a new shared block. Returns (handle, block)."""
+        shm = shared_memory.SharedMemory(create=True, size=max(1, arr.nbytes))
+        view = np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)
+        view[...] = arr
+        del view
+        return cls(shm.name, arr.shape, arr.dtype.str), shm
+
+    def attach(self):
+        """Maps the block without copying. Returns (block, ndarray view); close the block when done."""
+        shm = shared_memory.SharedMemory(name=self.name)
+        return shm, np.ndarray(self.shape, dtype=np.dtype(self.dtype), buffer=shm.buf)
+
+    @staticmethod
+    def release(shm, unlink: bool = True):
+        shm.close()
+        if unlink:
+            try:
+                shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def share_values(values):
+    """Replaces every ndarray of a tuple with a SharedFrame. Returns (values, owned_blocks)."""
+    out, blocks = [], []
+    for v in values:
+        if isinstance(v, np.ndarray):
+            handle, shm = SharedFrame.publish(v)
+            out.append(handle)
+            blocks.append(shm)
+        else:
+            out.append(v)
+    return tuple(out), blocks
+
+
+def attach_values(values):
+    """Inverse of share_values on the consumer side: SharedFrame -> zero-copy view. Returns (values, attached_blocks)."""
+    out, blocks = [], []
+    for v in values:
+        if isinstance(v, SharedFrame):
+            shm, arr = v.attach()
+            out.append(arr)
+            blocks.append(shm)
+        else:
+            out.append(v)
+    return tuple(out), blocks
@@ -1,8 +1,14 @@
 import logging
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
 from contextlib import asynccontextmanager
-from app.core.engine import OcrEngine
-from app.api.routes import governor, reports, batch, inventory
+from app.core import metrics
+from app.core.inference import InferencePool, LANES
+from app.api.dispatch import priority
+from app.services.image_cache import ImageCache
+from app.services.result_cache import ResultCache
+from app.api.routes import governor, reports, batch, inventory, auto, jobs, rankings
+from app.services.jobs import JobStore
 
 # Logging Setup
 logging.basicConfig(
@@ -15,12 +21,35 @@ logger = logging.getLogger(__name__)
 # Lifespan Events (Novo jeito do FastAPI gerenciar Startup/Shutdown)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup: Força o carregamento do modelo na memória
+    # Startup: the workers load and warm up their models in the background (/readyz says when done);
+    # the API answers /livez right away
     logger.info("♻️ Warming up OCR Engine...")
-    OcrEngine.get_instance()
+    pool = InferencePool.get_instance()
+    metrics.register_gauge("rok_queue_depth", "Jobs waiting for an inference worker.", lambda: pool.queue_depth)
+    for lane in LANES:
+        metrics.register_gauge(f"rok_queue_depth_{lane}", f"Jobs waiting in the {lane} lane.",
+                               lambda lane=lane: pool.lanes()[lane]["queued"])
+        metrics.register_gauge(f"rok_dropped_jobs_{lane}", f"Queued {lane} jobs dropped (caller gone, deadline passed).",
+                               lambda lane=lane: pool.lanes()[lane]["dropped"])
+    metrics.register_gauge("rok_in_flight", "Jobs running on the inference workers.", lambda: pool.in_flight)
+    metrics.register_gauge("rok_workers", "Inference workers.", lambda: pool.workers)
+    metrics.register_gauge("rok_engine_memory_bytes", "Resident memory of the OCR engines (all worker processes).",
+                           lambda: int(pool.memory_mb() * 1024 * 1024))
+    metrics.register_gauge("rok_image_cache_bytes", "Decoded screenshots held for image handles.",
+                           lambda: ImageCache.get_instance().size_bytes)
+    # Bulk jobs left unfinished by the last run resume here
+    runner = jobs.JobRunner.get_instance()
+    try:
+        runner.start()
+        metrics.register_gauge("rok_job_items_pending", "Bulk job images not read yet.",
+                               lambda: JobStore.get_instance().pending())
+    except Exception as e:
+        logger.error(f"🔥 Bulk jobs disabled, job store cannot be opened: {e}")
     yield
-    # Shutdown logic if needed
+    # Shutdown: Libera os workers
     logger.info("🛑 Shutting down...")
+    await runner.stop()
+    pool.shutdown()
 
 app = FastAPI(
     title="RoK Vision API",
@@ -28,16 +57,54 @@ app = FastAPI(
     version="1.0.0",
     lifespan=lifespan
 )
+app.add_middleware(metrics.MetricsMiddleware)
 
-# Routes
-app.include_router(governor.router, prefix="/governor", tags=["Governor Profile"])
-app.include_router(reports.router, prefix="/reports", tags=["Battle Reports"])
-app.include_router(batch.router, prefix="/batch", tags=["Batch Processing"])
-app.include_router(inventory.router, prefix="/inventory", tags=["Inventory UI"])
+# Routes (each with its default priority lane, see dispatch.priority)
+app.include_router(governor.router, prefix="/governor", tags=["Governor Profile"],
+                   dependencies=[Depends(priority("interactive"))])
+app.include_router(reports.router, prefix="/reports", tags=["Battle Reports"],
+                   dependencies=[Depends(priority("bulk"))])
+app.include_router(batch.router, prefix="/batch", tags=["Batch Processing"],
+                   dependencies=[Depends(priority("magnifier"))])
+app.include_router(inventory.router, prefix="/inventory", tags=["Inventory UI"],
+                   dependencies=[Depends(priority("interactive"))])
+app.include_router(rankings.router, prefix="/rankings", tags=["Rankings & Member Lists"],
+                   dependencies=[Depends(priority("interactive"))])
+app.include_router(auto.router, prefix="/auto", tags=["Auto Detection"],
+                   dependencies=[Depends(priority("interactive"))])
+app.include_router(jobs.router, prefix="/jobs", tags=["Bulk Jobs"])  # Runs in the bulk lane (JobRunner)
+
+@app.get("/livez")
+async def liveness():
+    # The process serves requests (restart it otherwise); says nothing about the models
+    return {"status": "alive"}
+
+@app.get("/readyz")
+async def readiness():
+    # 503 until every worker has loaded and warmed up its engines: route traffic here only after
+    pool = InferencePool.get_instance()
+    body = {"status": "ready" if pool.ready else "starting", **pool.startup()}
+    return JSONResponse(body, status_code=200 if pool.ready else 503)
 
 @app.get("/health")
 async def health_check():
-    return {"status": "online", "engine": "PaddleOCR v4 optimized"}
+    # Answers even under load: OCR runs on the inference pool, never on the event loop
+    pool = InferencePool.get_instance()
+    return {
+        "status": "online" if pool.ready else "starting",
+        "engine": "PaddleOCR v4 optimized",
+        "workers": pool.workers,
+        "queue_depth": pool.queue_depth,
+        "lanes": pool.lanes(),
+        "in_flight": pool.in_flight,
+        "result_cache": ResultCache.get_instance().stats(),
+        "jobs": {"pending": JobStore._instance.pending() if JobStore._instance else None}
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    # Prometheus text format: request/stage latency histograms + pool gauges
+    return metrics.render()
 
 if __name__ == "__main__":
     import uvicorn
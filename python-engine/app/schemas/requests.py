@@ -1,15 +1,33 @@
-from pydantic import BaseModel
-from typing import List
+from pydantic import BaseModel, model_validator
+from typing import List, Optional
 
 class OcrRequest(BaseModel):
     imageBase64: str
+    profile: Optional[str] = None     # Engine profile (OCR_PROFILES); None = "default"
+
+class ScreenRequest(OcrRequest):
+    previousHandle: Optional[str] = None  # image_handle of an earlier capture of this screen: only changes are re-read
+
+class ReportRequest(OcrRequest):
+    saveProcessedImage: bool = True   # False = no processed image on the shared volume (processed_image_path = "")
 
 # --- NOVOS MODELOS PARA BATCH ---
 class CropRegion(BaseModel):
     id: str             # Identificador (ex: "node_1")
     box: List[int]      # [x, y, w, h]
     strategy: str       # "standard", "binary", "inverted", etc.
+    det: bool = True    # False = the crop is already a single text line (recognition-only)
+    digits: bool = False  # Numeric field: no detector, projection-profile lines, digits-only decoding
+    profile: Optional[str] = None   # Engine profile for this region (None = the request's profile)
 
 class BatchAnalyzeRequest(BaseModel):
-    imageBase64: str
-    regions: List[CropRegion]
\ No newline at end of file
+    imageBase64: Optional[str] = None
+    imageHandle: Optional[str] = None   # "image_handle" returned by an analyze call (skips re-upload)
+    regions: List[CropRegion]
+    profile: Optional[str] = None       # Default engine profile of the regions
+
+    @model_validator(mode="after")
+    def _require_image(self):
+        if not self.imageBase64 and not self.imageHandle:
+            raise ValueError("Either imageBase64 or imageHandle is required")
+        return self
@@ -0,0 +1,102 @@
+import cv2
+import numpy as np
+import logging
+
+from app.services.image_processing import ImageProcessor
+from app.services.color_map import ColorMap
+
+logger = logging.getLogger(__name__)
+
+# Thumbnail-sized closing: text and icons are only a few pixels wide here
+BLOB_KERNEL = cv2.getStructuringElement(cv2.MORPH_RECT, (5, 5))
+
+class ScreenClassifier:
+    """
+    Tells which pipeline a screenshot belongs to BEFORE any OCR, from a 256px
+    thumbnail (a few ms even on 4K):
+      - paper:  largest beige blob (isolate_paper's HSV range) and its mean saturation;
+      - panel:  largest light low-saturation blob (the governor profile panel);
+      - rarity: share of bright rarity-colored pixels (ColorMap classes), i.e. item
+        tiles, over the whole frame and over its central half.
+    Report paper and the profile panel both fall in the beige range; the paper is
+    the more saturated of the two. Anything else is treated as a generic UI
+    (inventory pipeline), like the clients did before.
+    """
+
+    KINDS = ("report", "governor", "inventory")
+    THUMB_WIDTH = 256
+
+    MIN_CONTAINER = 0.15       # Same minimum area isolate_paper accepts as "paper found"
+    MIN_PANEL = 0.30           # Same minimum as find_profile_panel
+    PAPER_MIN_SATURATION = 45  # Mean HSV saturation of the container: report paper above, profile panel below
+    MIN_RARITY = 0.08          # Rarity-colored share of the frame center that makes it an item grid
+    TILE_MIN_VALUE = 110       # HSV value of item tiles (the dark game backgrounds stay below)
+
+    @classmethod
+    def classify(cls, img):
+        """Returns {"type", "confidence", "features"} for a decoded BGR frame."""
+        features = cls.features(img)
+        kind, confidence = cls.decide(features)
+        return {"type": kind, "confidence": round(confidence, 2),
+                "features": {k: round(v, 3) for k, v in features.items()}}
+
+    @classmethod
+    def features(cls, img):
+        h, w = img.shape[:2]
+        scale = min(1.0, cls.THUMB_WIDTH / float(w))
+        # INTER_LINEAR: INTER_AREA costs ~10ms at non-integer ratios, and blob shares don't need it
+        thumb = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_LINEAR) if scale < 1.0 else img
+        th, tw = thumb.shape[:2]
+        hsv = cv2.cvtColor(thumb, cv2.COLOR_BGR2HSV)
+
+        paper, paper_sat = cls._largest_blob(hsv, *ImageProcessor.PAPER_HSV)
+        panel, _ = cls._largest_blob(hsv, *ImageProcessor.PANEL_HSV)
+
+        # Rarity tiles are bright: dark UI backgrounds share their hues but not their value
+        tiles = (ColorMap.label_map(thumb) != 255) & (hsv[..., 2] >= cls.TILE_MIN_VALUE)
+        rarity = float(np.count_nonzero(tiles)) / tiles.size
+        center = tiles[th // 4:th - th // 4, tw // 4:tw - tw // 4]
+        rarity_center = float(np.count_nonzero(center)) / max(1, center.size)
+
+        return {
+            "paper": paper,
+            "paper_saturation": paper_sat,
+            "panel": panel,
+            "rarity": rarity,
+            "rarity_center": rarity_center,
+        }
+
+    @staticmethod
+    def _largest_blob(hsv, lower, upper):
+        """(share of the frame covered by the largest blob in the HSV range, its mean saturation)."""
+        mask = cv2.inRange(hsv, lower, upper)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, BLOB_KERNEL)
+        n, blobs, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=4)
+        if n <= 1:
+            return 0.0, 0.0
+        best = 1 + int(np.argmax(stats[1:, cv2.CC_STAT_AREA]))
+        share = float(stats[best, cv2.CC_STAT_AREA]) / mask.size
+        saturation = float(cv2.mean(hsv[..., 1], mask=(blobs == best).astype(np.uint8))[0])
+        return share, saturation
+
+    @classmethod
+    def decide(cls, f):
+        """(kind, confidence 0-1) from the features; confidence grows with the margin over the threshold."""
+        def margin(value, threshold):
+            return min(1.0, 0.5 + (value - threshold) / (2.0 * threshold))
+
+        # Item grids: many saturated tiles in the middle of the screen, no big container
+        if f["rarity_center"] >= cls.MIN_RARITY and f["paper"] < cls.MIN_PANEL:
+            return "inventory", margin(f["rarity_center"], cls.MIN_RARITY)
+
+        if f["paper"] >= cls.MIN_CONTAINER:
+            if f["paper_saturation"] >= cls.PAPER_MIN_SATURATION:
+                return "report", margin(f["paper_saturation"], cls.PAPER_MIN_SATURATION)
+            if f["panel"] >= cls.MIN_PANEL:
+                return "governor", margin(cls.PAPER_MIN_SATURATION, max(f["paper_saturation"], 1.0))
+
+        if f["panel"] >= cls.MIN_PANEL:
+            return "governor", margin(f["panel"], cls.MIN_PANEL)
+
+        # Generic UI (rankings, chat, lists): the inventory pipeline reads small text on busy backgrounds
+        return "inventory", 0.3
@@ -0,0 +1,137 @@
+import cv2
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+class ColorMap:
+    """
+    Rarity color lookup for MANY boxes of the same frame.
+    The frame is converted to HSV once, every pixel gets its rarity class, and one
+    integral image per class turns "how many Gold pixels in this box" into 4 lookups,
+    instead of cvtColor + 6x inRange/countNonZero per OCR line.
+    """
+
+    COLORS = ("Red", "Gold", "Green", "Blue", "Purple")
+
+    # (class, hue_min, hue_max, sat_min, val_min), adjusted for RoK artistic style.
+    # OpenCV uses Hue 0-179; saturation/value have no upper bound (255).
+    RANGES = (
+        (0, 0, 10, 70, 50),      # Red
+        (0, 170, 180, 70, 50),   # Red wraps around
+        (1, 15, 35, 70, 70),     # Gold: Legendary Books / Generic Speedups
+        (2, 36, 85, 50, 50),     # Green: AP Potions / Food / Elite items (greenish background)
+        (3, 86, 125, 60, 60),    # Blue: Rare Books / Gems / Wood
+        (4, 126, 165, 60, 60),   # Purple: Epic Books / Epic items
+    )
+
+    # Below this share of the box, the dominant color is noise (e.g. just white text)
+    MIN_SHARE = 0.05
+
+    _NONE = 255
+    _class_lut = None
+    _sat_lut = None
+    _val_lut = None
+
+    def __init__(self, img, roi=None):
+        """`roi` = (x_min, y_min, x_max, y_max) limits the work to the part of the frame that will be queried."""
+        h, w = img.shape[:2]
+        x0, y0, x1, y1 = roi if roi is not None else (0, 0, w, h)
+        self.roi = (x0, y0, x1, y1)
+        labels = self.label_map(img[y0:y1, x0:x1])
+        rh, rw = labels.shape[:2]
+        # Integral images are (H+1, W+1): box sums need no bounds special-casing
+        self._integrals = np.empty((len(self.COLORS), rh + 1, rw + 1), np.int32)
+        for k in range(len(self.COLORS)):
+            mask = cv2.bitwise_and(cv2.compare(labels, k, cv2.CMP_EQ), 1)
+            cv2.integral(mask, self._integrals[k], sdepth=cv2.CV_32S)
+
+    @classmethod
+    def classify(cls, img, boxes):
+        """Dominant color of every box of `img`, building the map only over the boxes' bounding area."""
+        h, w = img.shape[:2]
+        b = cls._clip(boxes, (0, 0, w, h))
+        if len(b) == 0:
+            return []
+        area = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+        roi = (int(b[:, 0].min()), int(b[:, 1].min()), int(b[:, 2].max()), int(b[:, 3].max()))
+        if 2 * area.sum() < (roi[2] - roi[0]) * (roi[3] - roi[1]):
+            # Sparse boxes: labelling just the boxes is cheaper than the map + integrals
+            counts = np.array([cls.count_crop(img[y0:y1, x0:x1]) for x0, y0, x1, y1 in b])
+            return cls.pick(counts, area)
+        return cls(img, roi).dominant(b)
+
+    @classmethod
+    def count_crop(cls, crop_img):
+        """Pixel count of every class in a whole crop."""
+        if crop_img.size == 0:
+            return np.zeros(len(cls.COLORS), np.intp)
+        labels = cls.label_map(crop_img)
+        return np.bincount(labels.ravel(), minlength=256)[:len(cls.COLORS)]
+
+    @classmethod
+    def _luts(cls):
+        # Hue ranges are disjoint, so each hue maps to at most one class (built once per process)
+        if cls._class_lut is None:
+            class_lut = np.full(256, cls._NONE, np.uint8)
+            sat_lut = np.zeros(256, np.uint8)
+            val_lut = np.zeros(256, np.uint8)
+            for k, h_min, h_max, s_min, v_min in cls.RANGES:
+                class_lut[h_min:h_max + 1] = k
+                sat_lut[h_min:h_max + 1] = s_min
+                val_lut[h_min:h_max + 1] = v_min
+            cls._class_lut, cls._sat_lut, cls._val_lut = class_lut, sat_lut, val_lut
+        return cls._class_lut, cls._sat_lut, cls._val_lut
+
+    @classmethod
+    def label_map(cls, img):
+        """Per-pixel class index into COLORS (255 = no rarity color)."""
+        class_lut, sat_lut, val_lut = cls._luts()
+        hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+        h, s, v = cv2.split(hsv)
+        labels = cv2.LUT(h, class_lut)
+        # 255 where saturation or value is below the class minimum
+        weak = cv2.bitwise_or(cv2.compare(s, cv2.LUT(h, sat_lut), cv2.CMP_LT),
+                              cv2.compare(v, cv2.LUT(h, val_lut), cv2.CMP_LT))
+        return cv2.max(labels, weak)
+
+    def counts(self, boxes):
+        """
+        Pixel count of every class inside every box.
+        boxes: (N, 4) array of [x_min, y_min, x_max, y_max] (frame coordinates, exclusive max),
+        clipped to the roi.
+        Returns (N, len(COLORS)) int array.
+        """
+        b = np.asarray(boxes, dtype=np.intp).reshape(-1, 4) - np.tile(self.roi[:2], 2)
+        x0, y0, x1, y1 = b[:, 0], b[:, 1], b[:, 2], b[:, 3]
+        I = self._integrals
+        sums = I[:, y1, x1] - I[:, y0, x1] - I[:, y1, x0] + I[:, y0, x0]
+        return sums.T
+
+    def dominant(self, boxes):
+        """Dominant rarity color of every box: 'Red', 'Gold', 'Green', 'Blue', 'Purple' or 'Unknown'."""
+        b = self._clip(boxes, self.roi)
+        if len(b) == 0:
+            return []
+        area = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+        return self.pick(self.counts(b), area)
+
+    @classmethod
+    def pick(cls, counts, area):
+        """Class with the most pixels per row of `counts`, 'Unknown' below MIN_SHARE of `area`."""
+        counts = np.atleast_2d(counts)
+        # argmax keeps the first class on ties (COLORS order)
+        best = counts.argmax(axis=1)
+        best_count = counts[np.arange(len(counts)), best]
+        known = (np.asarray(area) > 0) & (best_count >= np.asarray(area) * cls.MIN_SHARE)
+        return [cls.COLORS[k] if ok else "Unknown" for k, ok in zip(best, known)]
+
+    @staticmethod
+    def _clip(boxes, bounds):
+        x0, y0, x1, y1 = bounds
+        b = np.asarray(boxes, dtype=np.intp).reshape(-1, 4).copy()
+        b[:, [0, 2]] = np.clip(b[:, [0, 2]], x0, x1)
+        b[:, [1, 3]] = np.clip(b[:, [1, 3]], y0, y1)
+        b[:, 2] = np.maximum(b[:, 2], b[:, 0])
+        b[:, 3] = np.maximum(b[:, 3], b[:, 1])
+        return b
@@ -0,0 +1,87 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class ImageCache:
+    """
+    LRU cache of DECODED screenshots keyed by the content hash of the encoded bytes
+    (the "image handle" returned by the analyze endpoints).
+    Magnifier rescans (/batch/process) send the handle instead of re-uploading the
+    screenshot, so the second upload and decode disappear from every auto-healing round.
+    Bounded by total ndarray bytes; entries expire after `ttl` seconds without use.
+    """
+    _instance = None
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # handle -> (img, expires_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            cls._instance = cls(
+                max_bytes=settings.IMAGE_CACHE_MAX_MB * 1024 * 1024,
+                ttl=settings.IMAGE_CACHE_TTL
+            )
+        return cls._instance
+
+    @staticmethod
+    def content_hash(data) -> str:
+        """Handle of an encoded image: same bytes -> same handle, whatever the transport."""
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+    def get(self, handle: str):
+        """Returns the cached ndarray (read-only) or None when unknown/expired."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(handle)
+            if entry is None:
+                return None
+            img, expires_at = entry
+            if expires_at < now:
+                self._drop(handle)
+                return None
+            # Sliding TTL: every Magnifier round keeps the screenshot alive
+            self._entries[handle] = (img, now + self.ttl)
+            self._entries.move_to_end(handle)
+            return img
+
+    def put(self, handle: str, img):
+        if img is None or img.nbytes > self.max_bytes:
+            return
+        # Shared between requests: pipelines must never modify it in place
+        img.flags.writeable = False
+        now = time.monotonic()
+        with self._lock:
+            if handle in self._entries:
+                self._drop(handle)
+            self._entries[handle] = (img, now + self.ttl)
+            self._bytes += img.nbytes
+            self._evict(now)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _drop(self, handle: str):
+        img, _ = self._entries.pop(handle)
+        self._bytes -= img.nbytes
+
+    def _evict(self, now: float):
+        for handle in [h for h, (_, exp) in self._entries.items() if exp < now]:
+            self._drop(handle)
+        # Least recently used first
+        while self._bytes > self.max_bytes and self._entries:
+            self._drop(next(iter(self._entries)))
@@ -1,29 +1,89 @@
 import cv2
 import numpy as np
 import base64
+import io
 import logging
+import threading
+
+from app.services.color_map import ColorMap
 
 # Configure logger for this module
 logger = logging.getLogger(__name__)
 
+# Kernels are built once at import, not on every call
+SHARPEN_KERNEL = np.array([[-1, -1, -1], [-1, 9, -1], [-1, -1, -1]], dtype=np.float32)
+CONTAINER_KERNEL = cv2.getStructuringElement(cv2.MORPH_RECT, (25, 25))   # Closes text/icon holes in paper & panel masks
+DOT_KERNEL = cv2.getStructuringElement(cv2.MORPH_RECT, (2, 2))           # WhiteIsolation noise cleaning / thickening
+EDGE_KERNEL = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))       # find_text_lines character edges
+LINE_KERNEL = cv2.getStructuringElement(cv2.MORPH_RECT, (11, 3))         # find_text_lines: edges -> line blobs
+
+_scratch = threading.local()
+
+def _buffer(name, shape, dtype=np.uint8):
+    """
+    Per-thread scratch array for an intermediate result (passed as `dst=`).
+    Only grows: regions of different sizes share the same memory. Never return one
+    to a caller, the next call on this thread overwrites it.
+    """
+    size = int(np.prod(shape))
+    buf = getattr(_scratch, name, None)
+    if buf is None or buf.size < size or buf.dtype != dtype:
+        buf = np.empty(size, dtype=dtype)
+        setattr(_scratch, name, buf)
+    return buf[:size].reshape(shape)
+
 class ImageProcessor:
+
+    # HSV ranges of the two light containers of the game UI (also used by ScreenClassifier)
+    PAPER_HSV = (np.array([5, 15, 90]), np.array([40, 180, 255]))    # Beige report paper, optimized for RoK
+    PANEL_HSV = (np.array([0, 0, 160]), np.array([180, 70, 255]))     # Governor profile panel (low saturation)
+    # Filters of process_region; any other strategy name gets the default grayscale
+    STRATEGIES = ("HighContrastBinary", "InvertedBinary", "WhiteIsolation", "Sharpen")
     
     @staticmethod
     def base64_to_cv2(b64_str: str):
         """Converts Base64 string to OpenCV format (BGR)."""
+        img_bytes = ImageProcessor.base64_to_bytes(b64_str)
+        if img_bytes is None:
+            return None
+        return ImageProcessor.bytes_to_cv2(img_bytes)
+
+    @staticmethod
+    def base64_to_bytes(b64_str: str):
+        """Converts Base64 string to the encoded image bytes (PNG/JPG)."""
         try:
             # Remove header if present (e.g., "data:image/png;base64,")
             if "," in b64_str:
                 b64_str = b64_str.split(",")[1]
                 
-            img_bytes = base64.b64decode(b64_str)
-            nparr = np.frombuffer(img_bytes, np.uint8)
-            img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-            return img
+            return base64.b64decode(b64_str)
         except Exception as e:
             logger.error(f"Error decoding base64: {e}")
             return None
 
+    @staticmethod
+    def bytes_to_cv2(buf):
+        """
+        Decodes an encoded image (PNG/JPG/WebP) straight from a bytes-like buffer.
+        np.frombuffer wraps the request buffer without copying it.
+        Also accepts the raw .npy processed images written by the storage service.
+        """
+        try:
+            if bytes(buf[:6]) == b"\x93NUMPY":
+                return ImageProcessor._npy_to_cv2(buf)
+            nparr = np.frombuffer(buf, np.uint8)
+            return cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        except Exception as e:
+            logger.error(f"Error decoding image bytes: {e}")
+            return None
+
+    @staticmethod
+    def _npy_to_cv2(buf):
+        img = np.load(io.BytesIO(buf), allow_pickle=False)
+        if img.dtype != np.uint8 or img.ndim not in (2, 3):
+            return None
+        return cv2.cvtColor(img, cv2.COLOR_GRAY2BGR) if img.ndim == 2 else img
+
     @staticmethod
     def resize_if_needed(img, max_width=1920):
         """
@@ -50,23 +110,29 @@ class ImageProcessor:
         Falls back to a central crop if detection fails.
         Returns: (processed_image, is_isolated_boolean)
         """
+        warped, is_isolated, _ = ImageProcessor.warp_paper(img)
+        return warped, is_isolated
+
+    @staticmethod
+    def warp_paper(img):
+        """
+        isolate_paper with the full-resolution search, also returning the 3x3 transform
+        from `img` to the processed image: (processed_image, is_isolated, matrix).
+        PaperLocator is the fast path; this one handles the tilted papers it can't.
+        """
         if img is None:
-            return None, False
+            return None, False, None
 
         h_orig, w_orig = img.shape[:2]
         
         # Convert to HSV color space
-        hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+        hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV, dst=_buffer("hsv", img.shape))
         
         # Optimized Beige Range for RoK
-        lower_beige = np.array([5, 15, 90])
-        upper_beige = np.array([40, 180, 255])
-        
-        mask = cv2.inRange(hsv, lower_beige, upper_beige)
+        mask = cv2.inRange(hsv, *ImageProcessor.PAPER_HSV, dst=_buffer("mask", img.shape[:2]))
         
         # Morphological operations to remove noise
-        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (25, 25))
-        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, CONTAINER_KERNEL, dst=_buffer("closed", img.shape[:2]))
         
         # Find contours
         contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
@@ -113,10 +179,18 @@ class ImageProcessor:
                 warped = cv2.warpPerspective(img, M, (maxWidth, maxHeight))
                 
                 # Return result and Success Flag
-                return warped, True
+                return warped, True, M
 
-        # FALLBACK: Safe Central Crop
-        # If isolation fails, we assume the report is centered
+        crop, M = ImageProcessor.central_crop(img)
+        return crop, False, M
+
+    @staticmethod
+    def central_crop(img):
+        """
+        FALLBACK: Safe Central Crop, when no paper is found (the report is assumed centered).
+        Returns (crop, 3x3 translation from `img` to the crop).
+        """
+        h_orig, w_orig = img.shape[:2]
         y1, y2 = int(h_orig * 0.12), int(h_orig * 0.88)
         x1, x2 = int(w_orig * 0.15), int(w_orig * 0.85)
         
@@ -124,20 +198,124 @@ class ImageProcessor:
         y1, y2 = max(0, y1), min(h_orig, y2)
         x1, x2 = max(0, x1), min(w_orig, x2)
         
-        return img[y1:y2, x1:x2], False
+        M = np.array([[1, 0, -x1], [0, 1, -y1], [0, 0, 1]], dtype=np.float64)
+        return img[y1:y2, x1:x2], M
+
+    @staticmethod
+    def find_profile_panel(img, min_area=0.30):
+        """
+        Finds the light governor profile panel (low saturation, high value).
+        Same HSV + contour approach as isolate_paper, but the panel is never
+        rotated, so a bounding rect is enough (no warp).
+        Returns (x, y, w, h) or None when no panel covers `min_area` of the frame.
+        """
+        if img is None:
+            return None
+
+        h_orig, w_orig = img.shape[:2]
+        hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV, dst=_buffer("hsv", img.shape))
+        mask = cv2.inRange(hsv, *ImageProcessor.PANEL_HSV, dst=_buffer("mask", img.shape[:2]))
+
+        # Closes the holes left by text, icons and the avatar
+        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, CONTAINER_KERNEL, dst=_buffer("closed", img.shape[:2]))
+
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if not contours:
+            return None
+        cnt = max(contours, key=cv2.contourArea)
+        if cv2.contourArea(cnt) < h_orig * w_orig * min_area:
+            return None
+        return cv2.boundingRect(cnt)
+
+    @staticmethod
+    def find_text_lines(img, regions, min_height=8, max_height=60):
+        """
+        Cheap text-line finder (no neural detector) for text on a flat background.
+        Character edges (morphological gradient) are merged horizontally into line blobs;
+        wide gaps (label vs value) keep separate lines, like PaddleOCR's detector does.
+        regions: [x_min, y_min, x_max, y_max] areas to search.
+        Returns [x_min, y_min, x_max, y_max] boxes, top-to-bottom, left-to-right.
+        """
+        if img is None:
+            return []
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+        ih, iw = gray.shape[:2]
+
+        mask = np.zeros_like(gray)
+        for x0, y0, x1, y1 in regions:
+            x0, y0 = max(0, int(x0)), max(0, int(y0))
+            x1, y1 = min(iw, int(x1)), min(ih, int(y1))
+            if x1 <= x0 or y1 <= y0:
+                continue
+            crop = gray[y0:y1, x0:x1]
+            grad = cv2.morphologyEx(crop, cv2.MORPH_GRADIENT, EDGE_KERNEL)
+            _, edges = cv2.threshold(grad, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+            # Overlapping regions: a pixel counts if any region found an edge there
+            mask[y0:y1, x0:x1] = cv2.max(mask[y0:y1, x0:x1], edges)
+
+        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, LINE_KERNEL)
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+        lines = []
+        for cnt in contours:
+            x, y, w, h = cv2.boundingRect(cnt)
+            if min_height <= h <= max_height and w >= h:
+                # A little margin: the recognizer was trained on lines with some background
+                pad = max(2, h // 5)
+                lines.append([max(0, x - pad), max(0, y - pad), min(iw, x + w + pad), min(ih, y + h + pad)])
+        lines.sort(key=lambda b: (b[1] // max(1, min_height), b[0]))
+        return lines
+
+    @staticmethod
+    def project_lines(img, min_height=6, max_gap=2):
+        """
+        Line localization for a single-field crop (Magnifier digit regions) by
+        projection profiles: rows holding ink are grouped into bands, then each band
+        is trimmed to its inked columns. Works on the binarized strategy outputs
+        (HighContrastBinary, WhiteIsolation...) and Otsu-binarizes anything else.
+        Ink is the minority class, so both text polarities work.
+        Returns [x_min, y_min, x_max, y_max] boxes, top-to-bottom.
+        """
+        if img is None or img.size == 0:
+            return []
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+        ih, iw = gray.shape[:2]
+
+        _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+        ink = binary > 0
+        if np.count_nonzero(ink) * 2 > ink.size:
+            ink = ~ink
+
+        # A row is text when more than a sliver of it is inked (ignores stray dots)
+        rows = np.flatnonzero(ink.sum(axis=1) > max(1, iw // 100))
+        if rows.size == 0:
+            return []
+        splits = np.flatnonzero(np.diff(rows) > max_gap + 1) + 1
+
+        lines = []
+        for band in np.split(rows, splits):
+            y0, y1 = int(band[0]), int(band[-1]) + 1
+            if y1 - y0 < min_height:
+                continue
+            cols = np.flatnonzero(ink[y0:y1].any(axis=0))
+            x0, x1 = int(cols[0]), int(cols[-1]) + 1
+            # Same margin as find_text_lines: the recognizer expects some background
+            pad = max(2, (y1 - y0) // 5)
+            lines.append([max(0, x0 - pad), max(0, y0 - pad), min(iw, x1 + pad), min(ih, y1 + pad)])
+        return lines
 
     @staticmethod
     def apply_filters(img):
         """Applies a sharpening filter to enhance text edges."""
         if img is None: return None
-        sharpen_kernel = np.array([[-1,-1,-1], [-1,9,-1], [-1,-1,-1]])
-        return cv2.filter2D(img, -1, sharpen_kernel)
+        return cv2.filter2D(img, -1, SHARPEN_KERNEL)
 
     @staticmethod
-    def process_region(full_img, x, y, w, h, strategy="default"):
+    def process_region(full_img, x, y, w, h, strategy="default", scale=3.0):
         """
         Crops a specific region and applies filters based on strategy.
         Used for Batch Processing / Magnifier logic.
+        `scale` is the bicubic upscale factor of the output.
         """
         if full_img is None: return None
         ih, iw = full_img.shape[:2]
@@ -149,59 +327,66 @@ class ImageProcessor:
         if w <= 0 or h <= 0:
             return None
         
-        # Crop
+        # Crop (a view: nothing is copied)
         crop = full_img[y:y+h, x:x+w]
+        # Upscale: Helps OCR read small/blurry numbers (same rounding as cv2.resize with fx/fy)
+        size = (max(1, int(round(w * scale))), max(1, int(round(h * scale))))
 
-        # Upscale: Helps OCR read small/blurry numbers
-        # Bicubic interpolation is good for enlarging
-        crop = cv2.resize(crop, None, fx=3.0, fy=3.0, interpolation=cv2.INTER_CUBIC)
-
+        # Color conversion runs at native size: only one channel is upscaled, not three.
+        # Thresholds run after the upscale so glyph edges stay smooth.
         if strategy == "HighContrastBinary":
-            gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+            gray = ImageProcessor._upscale(ImageProcessor._gray(crop), size, scale)
             # Binary Threshold
             _, binary = cv2.threshold(gray, 150, 255, cv2.THRESH_BINARY)
             return binary
 
         elif strategy == "InvertedBinary":
-            gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
-            # Invert colors (White text on black background) -> Black text on white
-            gray = cv2.bitwise_not(gray)
-            _, binary = cv2.threshold(gray, 120, 255, cv2.THRESH_BINARY)
+            gray = ImageProcessor._upscale(ImageProcessor._gray(crop), size, scale)
+            # Invert colors (White text on black background) -> Black text on white:
+            # not(gray) > 120  <=>  gray < 135, one inverse threshold instead of bitwise_not + threshold
+            _, binary = cv2.threshold(gray, 134, 255, cv2.THRESH_BINARY_INV)
             return binary
 
         # --- STRATEGY: WHITE ISOLATION ---
         elif strategy == "WhiteIsolation":
-            # Convert to HLS (Hue, Lightness, Saturation)
-            # The L (Lightness) channel is perfect for finding pure white regardless of background color.
-            hls = cv2.cvtColor(crop, cv2.COLOR_BGR2HLS)
-            
-            # Define "White" range
-            # L > 180 (0-255) catches bright whites and light greys (shiny numbers)
-            lower_white = np.array([0, 180, 0])
-            upper_white = np.array([255, 255, 255])
-            
-            # Create mask (White becomes 255, everything else 0)
-            mask = cv2.inRange(hls, lower_white, upper_white)
-            
+            # The L (Lightness) channel of HLS is perfect for finding pure white regardless of background color.
+            hls = cv2.cvtColor(crop, cv2.COLOR_BGR2HLS, dst=_buffer("hls", crop.shape))
+            light = cv2.extractChannel(hls, 1, dst=_buffer("light", (h, w)))
+            light = ImageProcessor._upscale(light, size, scale)
+
+            # Define "White": L >= 180 (0-255) catches bright whites and light greys (shiny numbers)
+            # (White becomes 255, everything else 0)
+            mask = cv2.threshold(light, 179, 255, cv2.THRESH_BINARY, dst=_buffer("mask", light.shape))[1]
+
             # Noise cleaning (removes isolated white dots)
-            kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (2, 2))
-            mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
-            
+            opened = cv2.morphologyEx(mask, cv2.MORPH_OPEN, DOT_KERNEL, dst=_buffer("opened", light.shape))
+
             # Slight dilation to "thicken" thin numbers like "1"
             # This helps the OCR not lose fine strokes
-            mask = cv2.dilate(mask, kernel, iterations=1)
-            
+            mask = cv2.dilate(opened, DOT_KERNEL, dst=mask)
+
             # Invert to Black on White (OCR prefers black text on white background)
-            final = cv2.bitwise_not(mask)
-            
-            return final
+            return cv2.bitwise_not(mask)
 
         elif strategy == "Sharpen":
-            kernel = np.array([[-1,-1,-1], [-1,9,-1], [-1,-1,-1]])
-            return cv2.filter2D(crop, -1, kernel)
+            upscaled = ImageProcessor._upscale(crop, size, scale, buffer="upscaled_bgr")
+            return cv2.filter2D(upscaled, -1, SHARPEN_KERNEL)
 
         # Default: Just Grayscale
-        return cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+        return ImageProcessor._upscale(ImageProcessor._gray(crop), size, scale, buffer=None)
+
+    @staticmethod
+    def _gray(crop):
+        return cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY, dst=_buffer("gray", crop.shape[:2]))
+
+    @staticmethod
+    def _upscale(img, size, scale, buffer="upscaled"):
+        """Bicubic resize to `size` (w, h) into a scratch buffer; buffer=None returns a new array."""
+        if scale == 1.0:
+            return img if buffer else img.copy()
+        dst = _buffer(buffer, (size[1], size[0]) + img.shape[2:]) if buffer else None
+        # Bicubic interpolation is good for enlarging
+        return cv2.resize(img, size, dst=dst, interpolation=cv2.INTER_CUBIC)
 
     @staticmethod
     def detect_dominant_color(crop_img):
@@ -213,49 +398,6 @@ class ImageProcessor:
         if crop_img is None or crop_img.size == 0:
             return "Unknown"
 
-        # 1. Convert to HSV (Hue, Saturation, Value)
-        hsv = cv2.cvtColor(crop_img, cv2.COLOR_BGR2HSV)
-        
-        # 2. Define color ranges (Adjusted for RoK artistic style)
-        # Note: OpenCV uses Hue 0-179.
-        
-        colors = {
-            "Red": [
-                (np.array([0, 70, 50]), np.array([10, 255, 255])),
-                (np.array([170, 70, 50]), np.array([180, 255, 255])) # Red wraps around
-            ],
-            "Gold": [ # Legendary Books / Generic Speedups
-                (np.array([15, 70, 70]), np.array([35, 255, 255]))
-            ],
-            "Green": [ # AP Potions / Food / Elite items (greenish background)
-                (np.array([36, 50, 50]), np.array([85, 255, 255]))
-            ],
-            "Blue": [ # Rare Books / Gems / Wood
-                (np.array([86, 60, 60]), np.array([125, 255, 255]))
-            ],
-            "Purple": [ # Epic Books / Epic items
-                (np.array([126, 60, 60]), np.array([165, 255, 255]))
-            ]
-        }
-
-        max_pixels = 0
-        dominant = "Unknown"
-        total_pixels = crop_img.shape[0] * crop_img.shape[1]
-
-        # 3. Pixel count per mask
-        for color_name, ranges in colors.items():
-            mask_count = 0
-            for (lower, upper) in ranges:
-                mask = cv2.inRange(hsv, lower, upper)
-                mask_count += cv2.countNonZero(mask)
-            
-            # If the color occupies the most significant part so far
-            if mask_count > max_pixels:
-                max_pixels = mask_count
-                dominant = color_name
-
-        # Noise filter: If dominant color is very small (e.g. just white text), return Unknown
-        if max_pixels < (total_pixels * 0.05): # Less than 5% of the area
-            return "Unknown"
-
-        return dominant
\ No newline at end of file
+        # Same HSV table as the batched ColorMap used by the inventory pipeline
+        counts = ColorMap.count_crop(crop_img)
+        return ColorMap.pick(counts, crop_img.shape[0] * crop_img.shape[1])[0]
\ No newline at end of file
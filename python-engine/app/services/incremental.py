@@ -0,0 +1,212 @@
+import threading
+import time
+import logging
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class PreviousResults:
+    """
+    Blocks of the last analyses, keyed by (route, engine profile, image handle), so a
+    later request can name a previous screenshot and only re-read what changed.
+    Entries expire with the screenshot itself (IMAGE_CACHE_TTL) and the oldest are
+    dropped past MAX_ENTRIES.
+    """
+    _instance = None
+    MAX_ENTRIES = 256
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._entries = OrderedDict()  # (route, profile, handle) -> (blocks, expires_at)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            cls._instance = cls(ttl=settings.IMAGE_CACHE_TTL)
+        return cls._instance
+
+    def get(self, route: str, profile: str, handle: str):
+        key = (route, profile, handle)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            blocks, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            return blocks
+
+    def put(self, route: str, profile: str, handle: str, blocks):
+        key = (route, profile, handle)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (blocks, time.monotonic() + self.ttl)
+            while len(self._entries) > self.MAX_ENTRIES:
+                self._entries.popitem(last=False)
+
+
+class FrameDiff:
+    """
+    Where two captures of the same screen differ, on a grid of TILE px tiles.
+    The previous frame is aligned first (phase correlation), so an
+    emulator window nudged by a few pixels doesn't count as a full-screen change.
+    A tile changed when at least MIN_PIXELS of its pixels differ by more than
+    PIXEL_DELTA gray levels (PNG/JPEG re-encoding noise stays below).
+    """
+
+    TILE = 64
+    PIXEL_DELTA = 32
+    MIN_PIXELS = 12
+    MAX_SHIFT = 0.05    # Alignment beyond this share of the frame: not the same screen
+    MARGIN = 16         # Re-read regions grow by this much around changed text
+
+    def __init__(self, dx: int, dy: int, changed):
+        self.dx, self.dy = dx, dy
+        self.changed = changed  # bool grid (tile rows, tile cols)
+
+    @property
+    def share(self) -> float:
+        return float(self.changed.mean()) if self.changed.size else 1.0
+
+    @classmethod
+    def compare(cls, prev, img):
+        """Returns a FrameDiff, or None when the frames are not comparable (size, alignment)."""
+        if prev is None or prev.shape != img.shape:
+            return None
+        h, w = img.shape[:2]
+        a = cv2.cvtColor(prev, cv2.COLOR_BGR2GRAY) if prev.ndim == 3 else prev
+        b = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+
+        dx, dy = cls._align(a, b)
+        if abs(dx) > cls.MAX_SHIFT * w or abs(dy) > cls.MAX_SHIFT * h:
+            return None
+        return cls(dx, dy, cls._tiles(a, b, dx, dy))
+
+    @classmethod
+    def _tiles(cls, a, b, dx, dy):
+        """Changed-tile grid of `b` against `a` moved by (dx, dy); uncovered borders count as changed."""
+        h, w = b.shape[:2]
+        rows, cols = -(-h // cls.TILE), -(-w // cls.TILE)
+        # Content at (x, y) of the previous frame is at (x + dx, y + dy) now
+        ys, yd = slice(max(0, -dy), h - max(0, dy)), slice(max(0, dy), h - max(0, -dy))
+        xs, xd = slice(max(0, -dx), w - max(0, dx)), slice(max(0, dx), w - max(0, -dx))
+        mask = np.ones((rows * cls.TILE, cols * cls.TILE), dtype=np.uint8)
+        mask[h:], mask[:, w:] = 0, 0
+        diff = cv2.absdiff(b[yd, xd], a[ys, xs])
+        cv2.threshold(diff, cls.PIXEL_DELTA, 1, cv2.THRESH_BINARY, dst=mask[yd, xd])
+        counts = mask.reshape(rows, cls.TILE, cols, cls.TILE).sum(axis=(1, 3), dtype=np.int32)
+        return counts >= cls.MIN_PIXELS
+
+    @staticmethod
+    def _align(a, b):
+        """
+        Integer (dx, dy) of `b` relative to `a`. Full resolution on the central area (a pixel
+        off already lights up every tile edge), else on a 1/4 thumbnail of the whole frame.
+        """
+        h, w = a.shape[:2]
+        cw, ch = min(w, 512), min(h, 256)
+        x0, y0 = (w - cw) // 2, (h - ch) // 2
+        (sx, sy), response = cv2.phaseCorrelate(a[y0:y0 + ch, x0:x0 + cw].astype(np.float32),
+                                                b[y0:y0 + ch, x0:x0 + cw].astype(np.float32))
+        if response >= 0.1:
+            return int(round(sx)), int(round(sy))
+
+        small_a = cv2.resize(a, (w // 4, h // 4), interpolation=cv2.INTER_AREA).astype(np.float32)
+        small_b = cv2.resize(b, (w // 4, h // 4), interpolation=cv2.INTER_AREA).astype(np.float32)
+        (sx, sy), response = cv2.phaseCorrelate(small_a, small_b)
+        return (int(round(sx * 4)), int(round(sy * 4))) if response >= 0.1 else (0, 0)
+
+    def split(self, blocks):
+        """
+        Previous blocks moved into this frame: (reused, stale). A block is stale when
+        it touches a changed tile (its text may have changed).
+        """
+        reused, stale = [], []
+        for block in blocks:
+            box = [[pt[0] + self.dx, pt[1] + self.dy] for pt in block["box"]]
+            moved = dict(block, box=box)
+            (stale if self._touches_change(box) else reused).append(moved)
+        return reused, stale
+
+    def regions(self, shape, stale):
+        """
+        Frame areas to read again, [x_min, y_min, x_max, y_max]: every group of changed
+        tiles (grown by one tile, text lines cross tile borders) and the full boxes of the
+        stale blocks inside it, plus MARGIN.
+        """
+        h, w = shape[:2]
+        grown = cv2.dilate(self.changed.astype(np.uint8), np.ones((3, 3), np.uint8))
+        n, labels, stats, _ = cv2.connectedComponentsWithStats(grown, connectivity=8)
+        rects = []
+        for i in range(1, n):
+            x, y, tw, th = stats[i, :4]
+            rects.append([x * self.TILE, y * self.TILE, (x + tw) * self.TILE, (y + th) * self.TILE])
+
+        for block in stale:
+            bx0, by0, bx1, by1 = self._bounds(block["box"])
+            for r in rects:
+                if bx0 < r[2] and bx1 > r[0] and by0 < r[3] and by1 > r[1]:
+                    r[0], r[1], r[2], r[3] = min(r[0], bx0), min(r[1], by0), max(r[2], bx1), max(r[3], by1)
+                    break
+
+        rects = self._union(rects)
+        return [[max(0, int(x0) - self.MARGIN), max(0, int(y0) - self.MARGIN),
+                 min(w, int(np.ceil(x1)) + self.MARGIN), min(h, int(np.ceil(y1)) + self.MARGIN)]
+                for x0, y0, x1, y1 in rects]
+
+    @staticmethod
+    def merge(reused, fresh):
+        """Fresh blocks plus the reused ones they don't cover, in reading order, each marked `fresh`."""
+        fresh_bounds = [FrameDiff._bounds(b["box"]) for b in fresh]
+        blocks = [dict(b, fresh=True) for b in fresh]
+        for block in reused:
+            x0, y0, x1, y1 = FrameDiff._bounds(block["box"])
+            cx, cy = (x0 + x1) / 2.0, (y0 + y1) / 2.0
+            # Re-read by a grown region: the fresh read wins
+            if any(f[0] <= cx <= f[2] and f[1] <= cy <= f[3] for f in fresh_bounds):
+                continue
+            blocks.append(dict(block, fresh=False))
+        blocks.sort(key=lambda b: (round(FrameDiff._bounds(b["box"])[1] / 10.0), FrameDiff._bounds(b["box"])[0]))
+        return blocks
+
+    def _touches_change(self, box):
+        x0, y0, x1, y1 = self._bounds(box)
+        rows, cols = self.changed.shape
+        c0, c1 = max(0, int(x0) // self.TILE), min(cols - 1, int(x1) // self.TILE)
+        r0, r1 = max(0, int(y0) // self.TILE), min(rows - 1, int(y1) // self.TILE)
+        if c0 > c1 or r0 > r1:
+            return True  # Moved out of the frame
+        return bool(self.changed[r0:r1 + 1, c0:c1 + 1].any())
+
+    @staticmethod
+    def _bounds(box):
+        xs = [pt[0] for pt in box]
+        ys = [pt[1] for pt in box]
+        return min(xs), min(ys), max(xs), max(ys)
+
+    @staticmethod
+    def _union(rects):
+        """Merges overlapping rectangles until none overlap."""
+        rects = [list(r) for r in rects]
+        merged = True
+        while merged:
+            merged = False
+            for i in range(len(rects)):
+                for j in range(i + 1, len(rects)):
+                    a, b = rects[i], rects[j]
+                    if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                        rects[i] = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+                        del rects[j]
+                        merged = True
+                        break
+                if merged:
+                    break
+        return rects
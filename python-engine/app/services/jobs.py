@@ -0,0 +1,244 @@
+import json
+import logging
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+import zipfile
+
+from app.core.config import settings
+from app.services.scroll import archive_images
+
+logger = logging.getLogger(__name__)
+
+JOB_ID = "^[0-9a-f]{32}$"  # uuid4().hex: job ids name folders, nothing else may reach the disk
+
+
+class JobStore:
+    """
+    Bulk OCR jobs on disk, so they survive restarts: state in SQLite (JOBS_DIR/jobs.db)
+    and one staged image per item in JOBS_DIR/<job id>/, deleted once the item is read.
+    A job is `staging` while its upload is written, then `queued`, `running` and `done`.
+    Items go pending -> running -> done | failed; `seq` numbers them in completion
+    order within their job, so a progress stream can resume where it stopped.
+    """
+    _instance = None
+
+    def __init__(self, directory: str, ttl: float):
+        self.directory = directory
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(directory, "jobs.db"), check_same_thread=False,
+                                     isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, kind TEXT NOT NULL, profile TEXT NOT NULL, options TEXT NOT NULL,"
+            " status TEXT NOT NULL, total INTEGER NOT NULL DEFAULT 0, done INTEGER NOT NULL DEFAULT 0,"
+            " failed INTEGER NOT NULL DEFAULT 0, created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS items ("
+            " job_id TEXT NOT NULL, idx INTEGER NOT NULL, name TEXT NOT NULL, path TEXT NOT NULL,"
+            " status TEXT NOT NULL, seq INTEGER, result TEXT, PRIMARY KEY (job_id, idx))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_items_status ON items(status)")
+        self._lock = threading.Lock()
+        with self._lock:
+            # Uploads cut short by a restart never became jobs
+            for row in self._conn.execute("SELECT id FROM jobs WHERE status = 'staging'").fetchall():
+                self._delete(row["id"])
+        self.requeue()
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            cls._instance = cls(settings.JOBS_DIR, settings.JOBS_TTL)
+        return cls._instance
+
+    # --- Submission ---
+
+    def create(self, kind: str, profile: str, options: dict) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        os.makedirs(self._stage_dir(job_id), exist_ok=True)
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, profile, options, status, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, 'staging', ?, ?)",
+                (job_id, kind, profile, json.dumps(options), now, now)
+            )
+        return job_id
+
+    def stage_file(self, job_id: str, idx: int, name: str, fileobj):
+        """Copies one uploaded image (a file object) to the job's staging folder."""
+        path = os.path.join(self._stage_dir(job_id), f"{idx:05d}{os.path.splitext(name)[1].lower()}")
+        with open(path, "wb") as f:
+            shutil.copyfileobj(fileobj, f, 1024 * 1024)
+        self._add_item(job_id, idx, name, path)
+
+    def stage_archive(self, job_id: str, archive, start: int, max_items: int, max_bytes=(None, None)) -> int:
+        """
+        Stages the images of a zip archive (path or file object), sorted by name, from
+        item index `start`. Returns the number of images; raises ValueError past max_items
+        or when the images expand beyond max_bytes = (total, per image) bytes (archive_images).
+        """
+        with zipfile.ZipFile(archive) as zf:
+            entries = archive_images(zf, max_bytes)
+            if start + len(entries) > max_items:
+                raise ValueError(f"More than {max_items} images")
+            for i, info in enumerate(entries):
+                with zf.open(info) as src:
+                    self.stage_file(job_id, start + i, os.path.basename(info.filename), src)
+        return len(entries)
+
+    def _add_item(self, job_id: str, idx: int, name: str, path: str):
+        with self._lock:
+            self._conn.execute("INSERT INTO items (job_id, idx, name, path, status) VALUES (?, ?, ?, ?, 'staged')",
+                               (job_id, idx, name, path))
+
+    def commit(self, job_id: str) -> int:
+        """End of the upload: the staged items become pending. Returns their number."""
+        with self._lock:
+            self._conn.execute("UPDATE items SET status = 'pending' WHERE job_id = ?", (job_id,))
+            total = self._conn.execute("SELECT COUNT(*) FROM items WHERE job_id = ?", (job_id,)).fetchone()[0]
+            self._conn.execute("UPDATE jobs SET status = 'queued', total = ?, updated_at = ? WHERE id = ?",
+                               (total, time.time(), job_id))
+        return total
+
+    # --- Runner side ---
+
+    def claim(self):
+        """Next pending item (oldest job first) marked running, as a dict, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT i.job_id, i.idx, i.name, i.path, j.kind, j.profile, j.options"
+                " FROM items i JOIN jobs j ON j.id = i.job_id"
+                " WHERE i.status = 'pending' ORDER BY j.created_at, i.idx LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE items SET status = 'running' WHERE job_id = ? AND idx = ?",
+                               (row["job_id"], row["idx"]))
+            self._conn.execute("UPDATE jobs SET status = 'running', updated_at = ? WHERE id = ? AND status = 'queued'",
+                               (time.time(), row["job_id"]))
+        item = dict(row)
+        item["options"] = json.loads(item["options"])
+        return item
+
+    def finish(self, job_id: str, idx: int, result: dict, ok: bool):
+        """Stores an item's result (or failure) and deletes its staged image."""
+        with self._lock:
+            job = self._conn.execute("SELECT done, failed, total FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if job is None:
+                return  # Deleted while the item was being read
+            seq = job["done"] + job["failed"] + 1
+            path = self._conn.execute("SELECT path FROM items WHERE job_id = ? AND idx = ?",
+                                      (job_id, idx)).fetchone()["path"]
+            self._conn.execute("UPDATE items SET status = ?, seq = ?, result = ? WHERE job_id = ? AND idx = ?",
+                               ("done" if ok else "failed", seq, json.dumps(result), job_id, idx))
+            self._conn.execute(
+                f"UPDATE jobs SET {'done = done' if ok else 'failed = failed'} + 1, updated_at = ?,"
+                " status = CASE WHEN ? >= total THEN 'done' ELSE status END WHERE id = ?",
+                (time.time(), seq, job_id)
+            )
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def release(self, job_id: str, idx: int):
+        """Puts a running item back in the queue (engine busy)."""
+        with self._lock:
+            self._conn.execute("UPDATE items SET status = 'pending' WHERE job_id = ? AND idx = ? AND status = 'running'",
+                               (job_id, idx))
+
+    def requeue(self):
+        """Items left running by a stopped runner (restart) are read again."""
+        with self._lock:
+            self._conn.execute("UPDATE items SET status = 'pending' WHERE status = 'running'")
+
+    # --- Queries ---
+
+    def get(self, job_id: str):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._job(row) if row is not None else None
+
+    def list(self, limit: int = 50):
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM jobs WHERE status != 'staging' ORDER BY created_at DESC LIMIT ?",
+                                      (limit,)).fetchall()
+        return [self._job(row) for row in rows]
+
+    def items(self, job_id: str, offset: int = 0, limit: int = 100):
+        """Items in upload order; unfinished ones have no result yet."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT idx, name, status, seq, result FROM items WHERE job_id = ? ORDER BY idx LIMIT ? OFFSET ?",
+                (job_id, limit, offset)
+            ).fetchall()
+        return [self._item(row) for row in rows]
+
+    def finished_since(self, job_id: str, seq: int):
+        """Finished items with a completion number above `seq`, in completion order."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT idx, name, status, seq, result FROM items WHERE job_id = ? AND seq > ? ORDER BY seq",
+                (job_id, seq)
+            ).fetchall()
+        return [self._item(row) for row in rows]
+
+    def pending(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM items WHERE status IN ('pending', 'running')").fetchone()[0]
+
+    @staticmethod
+    def _job(row) -> dict:
+        job = {k: row[k] for k in ("id", "kind", "profile", "status", "total", "done", "failed",
+                                   "created_at", "updated_at")}
+        job["options"] = json.loads(row["options"])
+        return job
+
+    @staticmethod
+    def _item(row) -> dict:
+        item = {"index": row["idx"], "name": row["name"], "state": row["status"]}
+        if row["seq"] is not None:
+            item["seq"] = row["seq"]
+        if row["result"] is not None:
+            item.update(json.loads(row["result"]))
+        return item
+
+    # --- Removal ---
+
+    def delete(self, job_id: str) -> bool:
+        """Deletes a job, its results and its staged images. Items being read finish unrecorded."""
+        with self._lock:
+            return self._delete(job_id)
+
+    def _delete(self, job_id: str) -> bool:
+        deleted = self._conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,)).rowcount > 0
+        if deleted:
+            self._conn.execute("DELETE FROM items WHERE job_id = ?", (job_id,))
+            shutil.rmtree(self._stage_dir(job_id), ignore_errors=True)
+        return deleted
+
+    def cleanup(self):
+        """Deletes the finished jobs not updated for JOBS_TTL seconds."""
+        with self._lock:
+            rows = self._conn.execute("SELECT id FROM jobs WHERE status = 'done' AND updated_at < ?",
+                                      (time.time() - self.ttl,)).fetchall()
+            for row in rows:
+                self._delete(row["id"])
+        if rows:
+            logger.info(f"🧹 Removed {len(rows)} finished job(s)")
+
+    def _stage_dir(self, job_id: str) -> str:
+        if not re.match(JOB_ID, job_id):
+            raise ValueError(f"Invalid job id {job_id!r}")
+        return os.path.join(self.directory, job_id)
@@ -0,0 +1,163 @@
+import threading
+import logging
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from app.services.image_processing import ImageProcessor
+
+logger = logging.getLogger(__name__)
+
+
+class PaperLocator:
+    """
+    Fast report paper isolation, same output as ImageProcessor.warp_paper:
+      1. Coarse: the beige mask is built, closed and searched for its largest contour
+         on a SEARCH_WIDTH thumbnail instead of the full frame.
+      2. Fine: each edge is then placed at full resolution from a narrow strip across
+         it (first/last row or column that is mostly paper).
+      3. Layouts: reports of one device put the paper at the same place. The last
+         MAX_LAYOUTS layouts are kept by (frame size, fingerprint of the coarse mask);
+         a repeat reuses its rectangle once a few full-resolution pixels across every
+         edge confirm it, without contour search or refinement.
+    Game reports are axis-aligned: the transform is a translation and the warp a plain
+    crop. A tilted paper (photo of a screen) goes through warp_paper.
+    """
+
+    SEARCH_WIDTH = 480
+    FINGERPRINT = (32, 18)   # Coarse mask cells compared between layouts
+    MIN_AREA = 0.15          # Same minimum as warp_paper
+    MAX_TILT = 1.0           # Degrees; a more tilted paper needs the perspective warp
+    MAX_LAYOUTS = 8
+    CHECKS = 16              # Cross-sections per edge checked on a layout hit
+
+    _layouts = OrderedDict()  # (h, w, fingerprint) -> (x0, y0, x_last, y_last)
+    _kernels = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def isolate(cls, img):
+        """Returns (processed_image, is_isolated, 3x3 transform from `img` to the processed image)."""
+        if img is None:
+            return None, False, None
+
+        h, w = img.shape[:2]
+        scale = min(1.0, cls.SEARCH_WIDTH / float(w))
+        # Nearest neighbour: the closing below fills what it drops, at a fraction of INTER_AREA's cost
+        thumb = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_NEAREST) if scale < 1.0 else img
+        mask = cv2.inRange(cv2.cvtColor(thumb, cv2.COLOR_BGR2HSV), *ImageProcessor.PAPER_HSV)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, cls._kernel(scale))
+
+        cells = cv2.resize(mask, cls.FINGERPRINT, interpolation=cv2.INTER_AREA) > 127
+        key = (h, w, np.packbits(cells).tobytes())
+        with cls._lock:
+            rect = cls._layouts.get(key)
+            if rect is not None:
+                cls._layouts.move_to_end(key)
+
+        if rect is None or not cls._verify(img, rect):
+            contour = cls._largest(mask)
+            if contour is None:
+                crop, M = ImageProcessor.central_crop(img)
+                return crop, False, M
+            if cls._tilted(contour):
+                return ImageProcessor.warp_paper(img)
+            rect = cls._refine(img, cv2.boundingRect(contour), scale)
+            with cls._lock:
+                cls._layouts[key] = rect
+                while len(cls._layouts) > cls.MAX_LAYOUTS:
+                    cls._layouts.popitem(last=False)
+
+        # Corners on the first/last paper pixels, like warp_paper: (x_last - x0) x (y_last - y0)
+        x0, y0, x1, y1 = rect
+        M = np.array([[1, 0, -x0], [0, 1, -y0], [0, 0, 1]], dtype=np.float64)
+        return img[y0:y1, x0:x1].copy(), True, M
+
+    @classmethod
+    def _kernel(cls, scale):
+        # CONTAINER_KERNEL (25px) brought to the thumbnail
+        size = max(3, int(round(25 * scale)) | 1)
+        kernel = cls._kernels.get(size)
+        if kernel is None:
+            kernel = cls._kernels[size] = cv2.getStructuringElement(cv2.MORPH_RECT, (size, size))
+        return kernel
+
+    @classmethod
+    def _largest(cls, mask):
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if not contours:
+            return None
+        cnt = max(contours, key=cv2.contourArea)
+        return cnt if cv2.contourArea(cnt) > mask.size * cls.MIN_AREA else None
+
+    @classmethod
+    def _tilted(cls, contour) -> bool:
+        angle = cv2.minAreaRect(contour)[2] % 90.0
+        return min(angle, 90.0 - angle) > cls.MAX_TILT
+
+    @staticmethod
+    def _paper_share(img, rows, cols, axis):
+        """Share of paper pixels per row (axis=1) or per column (axis=0) of img[rows, cols]."""
+        strip = np.ascontiguousarray(img[rows, cols])
+        mask = cv2.inRange(cv2.cvtColor(strip, cv2.COLOR_BGR2HSV), *ImageProcessor.PAPER_HSV)
+        return mask.mean(axis=axis) / 255.0
+
+    @classmethod
+    def _refine(cls, img, bounds, scale):
+        """Full-resolution (x0, y0, x_last, y_last) from the thumbnail bounding box."""
+        h, w = img.shape[:2]
+        bx, by, bw, bh = bounds
+        x0, y0 = int(bx / scale), int(by / scale)
+        x1, y1 = min(w, int(np.ceil((bx + bw) / scale))) - 1, min(h, int(np.ceil((by + bh) / scale))) - 1
+        m = int(np.ceil(2.0 / scale)) + 2  # Thumbnail pixel (+ nearest-neighbour offset) in frame pixels
+        # Along each edge: every 4th pixel between the corners is plenty for a 50% vote
+        inner_x, inner_y = slice(x0 + m, max(x0 + m + 1, x1 - m), 4), slice(y0 + m, max(y0 + m + 1, y1 - m), 4)
+
+        def first(share, start, default):
+            hits = np.flatnonzero(share >= 0.5)
+            return start + int(hits[0]) if hits.size else default
+
+        def last(share, start, default):
+            hits = np.flatnonzero(share >= 0.5)
+            return start + int(hits[-1]) if hits.size else default
+
+        top, bottom = max(0, y0 - m), max(0, y1 - m)
+        left, right = max(0, x0 - m), max(0, x1 - m)
+        y0 = first(cls._paper_share(img, slice(top, y0 + m + 1), inner_x, 1), top, y0)
+        y1 = last(cls._paper_share(img, slice(bottom, min(h, y1 + m + 1)), inner_x, 1), bottom, y1)
+        x0 = first(cls._paper_share(img, inner_y, slice(left, x0 + m + 1), 0), left, x0)
+        x1 = last(cls._paper_share(img, inner_y, slice(right, min(w, x1 + m + 1)), 0), right, x1)
+        return x0, y0, x1, y1
+
+    @classmethod
+    def _verify(cls, img, rect) -> bool:
+        """A known layout still fits: paper on the edge pixels of the rectangle, none right outside."""
+        h, w = img.shape[:2]
+        x0, y0, x1, y1 = rect
+        if x1 >= w or y1 >= h:
+            return False
+        xs = np.linspace(x0, x1, cls.CHECKS + 2)[1:-1].astype(int)
+        ys = np.linspace(y0, y1, cls.CHECKS + 2)[1:-1].astype(int)
+        edges = [
+            # (inside: on the edge, outside: right next to it)
+            ((np.full_like(xs, y0), xs), (np.full_like(xs, y0 - 1), xs)),
+            ((np.full_like(xs, y1), xs), (np.full_like(xs, y1 + 1), xs)),
+            ((ys, np.full_like(ys, x0)), (ys, np.full_like(ys, x0 - 1))),
+            ((ys, np.full_like(ys, x1)), (ys, np.full_like(ys, x1 + 1))),
+        ]
+        for inside, outside in edges:
+            if cls._share(img, inside) < 0.75:
+                return False
+            # The frame border counts as background (paper touching the edge)
+            r, c = outside
+            if r.min() >= 0 and c.min() >= 0 and r.max() < h and c.max() < w and cls._share(img, outside) > 0.25:
+                return False
+        return True
+
+    @staticmethod
+    def _share(img, points):
+        """Share of paper pixels among img[rows, cols]."""
+        pixels = img[points][:, None, :]
+        mask = cv2.inRange(cv2.cvtColor(pixels, cv2.COLOR_BGR2HSV), *ImageProcessor.PAPER_HSV)
+        return float(np.count_nonzero(mask)) / mask.size
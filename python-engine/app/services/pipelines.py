@@ -0,0 +1,396 @@
+"""
+Synchronous OCR pipelines executed by the inference workers.
+Every function receives the worker's own PaddleOCR instance as first argument
+and the already decoded image, and returns a JSON-ready dict.
+Stage timers (app.core.metrics.stage) show where the time goes per route;
+"ocr" is a full PaddleOCR pass and includes its "ocr_det"/"ocr_rec" stages.
+"""
+import logging
+import numpy as np
+
+from app.services.image_processing import ImageProcessor
+from app.services.recognition import BatchRecognizer
+from app.services.color_map import ColorMap
+from app.services.tiling import AdaptiveTiler
+from app.services.paper import PaperLocator
+from app.services.ranking import TableReader
+from app.core.config import settings
+from app.core.metrics import stage
+
+logger = logging.getLogger(__name__)
+
+# Parameters that shape each pipeline's output (also part of the result-cache key)
+PARAMS = {
+    "governor": {
+        "max_width": 1280,
+        "roi": settings.GOVERNOR_ROI,
+        # Profile areas read by the .NET neurons, relative to the panel (x_min, y_min, x_max, y_max):
+        # name / ID / alliance / civilization header, then the power / kill points row
+        "roi_regions": ((0.0, 0.0, 1.0, 0.45), (0.2, 0.25, 1.0, 0.65)),
+        "roi_min_lines": 4,      # Fewer readable lines = not a profile screen (e.g. a Magnifier crop)
+        "roi_min_conf": 0.75,    # Mean confidence below this = layout mismatch, redo full-frame
+    },
+    # "adaptive": frames wider than max_width keep their native resolution and go through AdaptiveTiler
+    # fast_paper: PaperLocator (thumbnail search, layout cache) instead of the full-resolution warp_paper
+    "report": {"max_width": 1920, "filters": "isolate_paper+sharpen", "min_conf": 0.10,
+               "adaptive": settings.ADAPTIVE_INFERENCE, "fast_paper": settings.FAST_PAPER_ISOLATION},
+    "inventory": {"max_width": 1920, "filters": "sharpen", "min_conf": 0.05, "color_padding": 25,
+                  "adaptive": settings.ADAPTIVE_INFERENCE},
+    # Row layout by projection profiles (TableReader): no detection pass, cost follows the rows on screen
+    "ranking": {"max_width": 1920},
+    # digit_height: `digits` regions are only upscaled up to this height (recognizer input is 48px)
+    "batch": {"upscale": 3.0, "digit_height": 96},
+}
+
+
+def governor(ocr, img, roi=True):
+    # Resize otimiza muito o tempo de inferência do Paddle
+    with stage("resize"):
+        img_resized, ratio = ImageProcessor.resize_if_needed(img, max_width=PARAMS["governor"]["max_width"])
+
+    # roi=False: partial frames (incremental re-reads) have no full panel to anchor on
+    roi_lines = _governor_roi(ocr, img_resized) if roi and PARAMS["governor"]["roi"] else None
+    if roi_lines is not None:
+        result, mode = [roi_lines], "roi"
+    else:
+        with stage("ocr"):
+            result = ocr.ocr(img_resized, cls=False)
+        mode = "full"
+
+    blocks = []
+    full_text = []
+
+    if result and result[0]:
+        # Recupera as coordenadas originais multiplicando pelo ratio
+        # Isso é opcional, mas bom se o C# desenhar caixas na imagem original
+        boxes = _rescale([line[0] for line in result[0]], ratio)
+        for line, box in zip(result[0], boxes):
+            blocks.append({
+                "text": line[1][0],
+                "box": box,
+                "conf": line[1][1]
+            })
+            full_text.append(line[1][0])
+
+    return {
+        "success": True,
+        "full_text": "\n".join(full_text),
+        "blocks": blocks,
+        "mode": mode  # "roi" (layout fast path) or "full" (full-frame OCR)
+    }
+
+
+def _governor_roi(ocr, img):
+    """
+    Layout-aware fast path: anchors the profile panel with OpenCV, finds the text
+    lines of the known profile areas without the neural detector and recognizes
+    them all in one batch. Returns PaddleOCR-style lines ([quad, (text, conf)]),
+    or None when the frame does not look like a profile screen.
+    """
+    params = PARAMS["governor"]
+    with stage("anchor"):
+        panel = ImageProcessor.find_profile_panel(img)
+    if panel is None:
+        return None
+
+    px, py, pw, ph = panel
+    regions = [[px + x0 * pw, py + y0 * ph, px + x1 * pw, py + y1 * ph] for x0, y0, x1, y1 in params["roi_regions"]]
+    with stage("find_lines"):
+        boxes = ImageProcessor.find_text_lines(img, regions)
+    if len(boxes) < params["roi_min_lines"]:
+        return None
+
+    recognized = BatchRecognizer.recognize(ocr, [img[y0:y1, x0:x1] for x0, y0, x1, y1 in boxes])
+
+    # Same garbage filter PaddleOCR applies to detected lines (drop_score)
+    drop_score = getattr(ocr, "drop_score", 0.5)
+    lines = [
+        [[[float(x0), float(y0)], [float(x1), float(y0)], [float(x1), float(y1)], [float(x0), float(y1)]], (text, conf)]
+        for (x0, y0, x1, y1), (text, conf) in zip(boxes, recognized)
+        if conf >= drop_score and text.strip()
+    ]
+    if len(lines) < params["roi_min_lines"]:
+        return None
+    if sum(line[1][1] for line in lines) / len(lines) < params["roi_min_conf"]:
+        return None
+    return lines
+
+
+def report(ocr, img_raw, processed_name=""):
+    """
+    Returns (result, final_img): the processed image goes back to the route, which
+    writes it to `processed_name` after the response (storage service) when requested.
+    """
+    # 2. Resize (Gain ~300ms on 4K images)
+    # 1920px is enough for RoK text (adaptive mode: native, OCR'd in tiles)
+    tiled = _adaptive("report", img_raw)
+    with stage("resize"):
+        max_width = img_raw.shape[1] if tiled else PARAMS["report"]["max_width"]
+        img_resized, scale_ratio = ImageProcessor.resize_if_needed(img_raw, max_width=max_width)
+
+    # 3. Process Container (Isolate Paper)
+    with stage("isolate_paper"):
+        if PARAMS["report"]["fast_paper"]:
+            processed_img, is_isolated, warp = PaperLocator.isolate(img_resized)
+        else:
+            processed_img, is_isolated, warp = ImageProcessor.warp_paper(img_resized)
+    # Processed image (block) coordinates -> screenshot pixels: resize and warp undone
+    to_frame = np.linalg.inv(warp @ np.diag([scale_ratio, scale_ratio, 1.0]))
+
+    # 4. Filters (Sharpen)
+    with stage("filters"):
+        final_img = ImageProcessor.apply_filters(processed_img)
+
+    # 6. OCR Execution
+    result = _ocr(ocr, final_img, tiled)
+
+    blocks = []
+    if result and result[0]:
+        for line in result[0]:
+            conf = float(line[1][1])
+            if conf > PARAMS["report"]["min_conf"]: # Filter garbage
+                # Note: We don't need to upscale coordinates back if C# consumes the saved processed image directly!
+                # The saved image matches these coordinates.
+                blocks.append({
+                    "text": str(line[1][0]),
+                    "conf": conf,
+                    "box": line[0]
+                })
+
+    return {
+        "success": True,
+        "processed_image_path": processed_name,
+        "container": {
+            "is_isolated": is_isolated,
+            "canvas_size": {
+                "width": int(final_img.shape[1]),
+                "height": int(final_img.shape[0])
+            },
+            # 3x3 homography, [x, y, 1] of a block -> screenshot (divide by the 3rd row)
+            "to_frame": np.round(to_frame / to_frame[2, 2], 6).tolist()
+        },
+        "blocks": blocks
+    }, final_img
+
+
+def _rescale(boxes, ratio):
+    """Boxes of a resized frame back in source pixels, all at once (one array op instead of a loop per point)."""
+    if ratio == 1.0:
+        return boxes
+    return (np.asarray(boxes, dtype=np.float64).reshape(-1, 4, 2) / ratio).tolist()
+
+
+def _adaptive(route, img):
+    """True when `img` is above the route's resize limit and adaptive inference is on."""
+    return PARAMS[route]["adaptive"] and img.shape[1] > PARAMS[route]["max_width"]
+
+
+def _ocr(ocr, img, tiled):
+    """Full PaddleOCR pass, or the tiled native-resolution one (same result shape)."""
+    with stage("ocr"):
+        if tiled:
+            return [AdaptiveTiler.run(ocr, img)]
+        return ocr.ocr(img, cls=False)
+
+
+def inventory(ocr, img):
+    # 1. Smart Resize (1920px is mandatory for small numbers)
+    # Adaptive mode keeps 1440p/4K frames native: the tiler reads the small numbers at full detail
+    tiled = _adaptive("inventory", img)
+    with stage("resize"):
+        max_width = img.shape[1] if tiled else PARAMS["inventory"]["max_width"]
+        img_resized, ratio = ImageProcessor.resize_if_needed(img, max_width=max_width)
+
+    # 2. CHANGE 1: Sharpen Filter ENABLED
+    # This helps highlight the white outline of numbers against the colorful background
+    with stage("filters"):
+        img_final = ImageProcessor.apply_filters(img_resized)
+    if img_final is None:
+        img_final = img_resized # Fallback if error occurs
+
+    # 3. OCR Engine
+    result = _ocr(ocr, img_final, tiled)
+
+    blocks = []
+    full_text = []
+
+    lines = []
+    if result and result[0]:
+        for line in result[0]:
+            # 3. CHANGE 2: Drastically reduced minimum confidence
+            # Small numbers on icons often have low confidence (e.g., 0.15).
+            # Lowered to 0.05 to ensure we capture the data.
+            # C# will filter the noise via Regex.
+            if line[1][1] >= PARAMS["inventory"]["min_conf"]:
+                lines.append(line)
+
+    if lines:
+        # --- COLOR DETECTION ---
+        # One HSV conversion for the whole frame, then a constant-time query per line
+        # on the padded box (25px, kept per previous adjustment)
+        padding = PARAMS["inventory"]["color_padding"]
+        color_boxes = []
+        for line in lines:
+            xs = [pt[0] for pt in line[0]]
+            ys = [pt[1] for pt in line[0]]
+            color_boxes.append([
+                int(min(xs)) - padding, int(min(ys)) - padding,
+                int(max(xs)) + padding, int(max(ys)) + padding
+            ])
+        with stage("color"):
+            color_tags = ColorMap.classify(img_final, color_boxes)
+        # ---------------------
+
+        # Revert coordinates if resized
+        boxes = _rescale([line[0] for line in lines], ratio)
+        for line, color_tag, box in zip(lines, color_tags, boxes):
+            text = line[1][0]
+
+            blocks.append({
+                "text": text,
+                "box": box,
+                "conf": line[1][1],
+                "color": color_tag
+            })
+            full_text.append(text)
+
+    return {
+        "success": True,
+        "full_text": " | ".join(full_text),
+        "blocks": blocks
+    }
+
+
+def ranking(ocr, img):
+    """
+    Alliance member lists and rankings (KvK, power, kill points): tall tables of
+    repeated rows. No detection pass: rows, cells and their stacked lines are found
+    by projection profiles (TableReader), every line of every row is recognized in
+    one call, then the cells are assigned to columns by x-range.
+    """
+    with stage("resize"):
+        img_resized, ratio = ImageProcessor.resize_if_needed(img, max_width=PARAMS["ranking"]["max_width"])
+    with stage("find_rows"):
+        lines, _ = TableReader.layout(img_resized)
+    with stage("crop_lines"):
+        line_imgs = [BatchRecognizer.to_bgr(img_resized[y0:y1, x0:x1]) for _, (x0, y0, x1, y1) in lines]
+    recognized = BatchRecognizer.recognize(ocr, line_imgs)
+
+    if ratio != 1.0:
+        lines = [(r, [round(v / ratio, 1) for v in box]) for r, box in lines]
+    rows = TableReader.cells(lines, recognized, getattr(ocr, "drop_score", 0.5))
+    return TableReader.tabulate(rows)
+
+
+def incremental(ocr, img, regions, route):
+    """
+    Incremental re-OCR: runs `route`'s pipeline only on the changed areas of a frame
+    (app.services.incremental.FrameDiff) and returns their blocks in frame coordinates.
+    """
+    blocks = []
+    for x0, y0, x1, y1 in regions:
+        crop = img[y0:y1, x0:x1]
+        if route == "governor":
+            result = governor(ocr, crop, roi=False)
+        else:
+            result = inventory(ocr, crop)
+        for block in result["blocks"]:
+            block["box"] = [[pt[0] + x0, pt[1] + y0] for pt in block["box"]]
+            blocks.append(block)
+    return blocks
+
+
+def batch(ocr, full_img, regions):
+    """
+    Magnifier rescans. Instead of one full det+rec pass per region:
+      1. Filter every region and run detection only (skipped for `det=False` regions,
+         whose crop is already a single text line, and for `digits` regions, whose
+         lines are found by projection profiles).
+      2. Recognize ALL lines of ALL regions in shared batches.
+      3. Map the best line back to each region id.
+    """
+    return batch_many(ocr, full_img, regions)[0]
+
+
+def batch_many(ocr, *calls):
+    """
+    Several batch calls coalesced by the scheduler into one job: `calls` is
+    (full_img, regions, full_img, regions, ...). The lines of every call share
+    the recognition batches. Returns one result per call.
+    """
+    calls = list(zip(calls[::2], calls[1::2]))
+    drop_score = getattr(ocr, "drop_score", 0.5)
+    line_owner = []  # (call index, region index) of each line
+    line_imgs = []
+
+    for c, (full_img, regions) in enumerate(calls):
+        for idx, line_img in _region_lines(ocr, full_img, regions):
+            line_owner.append((c, idx))
+            line_imgs.append(line_img)
+
+    best = {}
+    for (c, idx), (text, conf) in zip(line_owner, BatchRecognizer.recognize(ocr, line_imgs)):
+        region = calls[c][1][idx]
+        # Same garbage filter PaddleOCR applies to detected lines (drop_score)
+        if region.det and not region.digits and conf < drop_score:
+            continue
+        # For XP, it is usually a single number. We take the best candidate.
+        if (c, idx) not in best or conf > best[(c, idx)][1]:
+            best[(c, idx)] = (text, conf)
+
+    outputs = []
+    for c, (_, regions) in enumerate(calls):
+        results = []
+        for idx, region in enumerate(regions):
+            text, conf = best.get((c, idx), ("", 0.0))
+            results.append({
+                "id": region.id,
+                "text": text,
+                "conf": conf,
+                "strategy": region.strategy
+            })
+        outputs.append({"success": True, "results": results})
+    return outputs
+
+
+# Queued batch jobs of the same engine profile may run as one (InferencePool coalescing)
+batch.coalesced = batch_many
+
+
+def _region_lines(ocr, full_img, regions):
+    """Yields (region index, BGR line image) for every text line of the batch regions."""
+    for idx, region in enumerate(regions):
+        x, y, w, h = region.box
+
+        scale = PARAMS["batch"]["upscale"]
+        if region.digits:
+            # A 3x cubic upscale of a tall box only feeds pixels the recognizer resizes away
+            scale = min(scale, max(1.0, PARAMS["batch"]["digit_height"] / float(max(1, h))))
+
+        # Crop & Filter (the strategy is client input: unknown names share one metric label)
+        strategy = region.strategy if region.strategy in ImageProcessor.STRATEGIES else "default"
+        with stage(f"process_region.{strategy}"):
+            processed_crop = ImageProcessor.process_region(
+                full_img, int(x), int(y), int(w), int(h), region.strategy, scale=scale
+            )
+        if processed_crop is None:
+            continue
+
+        if region.digits:
+            with stage("project_lines"):
+                # Nothing localized (faint text): the whole crop is read as one line
+                lines = ImageProcessor.project_lines(processed_crop) or [[0, 0, processed_crop.shape[1], processed_crop.shape[0]]]
+                for x0, y0, x1, y1 in lines:
+                    yield idx, BatchRecognizer.to_bgr(processed_crop[y0:y1, x0:x1])
+            continue
+        processed_crop = BatchRecognizer.to_bgr(processed_crop)
+
+        if not region.det:
+            yield idx, processed_crop
+            continue
+
+        # Detection stays enabled so it finds the "lost" number inside the crop
+        boxes = BatchRecognizer.detect(ocr, processed_crop)
+        with stage("crop_lines"):
+            for box in boxes:
+                yield idx, BatchRecognizer.crop_line(processed_crop, box)
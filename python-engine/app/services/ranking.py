@@ -0,0 +1,244 @@
+import logging
+from collections import Counter
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EDGE_KERNEL = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+
+
+class TableReader:
+    """
+    Row-structured reading of tall repetitive tables (alliance member lists, KvK and
+    power rankings) without the neural detector:
+      1. Rows: horizontal projection of the character edges over the whole frame. Runs
+         of inked pixel rows are row bands; pixel rows inked across most of the width
+         (panel borders) are cut out first, so touching panels still come apart. Bands
+         closer than ROW_GAP of a line height are one row (name over alliance tag).
+      2. Cells: vertical projection inside each row; blank runs wider than CELL_GAP
+         split cells, the spaces between words don't.
+      3. Lines: each cell is split into its stacked text lines by its own projection;
+         blobs taller than MAX_LINE (avatars, flags) or thinner than MIN_WIDTH (panel
+         borders) are not text.
+    The pipeline (pipelines.ranking) recognizes every line of every row in ONE call,
+    then `tabulate` assigns the cells to columns by x-range.
+    Sizes are pixels of a 1920px-wide frame, scaled to the frame.
+    """
+
+    MIN_INK = 0.01        # Share of the frame width a pixel row needs to be part of a row band
+    SEPARATOR = 0.6       # Pixel rows inked over this share of the width: panel borders
+    ROW_GAP = 0.5         # Blank gap (times the smaller band height) still inside one row
+    CELL_GAP = 24         # Blank columns that split two cells
+    MIN_LINE = 8          # Text line height range; taller blobs are avatars and icons
+    MAX_LINE = 52
+    MIN_WIDTH = 5         # Narrower ink is a panel's vertical border (a "1" is wider)
+
+    @classmethod
+    def layout(cls, img):
+        """
+        Text lines of the table as [(row, [x_min, y_min, x_max, y_max]), ...], in reading
+        order, and the row bands [(y_min, y_max), ...].
+        """
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+        h, w = gray.shape[:2]
+        s = w / 1920.0
+        grad = cv2.morphologyEx(gray, cv2.MORPH_GRADIENT, EDGE_KERNEL)
+        _, edges = cv2.threshold(grad, 0, 1, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+
+        profile = edges.sum(axis=1, dtype=np.int32) / float(w)
+        separators = profile >= cls.SEPARATOR
+        # Glyph strokes thin out for a pixel row or two inside a line: short dips don't split bands
+        bands = cls._runs((profile >= cls.MIN_INK) & ~separators, max_gap=max(2, int(2 * s)))
+
+        rows = []
+        for y0, y1 in bands:
+            if rows:
+                py0, py1 = rows[-1]
+                if y0 - py1 <= cls.ROW_GAP * min(y1 - y0, py1 - py0) and not separators[py1:y0].any():
+                    rows[-1] = (py0, y1)
+                    continue
+            rows.append((y0, y1))
+        rows = [(y0, y1) for y0, y1 in rows if y1 - y0 >= cls.MIN_LINE * s]
+
+        lines = []
+        cell_gap = max(2, int(cls.CELL_GAP * s))
+        min_line, max_line, min_width = cls.MIN_LINE * s, cls.MAX_LINE * s, cls.MIN_WIDTH * s
+        for r, (y0, y1) in enumerate(rows):
+            band = edges[y0:y1]
+            # Two edge pixels in a column: a stray dot of the panel texture is not ink
+            for x0, x1 in cls._runs(band.sum(axis=0, dtype=np.int32) >= 2, max_gap=cell_gap):
+                cell = band[:, x0:x1]
+                for ly0, ly1 in cls._runs(cell.any(axis=1), max_gap=2):
+                    if not min_line <= ly1 - ly0 <= max_line:
+                        continue
+                    cols = np.flatnonzero(cell[ly0:ly1].any(axis=0))
+                    lx0, lx1 = x0 + int(cols[0]), x0 + int(cols[-1]) + 1
+                    if lx1 - lx0 < min_width:
+                        continue
+                    # Same margin as ImageProcessor.find_text_lines: the recognizer expects some background
+                    pad = max(2, (ly1 - ly0) // 5)
+                    lines.append((r, [max(0, lx0 - pad), max(0, y0 + ly0 - pad),
+                                      min(w, lx1 + pad), min(h, y0 + ly1 + pad)]))
+        return lines, rows
+
+    @staticmethod
+    def _runs(mask, max_gap: int = 0):
+        """[start, end) of the True runs of a 1-D mask, joining runs separated by up to `max_gap` False."""
+        idx = np.flatnonzero(mask)
+        if idx.size == 0:
+            return []
+        splits = np.flatnonzero(np.diff(idx) > max_gap + 1) + 1
+        return [(int(run[0]), int(run[-1]) + 1) for run in np.split(idx, splits)]
+
+    @staticmethod
+    def cells(lines, recognized, drop_score: float):
+        """
+        Groups recognized lines ((row, box), (text, conf)) into table rows:
+        [{"box": [x_min, y_min, x_max, y_max], "cells": [{"text", "box", "conf"}]}].
+        Lines below `drop_score` (PaddleOCR's garbage filter) or empty are dropped.
+        """
+        rows = {}
+        for (r, box), (text, conf) in zip(lines, recognized):
+            if conf < drop_score or not text.strip():
+                continue
+            rows.setdefault(r, []).append({"text": text, "box": box, "conf": conf})
+        table = []
+        for r in sorted(rows):
+            cells = rows[r]
+            table.append({"box": [min(c["box"][0] for c in cells), min(c["box"][1] for c in cells),
+                                  max(c["box"][2] for c in cells), max(c["box"][3] for c in cells)],
+                          "cells": cells})
+        return table
+
+    @staticmethod
+    def columns(rows):
+        """
+        Column x-ranges [[x_min, x_max], ...]: the union of the cell ranges of the rows
+        holding the most common number of cells (data rows; headers and cut rows vary).
+        """
+        if not rows:
+            return []
+        counts = Counter(len(row["cells"]) for row in rows)
+        typical = max(counts, key=lambda n: (counts[n], n))
+        spans = sorted([c["box"][0], c["box"][2]] for row in rows if len(row["cells"]) == typical
+                       for c in row["cells"])
+        columns = [spans[0]]
+        for x0, x1 in spans[1:]:
+            if x0 < columns[-1][1]:
+                columns[-1][1] = max(columns[-1][1], x1)
+            else:
+                columns.append([x0, x1])
+        return columns
+
+    @classmethod
+    def tabulate(cls, rows):
+        """
+        Final response of a table: `columns`, `rows` (one text per column, "" when empty,
+        stacked lines of a cell joined by a space) and one block per cell with its
+        `row` and `column`. Extra row keys (frame, segment...) are kept.
+        """
+        columns = cls.columns(rows)
+        out_rows, blocks = [], []
+        for i, row in enumerate(rows):
+            texts = [[] for _ in columns]
+            cells = sorted(row["cells"], key=lambda c: (c["box"][1], c["box"][0]))
+            for cell in cells:
+                j = cls._column(columns, cell["box"])
+                texts[j].append(cell["text"])
+                x0, y0, x1, y1 = cell["box"]
+                blocks.append({"text": cell["text"], "box": [[x0, y0], [x1, y0], [x1, y1], [x0, y1]],
+                               "conf": cell["conf"], "row": i, "column": j})
+            extra = {k: v for k, v in row.items() if k not in ("box", "cells")}
+            out_rows.append({"box": row["box"], "cells": [" ".join(t) for t in texts],
+                             "conf": round(min(c["conf"] for c in cells), 4) if cells else 0.0, **extra})
+        return {
+            "success": True,
+            "columns": columns,
+            "rows": out_rows,
+            "full_text": "\n".join(" | ".join(c for c in row["cells"] if c) for row in out_rows),
+            "blocks": blocks,
+        }
+
+    @staticmethod
+    def _column(columns, box):
+        """Column with the largest x-overlap with the box, else the nearest one."""
+        best, best_overlap = 0, 0.0
+        for j, (x0, x1) in enumerate(columns):
+            overlap = min(x1, box[2]) - max(x0, box[0])
+            if overlap > best_overlap:
+                best, best_overlap = j, overlap
+        if best_overlap > 0:
+            return best
+        center = (box[0] + box[2]) / 2.0
+        return min(range(len(columns)), key=lambda j: abs((columns[j][0] + columns[j][1]) / 2.0 - center))
+
+    @classmethod
+    def merge(cls, keyframes, results, min_overlap=0.5):
+        """
+        Table of a scroll capture from the results of its keyframes (ScrollTracker).
+        Rows inside the scrolling band are placed in content coordinates (y + offset);
+        two rows of a segment covering min_overlap of the shorter one are the same row,
+        and the read with more cells (then the more confident one) is kept: a row cut
+        by the screen edge loses to its full read. Columns are computed on the result.
+        """
+        bands = {}
+        for k in keyframes:
+            if k["band"] is not None:
+                lo, hi = bands.get(k["segment"], k["band"])
+                bands[k["segment"]] = (min(lo, k["band"][0]), max(hi, k["band"][1]))
+
+        kept = []
+        buckets = {}  # (segment, area, 32px band) -> indices into kept
+
+        def score(row):
+            return len(row["cells"]), sum(c["conf"] for c in row["cells"]) / max(1, len(row["cells"]))
+
+        def buckets_of(row):
+            y0, y1 = row["box"][1], row["box"][3]
+            return [(row["segment"], row["area"], b) for b in range(int(y0) // 32, int(y1) // 32 + 1)]
+
+        for keyframe, result in zip(keyframes, results):
+            segment, offset = keyframe["segment"], keyframe["offset"]
+            band = bands.get(segment)
+            cells = {}
+            for block in result.get("blocks", []):
+                (x0, y0), (x1, y1) = block["box"][0], block["box"][2]
+                cells.setdefault(block["row"], []).append({"text": block["text"], "box": [x0, y0, x1, y1],
+                                                           "conf": block["conf"]})
+            for r, row in enumerate(result.get("rows", [])):
+                if r not in cells:
+                    continue
+                x0, y0, x1, y1 = row["box"]
+                scrolling = band is None or band[0] <= (y0 + y1) / 2.0 <= band[1]
+                dy = offset if scrolling else 0.0
+                area = "scroll" if scrolling else "static"
+                item = {"box": [x0, y0 + dy, x1, y1 + dy],
+                        "cells": [dict(c, box=[c["box"][0], c["box"][1] + dy, c["box"][2], c["box"][3] + dy])
+                                  for c in cells[r]],
+                        "frame": keyframe["frame"], "segment": segment, "area": area}
+
+                keys = buckets_of(item)
+                duplicate = None
+                for i in sorted(set().union(*(buckets.get(k, ()) for k in keys))):
+                    other = kept[i]["box"]
+                    inter = min(other[3], item["box"][3]) - max(other[1], item["box"][1])
+                    shorter = min(other[3] - other[1], item["box"][3] - item["box"][1])
+                    if inter > 0 and inter >= min_overlap * max(shorter, 1.0):
+                        duplicate = i
+                        break
+                if duplicate is None:
+                    kept.append(item)
+                    for k in keys:
+                        buckets.setdefault(k, set()).add(len(kept) - 1)
+                elif score(item) > score(kept[duplicate]):
+                    # The better read may sit a few pixels off: index it where it is now
+                    for k in buckets_of(kept[duplicate]):
+                        buckets[k].discard(duplicate)
+                    kept[duplicate] = item
+                    for k in keys:
+                        buckets.setdefault(k, set()).add(duplicate)
+
+        kept.sort(key=lambda row: (row["segment"], row["area"] == "scroll", row["box"][1]))
+        return cls.tabulate(kept)
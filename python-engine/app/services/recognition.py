@@ -0,0 +1,57 @@
+import cv2
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+class BatchRecognizer:
+    """
+    Thin layer over PaddleOCR's detector and recognizer predictors.
+    Lets callers detect text lines on many images first and then recognize
+    ALL lines in shared batches (the recognizer sorts them by aspect ratio and
+    splits them in groups of `rec_batch_num`), instead of one full
+    det+rec pass per image.
+    """
+
+    @staticmethod
+    def to_bgr(img):
+        """PaddleOCR predictors expect 3-channel BGR input."""
+        if img is not None and img.ndim == 2:
+            return cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+        return img
+
+    @staticmethod
+    def detect(ocr, img):
+        """Runs text detection only. Returns a list of 4x2 float32 quads."""
+        dt_boxes, _ = ocr.text_detector(img)
+        if dt_boxes is None:
+            return []
+        return [np.asarray(box, dtype=np.float32) for box in dt_boxes]
+
+    @staticmethod
+    def crop_line(img, box):
+        """
+        Rectifies a detected quad into a horizontal line image
+        (same geometry PaddleOCR uses internally before recognition).
+        """
+        pts = np.asarray(box, dtype=np.float32)
+        w = int(max(np.linalg.norm(pts[0] - pts[1]), np.linalg.norm(pts[2] - pts[3])))
+        h = int(max(np.linalg.norm(pts[0] - pts[3]), np.linalg.norm(pts[1] - pts[2])))
+        w, h = max(1, w), max(1, h)
+
+        dst = np.float32([[0, 0], [w, 0], [w, h], [0, h]])
+        M = cv2.getPerspectiveTransform(pts, dst)
+        line = cv2.warpPerspective(img, M, (w, h), borderMode=cv2.BORDER_REPLICATE, flags=cv2.INTER_CUBIC)
+
+        # Vertical text: rotate so the recognizer reads it left-to-right
+        if h / float(w) >= 1.5:
+            line = np.rot90(line)
+        return line
+
+    @staticmethod
+    def recognize(ocr, line_imgs):
+        """Recognizes many line images at once. Returns [(text, conf), ...] in input order."""
+        if not line_imgs:
+            return []
+        rec_res, _ = ocr.text_recognizer(line_imgs)
+        return [(str(text), float(conf)) for text, conf in rec_res]
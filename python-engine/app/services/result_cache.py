@@ -0,0 +1,219 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from app.core.config import settings
+from app.services.image_cache import ImageCache
+from app.services.incremental import FrameDiff
+
+logger = logging.getLogger(__name__)
+
+
+class _MemoryBackend:
+    """In-process LRU of serialized results, bounded by bytes."""
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (payload, expires_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            payload, expires_at = entry
+            if expires_at < time.time():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return payload
+
+    def put(self, key: str, payload: bytes):
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (payload, time.time() + self.ttl)
+            self._bytes += len(payload)
+            while self._bytes > self.max_bytes and self._entries:
+                self._drop(next(iter(self._entries)))
+
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def _drop(self, key: str):
+        payload, _ = self._entries.pop(key)
+        self._bytes -= len(payload)
+
+
+class _SqliteBackend:
+    """Local on-disk cache (survives restarts), bounded by bytes with LRU eviction."""
+
+    def __init__(self, path: str, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY, payload BLOB NOT NULL, size INTEGER NOT NULL,"
+            " expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_results_accessed ON results(accessed_at)")
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("DELETE FROM results WHERE expires_at < ?", (time.time(),))
+            self._bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload FROM results WHERE key = ? AND expires_at >= ?", (key, now)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE results SET accessed_at = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def put(self, key: str, payload: bytes):
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM results WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, payload, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, payload, len(payload), now + self.ttl, now)
+            )
+            self._bytes += len(payload) - (old[0] if old else 0)
+            if self._bytes > self.max_bytes:
+                self._evict(now)
+
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def _evict(self, now: float):
+        self._conn.execute("DELETE FROM results WHERE expires_at < ?", (now,))
+        # Drops least recently used entries until ~10% below the limit
+        target = int(self.max_bytes * 0.9)
+        self._bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        while self._bytes > target:
+            rows = self._conn.execute("SELECT key, size FROM results ORDER BY accessed_at LIMIT 64").fetchall()
+            if not rows:
+                break
+            self._conn.executemany("DELETE FROM results WHERE key = ?", [(k,) for k, _ in rows])
+            self._bytes -= sum(size for _, size in rows)
+
+
+class ResultCache:
+    """
+    Optional memoization of route results (RESULT_CACHE_BACKEND = off | memory | sqlite).
+    Key = route + image key + the pipeline parameters that shape the output.
+    The image key is the exact content hash, or a perceptual hash (RESULT_CACHE_PHASH)
+    so near-identical re-captures of the same screen also hit. A 64-bit dHash does
+    not see one changed number, so it only finds a candidate: the entry keeps the
+    content hash of the capture it was computed on, and is served for another capture
+    only when that one is still in the image cache and no FrameDiff tile changed.
+    """
+    _instance = None
+
+    def __init__(self, backend, use_phash: bool = False):
+        self._backend = backend
+        self.use_phash = use_phash
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            kind = settings.RESULT_CACHE_BACKEND
+            max_bytes = settings.RESULT_CACHE_MAX_MB * 1024 * 1024
+            if kind == "memory":
+                backend = _MemoryBackend(max_bytes, settings.RESULT_CACHE_TTL)
+            elif kind == "sqlite":
+                backend = _SqliteBackend(settings.RESULT_CACHE_PATH, max_bytes, settings.RESULT_CACHE_TTL)
+            else:
+                backend = None
+            if backend is not None:
+                logger.info(f"🗃️ Result cache enabled ({kind}, {settings.RESULT_CACHE_MAX_MB}MB)")
+            cls._instance = cls(backend, use_phash=settings.RESULT_CACHE_PHASH)
+        return cls._instance
+
+    @property
+    def enabled(self) -> bool:
+        return self._backend is not None
+
+    @staticmethod
+    def perceptual_hash(img) -> str:
+        """64-bit difference hash (dHash): robust to re-encoding, tiny shifts and noise."""
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+        small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+        bits = (small[:, 1:] > small[:, :-1]).flatten()
+        return f"{int(np.packbits(bits).view('>u8')[0]):016x}"
+
+    def make_key(self, route: str, img, content_hash: str, params: dict = None) -> str:
+        image_key = f"p:{self.perceptual_hash(img)}" if self.use_phash else f"c:{content_hash}"
+        raw = json.dumps([route, image_key, params or {}], sort_keys=True, default=str)
+        return hashlib.blake2b(raw.encode(), digest_size=20).hexdigest()
+
+    def get(self, key: str, is_valid=None, img=None, content_hash: str = None):
+        """
+        Returns a fresh copy of the cached result, or None. `is_valid(result)` can veto a stale hit.
+        With perceptual keys, `img` and its `content_hash` confirm the candidate is the same screen.
+        """
+        payload = self._backend.get(key)
+        # Every hit gets its own copy: routes add per-request fields to the result
+        result = json.loads(payload) if payload is not None else None
+        if result is not None and self.use_phash:
+            entry = result
+            result = entry.get("result") if self._same_image(entry.get("image"), img, content_hash) else None
+        if result is None or (is_valid is not None and not is_valid(result)):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return result
+
+    @staticmethod
+    def _same_image(cached_hash: str, img, content_hash: str) -> bool:
+        if cached_hash is None:
+            return False
+        if cached_hash == content_hash:
+            return True
+        prev = ImageCache.get_instance().get(cached_hash)
+        if prev is None or img is None:
+            return False  # The cached capture expired: nothing to compare against
+        diff = FrameDiff.compare(prev, img)
+        return diff is not None and not diff.changed.any()
+
+    def put(self, key: str, result: dict, content_hash: str = None):
+        if self.use_phash:
+            result = {"image": content_hash, "result": result}
+        try:
+            payload = json.dumps(result, separators=(",", ":")).encode()
+        except (TypeError, ValueError) as e:
+            logger.debug(f"Result not cacheable: {e}")
+            return
+        self._backend.put(key, payload)
+
+    def stats(self) -> dict:
+        if not self.enabled:
+            return {"enabled": False}
+        total = self.hits + self.misses
+        return {
+            "enabled": True,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+            "size_bytes": self._backend.size_bytes()
+        }
@@ -0,0 +1,277 @@
+import zipfile
+import cv2
+import numpy as np
+import logging
+
+from app.services.image_processing import ImageProcessor
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp", ".bmp")
+
+
+class ArchiveTooLarge(ValueError):
+    """Raised for a zip whose images expand beyond the allowed size."""
+
+
+def archive_images(archive: zipfile.ZipFile, max_bytes=(None, None)):
+    """
+    Image entries of a zip, sorted by name. Raises ArchiveTooLarge when they expand beyond
+    max_bytes = (total, per image) bytes. The sizes are the uncompressed ones of the zip
+    directory, checked before extraction (zipfile never inflates an entry past its declared size).
+    """
+    max_total, max_entry = max_bytes
+    entries = sorted((info for info in archive.infolist() if info.filename.lower().endswith(IMAGE_EXTENSIONS)),
+                     key=lambda info: info.filename)
+    for info in entries:
+        if max_entry is not None and info.file_size > max_entry:
+            raise ArchiveTooLarge(f"{info.filename}: {info.file_size} bytes once unzipped (limit {max_entry})")
+    total = sum(info.file_size for info in entries)
+    if max_total is not None and total > max_total:
+        raise ArchiveTooLarge(f"Archive expands to {total} bytes (limit {max_total})")
+    return entries
+
+
+def open_frames(path: str, sample_fps: float, max_bytes=(None, None)):
+    """
+    Yields (index, BGR frame) from a screen recording (any container/codec FFmpeg reads)
+    or a zip archive of screenshots (sorted by name), one frame at a time.
+    Video frames are sampled at `sample_fps`: skipped frames are grabbed, never converted.
+    Raises ValueError when the file is neither, ArchiveTooLarge past `max_bytes` (see archive_images).
+    """
+    if zipfile.is_zipfile(path):
+        yield from _archive_frames(path, max_bytes)
+    else:
+        yield from _video_frames(path, sample_fps)
+
+
+def _archive_frames(path: str, max_bytes):
+    with zipfile.ZipFile(path) as archive:
+        entries = archive_images(archive, max_bytes)
+        if not entries:
+            raise ValueError("Archive holds no images")
+        for index, info in enumerate(entries):
+            frame = ImageProcessor.bytes_to_cv2(archive.read(info))
+            if frame is None:
+                logger.warning(f"⚠️ Skipping undecodable archive entry '{info.filename}'")
+                continue
+            yield index, frame
+
+
+def _video_frames(path: str, sample_fps: float):
+    cap = cv2.VideoCapture(path)
+    try:
+        if not cap.isOpened():
+            raise ValueError("Unsupported upload: expected a video or a zip of images")
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        step = max(1, int(round(fps / sample_fps))) if sample_fps > 0 else 1
+        index = 0
+        while True:
+            if index % step:
+                if not cap.grab():
+                    return
+            else:
+                ok, frame = cap.read()
+                if not ok:
+                    return
+                yield index, frame
+            index += 1
+    finally:
+        cap.release()
+
+
+class ScrollTracker:
+    """
+    Picks the frames of a scroll capture that hold new content.
+    Frames are compared on small grayscale thumbnails, each with the one before:
+      - nothing changed: skipped, no FFT;
+      - the changed area (bounding rows/columns, so static headers and side menus
+        stay out) moved vertically: phase correlation gives the shift. Shifts are
+        chained from frame to frame (small shifts can't alias on the repeating item
+        grid) and re-anchored on the last keyframe while the overlap allows it, so
+        they don't drift. A frame is picked once STEP of the scrolling area is new;
+      - anything else (popup, tab switch, too fast a scroll): the last unpicked frame
+        and this one are picked, and a new segment starts (offsets restart at 0).
+    Offsets are in frame pixels: content at frame row y of a keyframe sits at y + offset.
+    """
+
+    THUMB_WIDTH = 480    # Chained shifts drift ~2% at 320px, <0.5% here; FFT sizes stay cheap
+    MIN_CHANGE = 6.0     # Mean gray difference of a thumbnail row/column that counts as changed
+    MIN_AREA = 0.05      # Changed rows AND columns below this share: animation/noise, not a scroll
+    MIN_RESPONSE = 0.1   # Phase correlation peak below this: the shift is not trusted
+    MAX_RESIDUAL = 12.0  # Mean difference left after undoing the shift: more is new content, not a scroll
+    MAX_DRIFT = 8.0      # Thumbnail px between the chained and the keyframe shift for the latter to be used (grid aliases are a row away)
+    STEP = 0.7           # Share of the scrolling area that must be new before the next keyframe
+
+    def __init__(self):
+        self.frames = 0
+        self.keyframes = []
+        self._key = None    # (thumb, offset) of the last keyframe
+        self._last = None   # (thumb, offset) of the last frame aligned in the current segment
+        self._prev = None   # (index, frame, thumb, offset, area) of the last aligned frame not picked
+        self._segment = 0
+        self._scale = 1.0
+
+    def feed(self, index: int, frame):
+        """
+        Returns the frames picked by this one, as [(keyframe, frame), ...] (usually empty);
+        keyframe = {"frame", "offset", "segment", "band"}.
+        """
+        self.frames += 1
+        thumb = self._thumb(frame)
+
+        if self._key is None:
+            return [self._pick(index, frame, thumb, 0.0, None)]
+
+        last_thumb, last_offset = self._last
+        area = self._changed_area(last_thumb, thumb)
+        if area is None:
+            return []
+
+        step = self._shift(last_thumb, thumb, area)
+        if step is None:
+            # Not a scroll: keep what the last frame showed, then start over
+            picked = self.finish()
+            self._segment += 1
+            return picked + [self._pick(index, frame, thumb, 0.0, None)]
+
+        offset = last_offset + step / self._scale
+        key_thumb, key_offset = self._key
+        key_area = self._changed_area(key_thumb, thumb)
+        if key_area is not None:
+            anchored = self._shift(key_thumb, thumb, key_area)
+            if anchored is not None and abs(key_offset + anchored / self._scale - offset) * self._scale <= self.MAX_DRIFT:
+                offset, area = key_offset + anchored / self._scale, key_area
+
+        self._last = (thumb, offset)
+        if abs(offset - key_offset) * self._scale >= self.STEP * (area[3] - area[2]):
+            return [self._pick(index, frame, thumb, offset, area)]
+        self._prev = (index, frame, thumb, offset, area)
+        return []
+
+    def finish(self):
+        """End of the capture (or of a segment): the last unpicked frame may still hold unread rows."""
+        if self._prev is None:
+            return []
+        return [self._pick(*self._prev)]
+
+    def _thumb(self, frame):
+        h, w = frame.shape[:2]
+        self._scale = min(1.0, self.THUMB_WIDTH / float(w))
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        if self._scale < 1.0:
+            gray = cv2.resize(gray, None, fx=self._scale, fy=self._scale, interpolation=cv2.INTER_AREA)
+        return gray.astype(np.float32)
+
+    def _pick(self, index, frame, thumb, offset, area):
+        band = None
+        if area is not None:
+            band = (int(area[2] / self._scale), int(np.ceil(area[3] / self._scale)))
+        keyframe = {"frame": index, "offset": round(float(offset), 1), "segment": self._segment, "band": band}
+        self.keyframes.append(keyframe)
+        self._key = self._last = (thumb, offset)
+        self._prev = None
+        return keyframe, frame
+
+    def _changed_area(self, a, b):
+        """Bounding (x0, x1, y0, y1) of the thumbnail rows/columns that differ, or None when nothing did."""
+        if a.shape != b.shape:
+            return (0, b.shape[1], 0, b.shape[0])
+        diff = cv2.absdiff(a, b)
+        cols = np.flatnonzero(diff.mean(axis=0) > self.MIN_CHANGE)
+        rows = np.flatnonzero(diff.mean(axis=1) > self.MIN_CHANGE)
+        if cols.size < self.MIN_AREA * a.shape[1] or rows.size < self.MIN_AREA * a.shape[0]:
+            return None
+        return (int(cols[0]), int(cols[-1]) + 1, int(rows[0]), int(rows[-1]) + 1)
+
+    def _shift(self, a, b, area):
+        """Vertical content shift from `a` to `b` (positive = scrolled down), in thumbnail px, or None."""
+        if a.shape != b.shape:
+            return None
+        x0, x1, y0, y1 = area
+        if x1 - x0 < 8 or y1 - y0 < 8:
+            return None
+        ca, cb = a[y0:y1, x0:x1], b[y0:y1, x0:x1]
+        # No window: it would fade out the edges, where the overlap of a large shift is
+        (dx, dy), response = cv2.phaseCorrelate(ca, cb)
+        if response < self.MIN_RESPONSE or abs(dx) > 2.0:
+            return None
+
+        # Check: once the shift is undone, the overlap must match
+        s = int(round(dy))
+        if abs(s) >= (y1 - y0) - 4:
+            return None
+        overlap_a = ca[max(0, -s):(y1 - y0) - max(0, s)]
+        overlap_b = cb[max(0, s):(y1 - y0) - max(0, -s)]
+        if float(cv2.absdiff(overlap_a, overlap_b).mean()) > self.MAX_RESIDUAL:
+            return None
+        return -dy
+
+    @staticmethod
+    def merge(keyframes, results, min_overlap=0.5):
+        """
+        Merges the inventory results of the keyframes (same order), dropping the lines
+        read twice. Lines inside the scrolling band are compared in content coordinates
+        (y + offset); lines outside it (headers, side menus) in frame coordinates.
+        Two lines of a segment covering each other (IoU >= min_overlap) are the same one:
+        the more confident read is kept (a row cut by the screen edge loses to its full read).
+        Returns blocks sorted by segment, then reading order; `box` is in content coordinates.
+        """
+        bands = {}
+        for k in keyframes:
+            if k["band"] is not None:
+                lo, hi = bands.get(k["segment"], k["band"])
+                bands[k["segment"]] = (min(lo, k["band"][0]), max(hi, k["band"][1]))
+
+        kept = []
+        rows = {}  # (segment, area, 32px row band) -> indices into kept
+
+        def overlaps(r, o):
+            ix = min(r[2], o[2]) - max(r[0], o[0])
+            iy = min(r[3], o[3]) - max(r[1], o[1])
+            if ix <= 0 or iy <= 0:
+                return False
+            union = (r[2] - r[0]) * (r[3] - r[1]) + (o[2] - o[0]) * (o[3] - o[1]) - ix * iy
+            return ix * iy >= min_overlap * max(union, 1.0)
+
+        def buckets_of(item):
+            rect = item["_rect"]
+            return [(item["segment"], item["area"], b) for b in range(int(rect[1]) // 32, int(rect[3]) // 32 + 1)]
+
+        for keyframe, result in zip(keyframes, results):
+            segment, offset = keyframe["segment"], keyframe["offset"]
+            band = bands.get(segment)
+            for block in result.get("blocks", []):
+                xs = [pt[0] for pt in block["box"]]
+                ys = [pt[1] for pt in block["box"]]
+                center = (min(ys) + max(ys)) / 2.0
+                scrolling = band is None or band[0] <= center <= band[1]
+                dy = offset if scrolling else 0.0
+                rect = [min(xs), min(ys) + dy, max(xs), max(ys) + dy]
+                area = "scroll" if scrolling else "static"
+                item = dict(block, box=[[pt[0], pt[1] + dy] for pt in block["box"]],
+                            frame=keyframe["frame"], segment=segment, area=area, _rect=rect)
+
+                buckets = buckets_of(item)
+                duplicate = None
+                for i in sorted(set().union(*(rows.get(b, ()) for b in buckets))):
+                    if overlaps(rect, kept[i]["_rect"]):
+                        duplicate = i
+                        break
+
+                if duplicate is None:
+                    kept.append(item)
+                    for b in buckets:
+                        rows.setdefault(b, set()).add(len(kept) - 1)
+                elif item["conf"] > kept[duplicate]["conf"]:
+                    # The better read takes the slot: re-index it under its own rows
+                    for b in buckets_of(kept[duplicate]):
+                        rows[b].discard(duplicate)
+                    kept[duplicate] = item
+                    for b in buckets:
+                        rows.setdefault(b, set()).add(duplicate)
+
+        kept.sort(key=lambda b: (b["segment"], round(b["_rect"][1] / 10.0), b["_rect"][0]))
+        for item in kept:
+            del item["_rect"]
+        return kept
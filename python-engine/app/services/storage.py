@@ -0,0 +1,135 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from io import BytesIO
+
+import cv2
+import numpy as np
+
+from app.core.config import settings
+from app.core.metrics import observe_stages
+
+logger = logging.getLogger(__name__)
+
+class ProcessedImageStore:
+    """
+    Processed images written to the shared volume for the C# Magnifier.
+    Writes happen in the background (after the response is sent) and are atomic
+    (temp file + rename), so a reader never sees a half-written image.
+    Only files created here ("proc_*") are cleaned up, by age and total size:
+    the uploads folder is shared with the C# side.
+    """
+    _instance = None
+
+    PREFIX = "proc_"
+    EXTENSIONS = {"png": ".png", "webp": ".webp", "npy": ".npy"}
+
+    def __init__(self, directory: str, fmt: str, png_level: int, ttl: float, max_bytes: int,
+                 cleanup_interval: float = 60):
+        if fmt not in self.EXTENSIONS:
+            logger.warning(f"Unknown PROCESSED_IMAGE_FORMAT '{fmt}', using png")
+            fmt = "png"
+        self.directory = directory
+        self.format = fmt
+        self.png_level = png_level
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.cleanup_interval = cleanup_interval
+        self._last_cleanup = 0.0
+        self._cleanup_lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            cls._instance = cls(
+                directory=settings.UPLOAD_DIR,
+                fmt=settings.PROCESSED_IMAGE_FORMAT,
+                png_level=settings.PROCESSED_IMAGE_PNG_LEVEL,
+                ttl=settings.PROCESSED_IMAGE_TTL,
+                max_bytes=settings.PROCESSED_IMAGE_MAX_MB * 1024 * 1024
+            )
+        return cls._instance
+
+    def new_name(self) -> str:
+        """File name (relative to the uploads folder) reserved for a processed image."""
+        return f"{self.PREFIX}{uuid.uuid4().hex}{self.EXTENSIONS[self.format]}"
+
+    def exists(self, name: str) -> bool:
+        return bool(name) and os.path.exists(os.path.join(self.directory, name))
+
+    def encode(self, img) -> bytes:
+        if self.format == "npy":
+            # Uncompressed: the .NET side can memory-map the pixels right after the header
+            buf = BytesIO()
+            np.save(buf, np.ascontiguousarray(img), allow_pickle=False)
+            return buf.getvalue()
+        if self.format == "webp":
+            # Quality above 100 selects lossless WebP
+            params = [cv2.IMWRITE_WEBP_QUALITY, 101]
+        else:
+            params = [cv2.IMWRITE_PNG_COMPRESSION, self.png_level]
+        ok, encoded = cv2.imencode(self.EXTENSIONS[self.format], img, params)
+        if not ok:
+            raise ValueError(f"Could not encode processed image as {self.format}")
+        return encoded.tobytes()
+
+    def write(self, name: str, img, route: str = "none"):
+        """Blocking write; meant to run as a background task (`route` labels its timing)."""
+        path = os.path.join(self.directory, name)
+        tmp_path = f"{path}.tmp"
+        t0 = time.perf_counter()
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                f.write(self.encode(img))
+            os.replace(tmp_path, path)
+            observe_stages({f"write_{self.format}": time.perf_counter() - t0}, route)
+        except Exception as e:
+            logger.error(f"🔥 Failed to save processed image {name}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self.maybe_cleanup()
+
+    def maybe_cleanup(self):
+        now = time.monotonic()
+        if now - self._last_cleanup < self.cleanup_interval or not self._cleanup_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_cleanup = now
+            self.cleanup()
+        finally:
+            self._cleanup_lock.release()
+
+    def cleanup(self):
+        """Deletes processed images older than the TTL, then the oldest ones above the size limit."""
+        now = time.time()
+        files = []
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if not entry.name.startswith(self.PREFIX) or not entry.is_file():
+                        continue
+                    st = entry.stat()
+                    # Temp files of writes still in progress are left alone
+                    if entry.name.endswith(".tmp") and now - st.st_mtime <= self.ttl:
+                        continue
+                    files.append((st.st_mtime, st.st_size, entry.path))
+        except FileNotFoundError:
+            return
+
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        for mtime, size, path in files:
+            if now - mtime <= self.ttl and total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                removed += 1
+                total -= size
+            except OSError:
+                pass
+        if removed:
+            logger.info(f"🧹 Removed {removed} processed image(s), {total / 1024 / 1024:.0f}MB left")
@@ -0,0 +1,171 @@
+import cv2
+import numpy as np
+import logging
+
+from app.services.recognition import BatchRecognizer
+from app.core.metrics import stage
+
+logger = logging.getLogger(__name__)
+
+class AdaptiveTiler:
+    """
+    Adaptive-resolution OCR for frames above the pipelines' resize limit (1440p / 4K).
+    PaddleOCR's detector shrinks its input to 960px (det_limit_side_len), so one pass
+    over a 4K frame loses small text, and resizing the frame first loses it anyway.
+    Instead:
+      1. A cheap detection pass on a downscaled copy says where the text is.
+      2. Only the tiles holding text are detected again at native resolution
+         (960px tiles: no internal downscale), with overlap between neighbours.
+      3. Lines cut by a tile seam are joined, duplicates from the overlap dropped.
+      4. All lines of all tiles are recognized in shared batches.
+    Returns PaddleOCR-style lines ([quad, (text, conf)]) in frame coordinates.
+    """
+
+    TILE = 960          # Native pixels per tile side (= the detector's input limit)
+    OVERLAP = 96        # Pixels shared by neighbouring tiles (several text lines high)
+    COARSE_WIDTH = 1280 # Width of the planning pass
+    MARGIN = 32         # Coarse boxes grow by this much (native px) before picking tiles
+
+    @classmethod
+    def run(cls, ocr, img):
+        tiles = cls.plan(ocr, img)
+
+        rects, cuts = [], []
+        with stage("tile_det"):
+            for tx0, ty0, tx1, ty1 in tiles:
+                for quad in BatchRecognizer.detect(ocr, img[ty0:ty1, tx0:tx1]):
+                    x0, y0 = quad.min(axis=0)
+                    x1, y1 = quad.max(axis=0)
+                    r = [x0 + tx0, y0 + ty0, x1 + tx0, y1 + ty0]
+                    rects.append(r)
+                    cuts.append(cls._touches_seam(r, (tx0, ty0, tx1, ty1), img.shape))
+
+        rects = cls.merge(rects, cuts)
+
+        with stage("crop_lines"):
+            quads = [np.float32([[x0, y0], [x1, y0], [x1, y1], [x0, y1]]) for x0, y0, x1, y1 in rects]
+            # Boxes are axis-aligned: a slice replaces crop_line's perspective warp
+            line_imgs = [cls._slice(img, r) for r in rects]
+
+        # Same garbage filter a full PaddleOCR pass applies (drop_score)
+        drop_score = getattr(ocr, "drop_score", 0.5)
+        return [
+            [q.tolist(), (text, conf)]
+            for q, (text, conf) in zip(quads, BatchRecognizer.recognize(ocr, line_imgs))
+            if conf >= drop_score
+        ]
+
+    @classmethod
+    def plan(cls, ocr, img):
+        """Tiles (x_min, y_min, x_max, y_max) of a native-resolution grid that contain text."""
+        h, w = img.shape[:2]
+        with stage("tile_plan"):
+            scale = min(1.0, cls.COARSE_WIDTH / float(w))
+            coarse = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1.0 else img
+            boxes = BatchRecognizer.detect(ocr, coarse)
+
+        xs = cls._starts(w)
+        ys = cls._starts(h)
+        tiles = []
+        for ty in ys:
+            for tx in xs:
+                tile = (tx, ty, min(w, tx + cls.TILE), min(h, ty + cls.TILE))
+                if any(cls._intersects(tile, box / scale, cls.MARGIN) for box in boxes):
+                    tiles.append(tile)
+        return tiles
+
+    @classmethod
+    def _starts(cls, length):
+        """Tile origins along one axis; the last tile is aligned to the frame edge."""
+        if length <= cls.TILE:
+            return [0]
+        starts = list(range(0, length - cls.TILE, cls.TILE - cls.OVERLAP))
+        starts.append(length - cls.TILE)
+        return starts
+
+    @staticmethod
+    def _slice(img, rect):
+        x0, y0, x1, y1 = int(rect[0]), int(rect[1]), int(np.ceil(rect[2])), int(np.ceil(rect[3]))
+        line = img[y0:max(y1, y0 + 1), x0:max(x1, x0 + 1)]
+        # Vertical text: rotate so the recognizer reads it left-to-right (as crop_line does)
+        if line.shape[0] / float(line.shape[1]) >= 1.5:
+            line = np.ascontiguousarray(np.rot90(line))
+        return line
+
+    @staticmethod
+    def _intersects(tile, quad, margin):
+        x0, y0 = quad.min(axis=0) - margin
+        x1, y1 = quad.max(axis=0) + margin
+        return x0 < tile[2] and x1 > tile[0] and y0 < tile[3] and y1 > tile[1]
+
+    @staticmethod
+    def _touches_seam(rect, tile, shape, tol=3):
+        """True when the box ends on an inner tile edge (the line probably continues in the neighbour)."""
+        h, w = shape[:2]
+        x0, y0, x1, y1 = rect
+        tx0, ty0, tx1, ty1 = tile
+        return ((tx0 > 0 and x0 <= tx0 + tol) or (tx1 < w and x1 >= tx1 - tol) or
+                (ty0 > 0 and y0 <= ty0 + tol) or (ty1 < h and y1 >= ty1 - tol))
+
+    @staticmethod
+    def merge(rects, cuts, min_v_overlap=0.5, min_containment=0.7):
+        """
+        Overlap-aware merge of the boxes of all tiles:
+        - boxes on the same line that overlap, where one was cut by a seam, are joined;
+        - otherwise a box mostly inside another (the same line seen by two tiles) is dropped.
+        Returns [x_min, y_min, x_max, y_max] boxes sorted top-to-bottom, left-to-right.
+        """
+        items = [[list(map(float, r)), c] for r, c in zip(rects, cuts)]
+        changed = True
+        while changed:
+            changed = False
+            kept = []
+            rows = {}  # 32px row band -> indices of kept boxes crossing it (only neighbours are compared)
+
+            def register(i):
+                o = kept[i][0]
+                for band in range(int(o[1]) // 32, int(o[3]) // 32 + 1):
+                    rows.setdefault(band, set()).add(i)
+
+            for rect, cut in items:
+                candidates = set()
+                for band in range(int(rect[1]) // 32, int(rect[3]) // 32 + 1):
+                    candidates.update(rows.get(band, ()))
+                for i in sorted(candidates):
+                    other = kept[i]
+                    o = other[0]
+                    ix = min(rect[2], o[2]) - max(rect[0], o[0])
+                    iy = min(rect[3], o[3]) - max(rect[1], o[1])
+                    if ix < 0 or iy <= 0:
+                        continue
+                    min_h = min(rect[3] - rect[1], o[3] - o[1])
+                    if iy < min_v_overlap * max(min_h, 1.0):
+                        continue
+                    if cut or other[1]:
+                        other[0] = [min(rect[0], o[0]), min(rect[1], o[1]), max(rect[2], o[2]), max(rect[3], o[3])]
+                        other[1] = cut and other[1]
+                        register(i)
+                        changed = True
+                        break
+                    area = min((rect[2] - rect[0]) * (rect[3] - rect[1]), (o[2] - o[0]) * (o[3] - o[1]))
+                    if ix * iy >= min_containment * max(area, 1.0):
+                        if (rect[2] - rect[0]) * (rect[3] - rect[1]) > (o[2] - o[0]) * (o[3] - o[1]):
+                            other[0] = rect
+                            register(i)
+                            changed = True
+                        break
+                else:
+                    kept.append([rect, cut])
+                    register(len(kept) - 1)
+            items = kept
+
+        rects = [r for r, _ in items]
+        # Reading order, like PaddleOCR's sorted_boxes (rows within 10px)
+        rects.sort(key=lambda r: (r[1], r[0]))
+        for i in range(len(rects) - 1):
+            for j in range(i, -1, -1):
+                if abs(rects[j + 1][1] - rects[j][1]) < 10 and rects[j + 1][0] < rects[j][0]:
+                    rects[j], rects[j + 1] = rects[j + 1], rects[j]
+                else:
+                    break
+        return rects
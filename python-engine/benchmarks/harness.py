@@ -0,0 +1,86 @@
+"""
+Shared helpers: latency statistics, peak RSS, and baseline JSON files.
+
+A baseline is the JSON written by `--save`: run metadata plus one row per case.
+`--compare` matches rows by their `case` name and flags every case whose
+median got slower than the tolerance allows. Sub-millisecond jitter is ignored
+(`min_delta_ms`), otherwise the cheapest kernels flag at random.
+"""
+import json
+import os
+import platform
+import resource
+import sys
+import time
+
+import numpy as np
+
+
+def summarize(samples, wall_seconds: float = None) -> dict:
+    """Latency percentiles in ms (+ throughput when the wall time of the run is known)."""
+    ms = np.asarray(samples, dtype=np.float64) * 1000.0
+    row = {
+        "n": int(ms.size),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+    }
+    if wall_seconds:
+        row["throughput_rps"] = round(ms.size / wall_seconds, 2)
+    return row
+
+
+def peak_rss_mb(include_children: bool = False) -> float:
+    """Peak resident memory of this process (ru_maxrss is KB on Linux)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if include_children:
+        peak = max(peak, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return round(peak / 1024.0, 1)
+
+
+def metadata(**extra) -> dict:
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        **extra,
+    }
+
+
+def save_baseline(path: str, meta: dict, rows: list):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"meta": meta, "rows": rows}, f, indent=2)
+    print(f"💾 Baseline saved to {path}")
+
+
+def compare_baseline(path: str, rows: list, metric: str = "p50_ms", tolerance: float = 0.15,
+                     min_delta_ms: float = 0.5) -> bool:
+    """Prints the change of `metric` per case. Returns False when any case regressed."""
+    with open(path) as f:
+        baseline = {r["case"]: r for r in json.load(f)["rows"]}
+
+    ok = True
+    print(f"\nvs {path} ({metric}, tolerance {tolerance:.0%})")
+    for row in rows:
+        old = baseline.get(row["case"])
+        if old is None or not old.get(metric):
+            print(f"  {row['case']:<44} new case")
+            continue
+        delta = row[metric] / old[metric] - 1.0
+        significant = abs(row[metric] - old[metric]) >= min_delta_ms
+        flag = ""
+        if delta > tolerance and significant:
+            flag = "  ❌ REGRESSION"
+            ok = False
+        elif delta < -tolerance and significant:
+            flag = "  ✅ faster"
+        print(f"  {row['case']:<44}{old[metric]:>10.3f} -> {row[metric]:>10.3f}  ({delta:+.1%}){flag}")
+    return ok
+
+
+def print_table(rows: list, columns: list):
+    print("".join(f"{c:>14}" if i else f"{c:<44}" for i, c in enumerate(columns)))
+    for row in rows:
+        print("".join(f"{row.get(c, ''):>14}" if i else f"{row[c]:<44}" for i, c in enumerate(columns)))
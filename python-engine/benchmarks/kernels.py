@@ -0,0 +1,109 @@
+"""
+Micro-benchmarks of the ImageProcessor kernels over synthetic frames.
+
+Every kernel runs on the frame kind it sees in production (report paper for
+isolate_paper, item grid for the color lookups...) at each resolution:
+
+    python -m benchmarks.kernels --resolutions 720p 1080p 1440p 4k --repeats 20
+    python -m benchmarks.kernels --save benchmarks/baselines/kernels.json
+    python -m benchmarks.kernels --compare benchmarks/baselines/kernels.json
+
+No OCR involved. With --compare, the exit code is 1 when a kernel regressed.
+"""
+import argparse
+import sys
+import time
+
+from app.services.color_map import ColorMap
+from app.services.image_processing import ImageProcessor
+from app.services.paper import PaperLocator
+from app.services.ranking import TableReader
+from benchmarks import harness
+from benchmarks.synthetic import RESOLUTIONS, make_frame, encode_png
+
+STRATEGIES = ("default", "HighContrastBinary", "InvertedBinary", "WhiteIsolation", "Sharpen")
+
+
+def _tile_boxes(w: int, h: int):
+    """Boxes of the quantity numbers drawn by make_frame(kind='inventory'), padded like the pipeline."""
+    s = w / 1920.0
+    tile, gap, pad = int(110 * s), int(22 * s), 25
+    boxes = []
+    for row in range(int(h * 0.7) // (tile + gap)):
+        for col in range(int(w * 0.6) // (tile + gap)):
+            x = int(w * 0.2) + col * (tile + gap)
+            y = int(h * 0.15) + row * (tile + gap) + tile - int(40 * s)
+            boxes.append([x - pad, y - pad, x + int(80 * s) + pad, y + int(35 * s) + pad])
+    return boxes
+
+
+def _cases(w: int, h: int):
+    """(name, callable) for every kernel at this resolution. Inputs are built once, outside the timing."""
+    report = make_frame(w, h, kind="report")
+    inventory = make_frame(w, h, kind="inventory")
+    ranking = make_frame(w, h, kind="ranking")
+    report_png = encode_png(report)
+    report_1080, _ = ImageProcessor.resize_if_needed(report, max_width=1920)
+    boxes = _tile_boxes(w, h)
+    tile = inventory[boxes[0][1]:boxes[0][3], boxes[0][0]:boxes[0][2]]
+
+    # Magnifier region: a ~300x60 number line of the profile panel (scaled with the frame)
+    s = w / 1920.0
+    rx, ry, rw, rh = int(w * 0.5), int(h * 0.3), int(300 * s), int(60 * s)
+
+    cases = [
+        ("bytes_to_cv2", lambda: ImageProcessor.bytes_to_cv2(report_png)),
+        ("resize_if_needed", lambda: ImageProcessor.resize_if_needed(report, max_width=1920)),
+        ("isolate_paper", lambda: ImageProcessor.isolate_paper(report_1080)),
+        ("PaperLocator.isolate[miss]", lambda: (PaperLocator._layouts.clear(), PaperLocator.isolate(report_1080))),
+        ("PaperLocator.isolate[hit]", lambda: PaperLocator.isolate(report_1080)),
+        ("apply_filters", lambda: ImageProcessor.apply_filters(inventory)),
+        ("detect_dominant_color", lambda: ImageProcessor.detect_dominant_color(tile)),
+        (f"ColorMap.classify[{len(boxes)}]", lambda: ColorMap.classify(inventory, boxes)),
+        ("TableReader.layout", lambda: TableReader.layout(ranking)),
+    ]
+    for strategy in STRATEGIES:
+        cases.append((f"process_region.{strategy}",
+                      lambda st=strategy: ImageProcessor.process_region(report, rx, ry, rw, rh, st)))
+    digit_crop = ImageProcessor.process_region(report, rx, ry, rw, rh, "HighContrastBinary")
+    cases.append(("project_lines", lambda: ImageProcessor.project_lines(digit_crop)))
+    return cases
+
+
+def run(resolutions, repeats: int, warmup: int = 2):
+    rows = []
+    for res in resolutions:
+        w, h = RESOLUTIONS[res]
+        for name, fn in _cases(w, h):
+            for _ in range(warmup):
+                fn()
+            samples = []
+            for _ in range(repeats):
+                t0 = time.perf_counter()
+                fn()
+                samples.append(time.perf_counter() - t0)
+            rows.append({"case": f"{name}@{res}", **harness.summarize(samples)})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--resolutions", nargs="+", choices=list(RESOLUTIONS), default=list(RESOLUTIONS))
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--save", metavar="PATH", help="write the results as a baseline JSON")
+    parser.add_argument("--compare", metavar="PATH", help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed p50 slowdown (0.15 = 15%%)")
+    args = parser.parse_args()
+
+    rows = run(args.resolutions, args.repeats)
+    harness.print_table(rows, ["case", "p50_ms", "p95_ms", "p99_ms"])
+    print(f"peak RSS: {harness.peak_rss_mb()} MB")
+
+    if args.save:
+        harness.save_baseline(args.save, harness.metadata(suite="kernels", repeats=args.repeats), rows)
+    if args.compare and not harness.compare_baseline(args.compare, rows, tolerance=args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+End-to-end load test of the routes against the in-process app.
+
+Requests go through the whole ASGI stack (middleware, decoding, inference pool,
+pipelines, background writes) via httpx's ASGI transport, `--concurrency` at a time:
+
+    python -m benchmarks.routes --resolution 1080p --requests 40 --concurrency 4
+    python -m benchmarks.routes --backend paddle --workers 2      # real engine
+    python -m benchmarks.routes --backend mypkg.ocr:SlowStub     # any factory
+
+The OCR backend is pluggable: `stub` (default, offline), `paddle` (the real
+OcrEngine) or `module:attr` naming a callable that returns a PaddleOCR-like object.
+Reported per route: throughput, p50/p95/p99 latency, errors and peak RSS so far.
+The result cache is forced off so every request does the full work.
+"""
+import argparse
+import asyncio
+import importlib
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks import harness
+from benchmarks.synthetic import RESOLUTIONS, make_frame, encode_png
+
+ROUTES = ("governor", "inventory", "reports", "batch", "rankings")
+
+# Magnifier rescans: [x, y, w, h] at 1920px (scaled to the frame) and strategy
+_REGIONS = [
+    ([960, 310, 300, 60], "default"),
+    ([960, 380, 300, 60], "HighContrastBinary"),
+    ([400, 450, 260, 50], "InvertedBinary"),
+    ([960, 450, 300, 60], "WhiteIsolation"),
+    ([400, 520, 260, 50], "Sharpen"),
+]
+
+
+def _configure(args):
+    # Settings are read at import time: everything here must happen before `app` is imported
+    os.environ["RESULT_CACHE_BACKEND"] = "off"
+    os.environ.setdefault("UPLOAD_DIR", tempfile.mkdtemp(prefix="rok-bench-"))
+    if args.workers:
+        os.environ["OCR_WORKERS"] = str(args.workers)
+
+    if args.backend == "paddle":
+        return
+    # Stub backends only exist in this process: worker processes would load PaddleOCR
+    os.environ["OCR_POOL_MODE"] = "thread"
+    from benchmarks import stub_ocr
+    if args.backend == "stub":
+        stub_ocr.install()
+    else:
+        module, _, attr = args.backend.partition(":")
+        stub_ocr.install(getattr(importlib.import_module(module), attr))
+
+
+def _request(route: str, png: bytes, scale: float, handle: str = None):
+    """(path, httpx kwargs) of one request. Batch reuses the frame through its image handle."""
+    if route == "batch":
+        regions = [{"id": f"r{i}", "box": [int(v * scale) for v in box], "strategy": strategy}
+                   for i, (box, strategy) in enumerate(_REGIONS)]
+        return "/batch/process", {"json": {"imageHandle": handle, "regions": regions}}
+    return f"/{route}/analyze/raw", {"content": png, "headers": {"content-type": "application/octet-stream"}}
+
+
+async def _load(client, route: str, png: bytes, scale: float, requests: int, concurrency: int):
+    handle = None
+    if route == "batch":
+        path, kwargs = _request("governor", png, scale)
+        r = await client.post(path, **kwargs)
+        r.raise_for_status()
+        handle = r.json()["image_handle"]
+
+    path, kwargs = _request(route, png, scale, handle)
+    latencies, errors = [], 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            t0 = time.perf_counter()
+            r = await client.post(path, **kwargs)
+            latencies.append(time.perf_counter() - t0)
+            if r.status_code != 200:
+                errors += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - t0
+
+
+async def run(args):
+    import httpx
+    from app.main import app
+    logging.getLogger().setLevel(logging.WARNING)
+
+    w, h = RESOLUTIONS[args.resolution]
+    scale = w / 1920.0
+    rows = []
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for route in args.routes:
+                kind = {"reports": "report", "batch": "governor", "rankings": "ranking"}.get(route, route)
+                png = encode_png(make_frame(w, h, kind=kind))
+                # Warmup: first-call allocations and lazy imports stay out of the numbers
+                await _load(client, route, png, scale, args.concurrency, args.concurrency)
+                latencies, errors, wall = await _load(client, route, png, scale, args.requests, args.concurrency)
+                rows.append({
+                    "case": f"{route}@{args.resolution}/c{args.concurrency}",
+                    **harness.summarize(latencies, wall),
+                    "errors": errors,
+                    "peak_rss_mb": harness.peak_rss_mb(include_children=args.backend == "paddle"),
+                })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--routes", nargs="+", choices=ROUTES, default=list(ROUTES))
+    parser.add_argument("--resolution", choices=list(RESOLUTIONS), default="1080p")
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--backend", default="stub", help="stub | paddle | module:attr")
+    parser.add_argument("--workers", type=int, help="OCR_WORKERS for this run")
+    parser.add_argument("--save", metavar="PATH", help="write the results as a baseline JSON")
+    parser.add_argument("--compare", metavar="PATH", help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed p50 slowdown (0.15 = 15%%)")
+    args = parser.parse_args()
+
+    _configure(args)
+    rows = asyncio.run(run(args))
+    harness.print_table(rows, ["case", "throughput_rps", "p50_ms", "p95_ms", "p99_ms", "errors", "peak_rss_mb"])
+
+    if args.save:
+        from app.core.config import settings
+        meta = harness.metadata(suite="routes", backend=args.backend, requests=args.requests,
+                                concurrency=args.concurrency, workers=settings.OCR_WORKERS,
+                                pool_mode=settings.OCR_POOL_MODE)
+        harness.save_baseline(args.save, meta, rows)
+    if args.compare and not harness.compare_baseline(args.compare, rows, tolerance=args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Startup profile of the engine: how long a fresh process takes to answer, to be ready,
+and to serve its first requests. Every run is a new interpreter, `--runs` times:
+
+    python -m benchmarks.startup --runs 5
+    python -m benchmarks.startup --backend paddle --workers 2    # real models
+
+Phases (seconds from the start of the interpreter unless noted):
+  - import_app:    `import app.main` alone (paddle is imported by the workers, not here);
+  - import_paddle: `import paddleocr` (paddle backend only), paid by every worker's first engine;
+  - livez:         lifespan started and /livez answered;
+  - ready:         /readyz answered 200 (every worker loaded and warmed up);
+  - engine_load / engine_warmup: model load and warmup of the default profile (worker 0, from /readyz);
+  - first_<route> / second_<route>: latency of the first two requests of a route once ready.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import subprocess
+import sys
+import time
+
+from benchmarks import harness
+from benchmarks.routes import _configure, _request
+from benchmarks.synthetic import make_frame, encode_png
+
+ROUTES = ("governor", "inventory", "reports")
+
+
+async def _child(args, t0: float) -> dict:
+    phases = {}
+    started = time.perf_counter()
+    import app.main
+    phases["import_app"] = time.perf_counter() - started
+    if args.backend == "paddle":
+        started = time.perf_counter()
+        import paddleocr  # noqa: F401
+        phases["import_paddle"] = time.perf_counter() - started
+
+    import httpx
+    logging.getLogger().setLevel(logging.WARNING)
+    application = app.main.app
+    async with application.router.lifespan_context(application):
+        transport = httpx.ASGITransport(app=application)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            (await client.get("/livez")).raise_for_status()
+            phases["livez"] = time.perf_counter() - t0
+            while True:
+                r = await client.get("/readyz")
+                if r.status_code == 200:
+                    break
+                if r.json().get("error"):
+                    raise RuntimeError(r.json()["error"])
+                await asyncio.sleep(0.01)
+            phases["ready"] = time.perf_counter() - t0
+            engine = r.json()["engines"][0].get("default", {})
+            phases["engine_load"] = engine.get("load_s", 0.0)
+            phases["engine_warmup"] = engine.get("warmup_s", 0.0)
+
+            for route in args.routes:
+                kind = {"reports": "report"}.get(route, route)
+                path, kwargs = _request(route, encode_png(make_frame(1920, 1080, kind=kind)), 1.0)
+                for label in ("first", "second"):
+                    started = time.perf_counter()
+                    (await client.post(path, **kwargs)).raise_for_status()
+                    phases[f"{label}_{route}"] = time.perf_counter() - started
+    return phases
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="fresh interpreters started")
+    parser.add_argument("--routes", nargs="+", choices=ROUTES, default=list(ROUTES))
+    parser.add_argument("--backend", default="stub", help="stub | paddle | module:attr")
+    parser.add_argument("--workers", type=int, help="OCR_WORKERS for this run")
+    parser.add_argument("--save", metavar="PATH", help="write the results as a baseline JSON")
+    parser.add_argument("--compare", metavar="PATH", help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed p50 slowdown (0.15 = 15%%)")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        t0 = time.perf_counter()
+        _configure(args)
+        print(json.dumps(asyncio.run(_child(args, t0))))
+        return
+
+    samples = {}
+    for _ in range(args.runs):
+        out = subprocess.run([sys.executable, "-m", "benchmarks.startup", "--child", *sys.argv[1:]],
+                             check=True, capture_output=True, text=True).stdout
+        for phase, seconds in json.loads(out.strip().splitlines()[-1]).items():
+            samples.setdefault(phase, []).append(seconds)
+    rows = [{"case": f"startup/{phase}", **harness.summarize(values)} for phase, values in samples.items()]
+    harness.print_table(rows, ["case", "n", "p50_ms", "p95_ms", "p99_ms"])
+
+    if args.save:
+        meta = harness.metadata(suite="startup", backend=args.backend, runs=args.runs, workers=args.workers)
+        harness.save_baseline(args.save, meta, rows)
+    if args.compare and not harness.compare_baseline(args.compare, rows, tolerance=args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
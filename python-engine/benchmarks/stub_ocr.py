@@ -0,0 +1,67 @@
+"""
+Offline stand-in for PaddleOCR used by the benchmarks.
+It exposes the same surface the pipelines use (ocr(), text_detector,
+text_recognizer, drop_score) but only does cheap OpenCV work, so the
+benchmarks run without model weights and measure everything except the
+neural network itself.
+"""
+import sys
+import types
+import cv2
+import numpy as np
+
+
+class _StubDetector:
+    def __call__(self, img):
+        # Text-like blobs: dark/bright strokes closed into line-shaped components
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+        edges = cv2.Canny(gray, 80, 200)
+        edges = cv2.dilate(edges, cv2.getStructuringElement(cv2.MORPH_RECT, (9, 3)))
+        contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        boxes = []
+        for cnt in contours:
+            x, y, w, h = cv2.boundingRect(cnt)
+            if w >= 8 and 6 <= h <= 200:
+                boxes.append([[x, y], [x + w, y], [x + w, y + h], [x, y + h]])
+        return np.array(boxes, dtype=np.float32).reshape(-1, 4, 2), 0.0
+
+
+class _StubRecognizer:
+    rec_batch_num = 16
+
+    def __call__(self, img_list):
+        # Deterministic fake text: digits derived from the line width
+        return [(str(img.shape[1] * 7 % 100000), 0.9) for img in img_list], 0.0
+
+
+class StubOcr:
+    drop_score = 0.5
+
+    def __init__(self, **kwargs):
+        self.text_detector = _StubDetector()
+        self.text_recognizer = _StubRecognizer()
+
+    def ocr(self, img, det=True, rec=True, cls=False):
+        if img.ndim == 2:
+            img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+        if not det:
+            return [self.text_recognizer([img])[0]]
+        boxes, _ = self.text_detector(img)
+        crops = [img[int(b[0][1]):int(b[2][1]), int(b[0][0]):int(b[2][0])] for b in boxes]
+        rec, _ = self.text_recognizer(crops)
+        return [[[box.tolist(), r] for box, r in zip(boxes, rec)]]
+
+
+def install(factory=StubOcr):
+    """
+    Makes every inference worker of this process use `factory()` instead of PaddleOCR.
+    Any object with the surface above plugs in (e.g. a stub with a fixed latency).
+    """
+    try:
+        import paddleocr  # noqa: F401
+    except ImportError:
+        # Lets app.core.engine import on machines without paddle installed
+        sys.modules["paddleocr"] = types.SimpleNamespace(PaddleOCR=factory)
+
+    from app.core.engine import OcrEngine
+    OcrEngine.create = staticmethod(lambda threads=None, profile="default": factory())
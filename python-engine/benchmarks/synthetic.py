@@ -0,0 +1,115 @@
+"""
+Synthetic Rise of Kingdoms-like frames for benchmarks.
+Not pixel-accurate screenshots, but with the same ingredients the pipelines
+react to: dark textured background, a beige report paper, rarity-colored
+item tiles with white quantity numbers, and many small text lines.
+"""
+import cv2
+import numpy as np
+
+RESOLUTIONS = {
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+    "1440p": (2560, 1440),
+    "4k": (3840, 2160),
+}
+
+# BGR tile colors for Green / Blue / Purple / Gold rarities
+_TILE_COLORS = [(60, 150, 40), (190, 110, 30), (170, 50, 140), (40, 170, 230)]
+
+# Ranking row pitch at 1920px wide (make_ranking)
+ROW_HEIGHT = 96
+
+
+def make_frame(width: int, height: int, kind: str = "report", seed: int = 7):
+    """
+    kind: 'report' (beige paper), 'inventory' (item grid), 'governor' (profile panel)
+    or 'ranking' (member list / ranking rows, see make_ranking).
+    """
+    rng = np.random.default_rng(seed)
+    s = width / 1920.0
+
+    # Dark blue-ish background with noise (compresses like a real capture)
+    img = np.empty((height, width, 3), np.uint8)
+    img[:] = (70, 45, 30)
+    noise = rng.integers(0, 25, (height // 8 + 1, width // 8 + 1, 1), dtype=np.uint8)
+    img += cv2.resize(noise, (width, height), interpolation=cv2.INTER_LINEAR)[..., None]
+
+    font = cv2.FONT_HERSHEY_SIMPLEX
+    if kind == "report":
+        x1, y1, x2, y2 = int(width * 0.18), int(height * 0.10), int(width * 0.82), int(height * 0.92)
+        cv2.rectangle(img, (x1, y1), (x2, y2), (170, 205, 225), -1)  # Beige paper
+        y = y1 + int(50 * s)
+        while y < y2 - int(20 * s):
+            for col in (x1 + int(40 * s), (x1 + x2) // 2 + int(20 * s)):
+                txt = f"{rng.integers(1, 999999):,}"
+                cv2.putText(img, txt, (col, y), font, 0.8 * s, (40, 40, 40), max(1, int(2 * s)), cv2.LINE_AA)
+            y += int(42 * s)
+    elif kind == "inventory":
+        tile = int(110 * s)
+        gap = int(22 * s)
+        for row in range(int(height * 0.7) // (tile + gap)):
+            for col in range(int(width * 0.6) // (tile + gap)):
+                x = int(width * 0.2) + col * (tile + gap)
+                y = int(height * 0.15) + row * (tile + gap)
+                color = _TILE_COLORS[(row * 7 + col) % len(_TILE_COLORS)]
+                cv2.rectangle(img, (x, y), (x + tile, y + tile), color, -1)
+                qty = str(rng.integers(1, 99999))
+                cv2.putText(img, qty, (x + int(8 * s), y + tile - int(10 * s)), font, 0.7 * s,
+                            (255, 255, 255), max(1, int(2 * s)), cv2.LINE_AA)
+    elif kind == "ranking":
+        make_ranking(img, rng, first=0)
+    else:
+        x1, y1, x2, y2 = int(width * 0.12), int(height * 0.12), int(width * 0.88), int(height * 0.88)
+        cv2.rectangle(img, (x1, y1), (x2, y2), (200, 215, 225), -1)
+        labels = ["Governor (ID: 193397278)", "Power", "99,999,012", "Kill Points", "2,063,935,270",
+                  "Alliance", "[RE87]RoyalEmpire", "Civilization", "Germany"]
+        for i, label in enumerate(labels):
+            cv2.putText(img, label, (x1 + int((60 + 520 * (i % 2)) * s), y1 + int((90 + 70 * (i // 2)) * s)),
+                        font, 1.0 * s, (50, 40, 30), max(1, int(2 * s)), cv2.LINE_AA)
+    return img
+
+
+def make_ranking(img, rng, first: int = 0):
+    """
+    Draws a ranking panel on `img`: a fixed header, then rows from rank `first + 1`
+    (rank, avatar, name over alliance tag, power), each ROW_HEIGHT px at 1920 wide.
+    Rows are a function of their rank only, so frames drawn from consecutive `first`
+    values look like a scrolled list. Returns the number of rows drawn.
+    """
+    height, width = img.shape[:2]
+    s = width / 1920.0
+    font = cv2.FONT_HERSHEY_SIMPLEX
+    x1, x2 = int(width * 0.15), int(width * 0.85)
+    top = int(height * 0.10)
+    cv2.rectangle(img, (x1, top), (x2, top + int(60 * s)), (60, 90, 120), -1)
+    for label, x in (("Rank", 0.17), ("Governor", 0.30), ("Power", 0.70)):
+        cv2.putText(img, label, (int(width * x), top + int(42 * s)), font, 0.9 * s, (230, 230, 230),
+                    max(1, int(2 * s)), cv2.LINE_AA)
+
+    row_h = int(ROW_HEIGHT * s)
+    y = top + int(80 * s)
+    drawn = 0
+    while y + row_h <= height - int(20 * s):
+        rank = first + drawn + 1
+        row_rng = np.random.default_rng(rank)
+        cv2.rectangle(img, (x1, y), (x2, y + row_h - int(8 * s)), (95, 75, 55) if rank % 2 else (110, 85, 60), -1)
+        cv2.putText(img, str(rank), (int(width * 0.17), y + int(55 * s)), font, 1.0 * s, (240, 240, 240),
+                    max(1, int(2 * s)), cv2.LINE_AA)
+        avatar = int(width * 0.24)
+        cv2.rectangle(img, (avatar, y + int(6 * s)), (avatar + int(70 * s), y + int(76 * s)),
+                      _TILE_COLORS[rank % len(_TILE_COLORS)], -1)
+        cv2.putText(img, f"Governor{row_rng.integers(100, 9999)}", (int(width * 0.30), y + int(36 * s)), font,
+                    0.9 * s, (240, 240, 240), max(1, int(2 * s)), cv2.LINE_AA)
+        cv2.putText(img, f"[RE{row_rng.integers(10, 99)}]RoyalEmpire", (int(width * 0.30), y + int(70 * s)), font,
+                    0.6 * s, (180, 200, 210), max(1, int(s)), cv2.LINE_AA)
+        cv2.putText(img, f"{row_rng.integers(10_000_000, 200_000_000):,}", (int(width * 0.70), y + int(55 * s)),
+                    font, 1.0 * s, (240, 240, 240), max(1, int(2 * s)), cv2.LINE_AA)
+        y += row_h
+        drawn += 1
+    return drawn
+
+
+def encode_png(img) -> bytes:
+    ok, buf = cv2.imencode(".png", img)
+    return buf.tobytes()
@@ -0,0 +1,100 @@
+"""
+Base64-in-JSON vs binary image transport.
+
+Every mode runs in a fresh subprocess (so peak RSS is not shared) against the
+in-process app with the stub OCR backend, and sends the same screenshot N times:
+
+    python -m benchmarks.transport --resolution 4k --requests 30 --route governor
+
+Reported per mode: payload size, p50/p99 latency and peak RSS above the idle app.
+"""
+import argparse
+import base64
+import json
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+MODES = ("base64", "raw", "multipart")
+
+
+def _percentile(samples, q):
+    return float(np.percentile(np.asarray(samples) * 1000.0, q))
+
+
+def _child(mode: str, route: str, resolution: str, requests: int):
+    from benchmarks import stub_ocr
+    stub_ocr.install()
+
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from benchmarks.synthetic import RESOLUTIONS, make_frame, encode_png
+
+    w, h = RESOLUTIONS[resolution]
+    png = encode_png(make_frame(w, h, kind="governor" if route == "governor" else route))
+    path = {"governor": "/governor/analyze", "inventory": "/inventory/analyze", "report": "/reports/analyze"}[route]
+
+    with TestClient(app) as client:
+        if mode == "base64":
+            body = json.dumps({"imageBase64": base64.b64encode(png).decode()})
+            send = lambda: client.post(path, content=body, headers={"content-type": "application/json"})
+            size = len(body)
+        elif mode == "raw":
+            send = lambda: client.post(path + "/raw", content=png, headers={"content-type": "application/octet-stream"})
+            size = len(png)
+        else:
+            send = lambda: client.post(path + "/raw", files={"image": ("frame.png", png, "image/png")})
+            size = len(png)
+
+        idle_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        latencies = []
+        for _ in range(requests):
+            t0 = time.perf_counter()
+            r = send()
+            latencies.append(time.perf_counter() - t0)
+            r.raise_for_status()
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    print(json.dumps({
+        "mode": mode,
+        "payload_kb": round(size / 1024, 1),
+        "p50_ms": round(_percentile(latencies, 50), 1),
+        "p99_ms": round(_percentile(latencies, 99), 1),
+        "peak_rss_mb": round(peak_rss / 1024, 1),
+        "rss_above_idle_mb": round((peak_rss - idle_rss) / 1024, 1),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--route", choices=("governor", "inventory", "report"), default="governor")
+    parser.add_argument("--resolution", default="4k")
+    parser.add_argument("--requests", type=int, default=30)
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args.child, args.route, args.resolution, args.requests)
+        return
+
+    rows = []
+    for mode in MODES:
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.transport", "--child", mode, "--route", args.route,
+             "--resolution", args.resolution, "--requests", str(args.requests)],
+            check=True, capture_output=True, text=True
+        ).stdout
+        rows.append(json.loads(out.strip().splitlines()[-1]))
+
+    print(f"{args.route} @ {args.resolution}, {args.requests} requests (stub OCR)")
+    print(f"{'mode':<10}{'payload KB':>12}{'p50 ms':>10}{'p99 ms':>10}{'peak RSS MB':>14}{'above idle':>12}")
+    for r in rows:
+        print(f"{r['mode']:<10}{r['payload_kb']:>12}{r['p50_ms']:>10}{r['p99_ms']:>10}"
+              f"{r['peak_rss_mb']:>14}{r['rss_above_idle_mb']:>12}")
+
+
+if __name__ == "__main__":
+    main()
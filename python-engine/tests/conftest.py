@@ -0,0 +1,31 @@
+"""
+Test setup: the app reads its settings at import time, so the environment is set
+here, before any `app` module is imported. OCR runs on benchmarks.stub_ocr
+(no PaddleOCR, no model weights), in thread mode.
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+os.environ.setdefault("UPLOAD_DIR", tempfile.mkdtemp(prefix="rok-tests-"))
+os.environ["OCR_POOL_MODE"] = "thread"
+os.environ["RESULT_CACHE_BACKEND"] = "off"
+
+from benchmarks import stub_ocr  # noqa: E402
+
+stub_ocr.install()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def inference_pool():
+    """Stops the shared pool's workers at the end, as the app's lifespan does."""
+    yield
+    from app.core.inference import InferencePool
+    if InferencePool._instance is not None:
+        InferencePool._instance.shutdown()
@@ -0,0 +1,173 @@
+import multiprocessing
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+from app.core.engine import OcrEngine
+from app.core.inference import InferencePool, _Job, _ProcessWorker, _Scheduler, _ThreadWorker, _process_main
+from app.core.shared_frame import SharedFrame, share_values
+from benchmarks.stub_ocr import StubOcr
+
+
+def _pipeline(ocr, name):
+    return f"single:{name}"
+
+
+def _pipeline_many(ocr, *names):
+    return [f"coalesced:{name}" for name in names]
+
+
+_pipeline.coalesced = _pipeline_many
+
+
+class _Backend:
+    """Runs jobs inline, like _ThreadWorker, and records the calls."""
+
+    def __init__(self):
+        self.calls = []
+        self.pid = 0
+        self.load_times = {}
+
+    def run(self, fn, args, profile, timeout):
+        self.calls.append((fn, args))
+        return fn(None, *args), {}
+
+    def after_job(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def _pool(coalesce_max=8):
+    return InferencePool(workers=1, queue_size=16, timeout=5, retry_after=1, coalesce_max=coalesce_max)
+
+
+def _drain(pool, backend):
+    """Runs the worker loop over what is queued (the scheduler is closed first, so it returns)."""
+    pool._scheduler.close()
+    worker = threading.Thread(target=pool._worker_loop, args=(backend,))
+    worker.start()
+    worker.join(timeout=5)
+    assert not worker.is_alive()
+
+
+def _job(name, units=1, lane="interactive"):
+    return _Job(_pipeline, (name,), "default", 5, lane, units)
+
+
+def test_dropped_head_does_not_answer_for_the_follower():
+    pool, backend = _pool(), _Backend()
+    head, follower = _job("A"), _job("B")
+    pool._scheduler.put_nowait(head)
+    pool._scheduler.put_nowait(follower)
+    head.future.cancel()  # Caller gone before a worker picked the job
+
+    _drain(pool, backend)
+
+    assert follower.future.result(timeout=1) == "single:B"
+    assert backend.calls == [(_pipeline, ("B",))]
+
+
+def test_busy_lanes_share_the_workers_by_weight():
+    scheduler = _Scheduler({"interactive": 4, "bulk": 1}, capacity=32)
+    for i in range(10):
+        scheduler.put_nowait(_job(f"b{i}", lane="bulk"))
+        scheduler.put_nowait(_job(f"i{i}", lane="interactive"))
+
+    lanes = [scheduler.get().lane for _ in range(10)]
+    assert lanes.count("interactive") == 8 and lanes.count("bulk") == 2
+
+
+def test_a_full_lane_does_not_block_the_others():
+    scheduler = _Scheduler({"interactive": 8, "bulk": 1}, capacity=2)
+    scheduler.put_nowait(_job("b0", lane="bulk"))
+    scheduler.put_nowait(_job("b1", lane="bulk"))
+    with pytest.raises(queue.Full):
+        scheduler.put_nowait(_job("b2", lane="bulk"))
+    scheduler.put_nowait(_job("i0"))
+    assert scheduler.depth("bulk") == 2 and scheduler.depth() == 3
+
+
+def test_compatible_jobs_run_as_one_call_up_to_the_coalescing_limit():
+    pool, backend = _pool(coalesce_max=3), _Backend()
+    jobs = [_job(name) for name in "ABCD"] + [_job("E", units=0)]
+    for job in jobs:
+        pool._scheduler.put_nowait(job)
+
+    _drain(pool, backend)
+
+    assert [j.future.result(timeout=1) for j in jobs] == [
+        "coalesced:A", "coalesced:B", "coalesced:C", "single:D", "single:E"]
+    assert backend.calls == [(_pipeline_many, ("A", "B", "C")), (_pipeline, ("D",)), (_pipeline, ("E",))]
+
+
+def test_lazy_profile_loads_of_thread_workers_do_not_overlap(monkeypatch):
+    lock, active, seen = threading.Lock(), [0], []
+
+    def create(threads=None, profile="default"):
+        with lock:
+            active[0] += 1
+            seen.append(active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+        return StubOcr()
+
+    monkeypatch.setattr(OcrEngine, "create", staticmethod(create))
+    workers = [_ThreadWorker(1) for _ in range(3)]
+    calls = [threading.Thread(target=w.run, args=(lambda ocr: None, (), "digits", 5)) for w in workers]
+    for t in calls:
+        t.start()
+    for t in calls:
+        t.join()
+
+    assert len(seen) == 6  # default at startup, then digits on first use, per worker
+    assert max(seen) == 1
+
+
+def _fail_on_frame(ocr, img):
+    raise ValueError(f"bad frame {img.shape}")
+
+
+def _frame_and_view(ocr, img):
+    return {"ok": True}, img[:10]
+
+
+def test_process_child_frees_its_input_after_failed_and_view_returning_jobs():
+    parent, child = multiprocessing.Pipe()
+    loop = threading.Thread(target=_process_main, args=(child, 1), daemon=True)
+    loop.start()
+    assert parent.recv()[0] == "ready"
+
+    img = np.zeros((64, 64, 3), np.uint8)
+    for fn in (_fail_on_frame, _frame_and_view):
+        args, blocks = share_values((img,))
+        parent.send((fn, args, "default"))
+        assert parent.poll(5)
+        status, payload, _ = parent.recv()
+        for shm in blocks:
+            SharedFrame.release(shm)  # The result must not depend on the input block
+        if fn is _fail_on_frame:
+            assert status == "err" and isinstance(payload, ValueError)
+        else:
+            assert status == "ok" and _ProcessWorker._collect(payload)[1].shape == (10, 64, 3)
+    parent.send(None)
+    loop.join(timeout=5)
+    assert not loop.is_alive()
+
+
+def test_unread_result_blocks_are_unlinked_when_a_worker_is_recycled():
+    parent, child = multiprocessing.Pipe()
+    result, blocks = share_values(({"ok": True}, np.ones((8, 8), np.uint8)))
+    for shm in blocks:
+        shm.close()  # The child's side: closed, left for the parent to unlink
+    child.send(("ok", result, {}))  # The reply of a job the parent gave up on
+
+    _ProcessWorker._discard_replies(parent)
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=result[1].name)
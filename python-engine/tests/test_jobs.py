@@ -0,0 +1,136 @@
+import asyncio
+import io
+import os
+import uuid
+import zipfile
+
+import pytest
+from fastapi import BackgroundTasks, FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.routes import jobs, reports
+from app.services.image_cache import ImageCache
+from app.services.jobs import JobStore
+from benchmarks.synthetic import make_frame, encode_png
+
+PNG = encode_png(make_frame(320, 180, kind="inventory"))
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path), ttl=60)
+
+
+def _zip(entries):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, data in entries:
+            zf.writestr(name, data)
+    buf.seek(0)
+    return buf
+
+
+def _staged_job(store, names, kind="report"):
+    job_id = store.create(kind, "default", {"saveProcessedImage": False})
+    for i, name in enumerate(names):
+        store.stage_file(job_id, i, name, io.BytesIO(PNG))
+    return job_id
+
+
+def test_job_goes_from_staging_to_done_numbering_items_in_completion_order(store):
+    job_id = _staged_job(store, ["a.png", "b.png"])
+    assert store.get(job_id)["status"] == "staging"
+    assert store.list() == []  # Not listed while its upload is written
+
+    assert store.commit(job_id) == 2
+    assert store.get(job_id)["status"] == "queued" and store.pending() == 2
+
+    first, second = store.claim(), store.claim()
+    assert (first["idx"], second["idx"]) == (0, 1) and first["options"] == {"saveProcessedImage": False}
+    assert store.get(job_id)["status"] == "running" and store.claim() is None
+
+    store.finish(job_id, 1, {"text": "b"}, ok=True)
+    assert not os.path.exists(second["path"])
+    store.finish(job_id, 0, {"error": "unreadable"}, ok=False)
+
+    job = store.get(job_id)
+    assert (job["status"], job["done"], job["failed"]) == ("done", 1, 1)
+    assert store.pending() == 0
+    assert [(i["index"], i["state"], i["seq"]) for i in store.items(job_id)] == [(0, "failed", 2), (1, "done", 1)]
+    assert [i["text"] for i in store.finished_since(job_id, 0) if "text" in i] == ["b"]
+    assert [i["index"] for i in store.finished_since(job_id, 1)] == [0]
+
+
+def test_released_and_interrupted_items_are_claimed_again(store, tmp_path):
+    job_id = _staged_job(store, ["a.png", "b.png"])
+    store.commit(job_id)
+
+    item = store.claim()
+    store.release(job_id, item["idx"])
+    assert store.claim()["idx"] == item["idx"]
+
+    store.claim()
+    restarted = JobStore(str(tmp_path), ttl=60)  # Both items were left running
+    assert restarted.pending() == 2 and restarted.claim()["idx"] == 0
+
+
+def test_unfinished_uploads_and_expired_jobs_are_removed(store, tmp_path):
+    staging = _staged_job(store, ["a.png"])
+    done = _staged_job(store, ["a.png"])
+    store.commit(done)
+    store.finish(done, store.claim()["idx"], {}, ok=True)
+
+    restarted = JobStore(str(tmp_path), ttl=0)
+    assert restarted.get(staging) is None and not os.path.exists(store._stage_dir(staging))
+    restarted.cleanup()
+    assert restarted.get(done) is None and restarted.delete(done) is False
+
+
+def test_ids_that_are_not_jobs_never_reach_the_disk(store, tmp_path, monkeypatch):
+    job_id = _staged_job(store, ["a.png"])
+    store.commit(job_id)
+    for bad in ("..", ".", "", "../x"):
+        assert store.delete(bad) is False
+    assert store.get(job_id)["total"] == 1 and os.path.isdir(store._stage_dir(job_id))
+
+    monkeypatch.setattr(JobStore, "_instance", store)
+    app = FastAPI()
+    app.include_router(jobs.router, prefix="/jobs")
+    client = TestClient(app)
+    for path in ("/jobs/%2E%2E", "/jobs/%2E", "/jobs/" + "A" * 32):
+        assert client.delete(path).status_code == 422
+    assert os.path.isfile(os.path.join(str(tmp_path), "jobs.db")) and os.path.isdir(store._stage_dir(job_id))
+    assert client.delete(f"/jobs/{uuid.uuid4().hex}").status_code == 404
+    assert client.delete(f"/jobs/{job_id}").status_code == 200
+    assert not os.path.exists(os.path.join(str(tmp_path), job_id))
+
+
+def test_zip_bomb_entry_is_refused_before_extraction(store):
+    job_id = store.create("report", "default", {})
+    bomb = _zip([("a.png", PNG), ("b.png", b"\0" * (8 * 1024 * 1024))])
+    with pytest.raises(ValueError):
+        store.stage_archive(job_id, bomb, 0, max_items=10, max_bytes=(None, 1024 * 1024))
+    assert os.listdir(store._stage_dir(job_id)) == []
+
+
+def test_archive_expanding_past_the_total_is_refused(store):
+    job_id = store.create("report", "default", {})
+    archive = _zip([(f"{i}.png", b"\0" * 600_000) for i in range(4)])
+    with pytest.raises(ValueError):
+        store.stage_archive(job_id, archive, 0, max_items=10, max_bytes=(2_000_000, 1_000_000))
+    assert os.listdir(store._stage_dir(job_id)) == []
+
+
+def test_job_report_items_stay_out_of_the_image_cache():
+    img = make_frame(1280, 720, kind="report")
+    cache = ImageCache.get_instance()
+
+    async def analyze(handle, hold):
+        return await reports.analyze_frame(img, handle, False, BackgroundTasks(), hold=hold)
+
+    result = asyncio.run(analyze("job-item", hold=False))
+    assert "processed_image_handle" not in result
+    assert cache.get(ImageCache.content_hash(b"report:job-item")) is None
+
+    result = asyncio.run(analyze("interactive", hold=True))
+    assert cache.get(result["processed_image_handle"]) is not None
@@ -0,0 +1,62 @@
+import numpy as np
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+
+from app.core import metrics
+from app.schemas.requests import CropRegion
+from app.services import pipelines
+
+
+def _app():
+    router = APIRouter()
+
+    @router.get("/{job_id}")
+    async def get_job(job_id: str):
+        return {"id": job_id}
+
+    app = FastAPI()
+    app.add_middleware(metrics.MetricsMiddleware)
+    app.include_router(router, prefix="/jobs")
+    return app
+
+
+def _routes():
+    return {labels[0] for labels in metrics.REQUEST_SECONDS._series}
+
+
+def test_requests_are_labelled_by_route_template():
+    client = TestClient(_app())
+    for i in range(5):
+        assert client.get(f"/jobs/job{i}").status_code == 200
+    assert client.get("/nowhere/1").status_code == 404
+    assert client.get("/nowhere/2").status_code == 404
+
+    routes = _routes()
+    assert "/jobs/{job_id}" in routes and "unmatched" in routes
+    assert not any(route.startswith(("/jobs/job", "/nowhere")) for route in routes)
+
+
+def test_route_template_of_nested_path_params():
+    scope = {"endpoint": object(), "path": "/jobs/abc/events", "path_params": {"job_id": "abc"}}
+    assert metrics._route_template(scope) == "/jobs/{job_id}/events"
+    assert metrics._route_template({"path": "/jobs/abc"}) == "unmatched"
+
+
+def test_label_values_are_escaped():
+    histogram = metrics.Histogram("rok_test_seconds", "Test.", ("stage",), buckets=(1.0,))
+    histogram.observe(0.5, 'a"b\\c\nd')
+    lines = histogram.render()
+
+    assert len(lines) == 6  # HELP, TYPE, two buckets, sum, count: the newline did not split a sample
+    assert lines[-1] == 'rok_test_seconds_count{stage="a\\"b\\\\c\\nd"} 1'
+
+
+def test_unknown_region_strategies_share_one_stage_label():
+    img = np.full((200, 300, 3), 255, np.uint8)
+    regions = [CropRegion(id=str(i), box=[10, 10, 100, 40], strategy=strategy, digits=True)
+               for i, strategy in enumerate(["WhiteIsolation", "made-up", 'x"}\n'])]
+    with metrics.collect() as timings:
+        list(pipelines._region_lines(None, img, regions))
+
+    assert {name for name in timings if name.startswith("process_region.")} == {
+        "process_region.WhiteIsolation", "process_region.default"}
@@ -0,0 +1,66 @@
+import asyncio
+import base64
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.dispatch import BlockFormat, resolve_profile
+from app.api.routes import rankings
+from app.schemas.requests import OcrRequest
+from app.services.ranking import TableReader
+from benchmarks.synthetic import encode_png, make_frame
+
+
+def _keyframe(frame, offset, band=(100, 1000), segment=0):
+    return {"frame": frame, "offset": offset, "segment": segment, "band": band}
+
+
+def _result(*rows):
+    """Keyframe result with one single-cell row per (text, y0, y1, conf)."""
+    out = {"rows": [], "blocks": []}
+    for r, (text, y0, y1, conf) in enumerate(rows):
+        out["rows"].append({"box": [0, y0, 100, y1]})
+        out["blocks"].append({"text": text, "box": [[0, y0], [100, y0], [100, y1], [0, y1]], "conf": conf, "row": r})
+    return out
+
+
+def test_layout_finds_one_band_per_ranking_row():
+    img = make_frame(1920, 1080, kind="ranking")
+    lines, rows = TableReader.layout(img)
+
+    assert len(rows) >= 8  # Header + the member rows that fit on the screen
+    assert all(y1 > y0 for y0, y1 in rows)
+    assert {r for r, _ in lines} <= set(range(len(rows)))
+
+
+def test_rows_seen_on_two_keyframes_are_kept_once():
+    keyframes = [_keyframe(0, 0.0), _keyframe(5, 300.0)]
+    results = [_result(("Header", 20, 60, 0.9), ("row A", 400, 440, 0.9), ("row B", 700, 740, 0.9)),
+               _result(("Header", 20, 60, 0.9), ("row B", 400, 440, 0.95), ("row C", 700, 740, 0.9))]
+    table = TableReader.merge(keyframes, results)
+
+    assert [row["cells"] for row in table["rows"]] == [["Header"], ["row A"], ["row B"], ["row C"]]
+    row_b = table["rows"][2]
+    assert row_b["frame"] == 5 and row_b["box"][1] == 700
+
+
+def test_replaced_rows_are_matched_at_their_new_position():
+    # Each read overlaps the previous one by half and is more confident, so it takes its slot;
+    # the last one lies entirely below the first read's 32px bands
+    keyframes = [_keyframe(i, 0.0, band=None) for i in range(5)]
+    results = [_result(("row", 16 * i, 16 * i + 48, 0.5 + 0.1 * i)) for i in range(5)]
+    table = TableReader.merge(keyframes, results)
+
+    assert len(table["rows"]) == 1
+    assert table["rows"][0]["frame"] == 4
+
+
+def test_rankings_accept_recognition_only_profiles():
+    with pytest.raises(HTTPException) as e:
+        resolve_profile("rec")
+    assert e.value.status_code == 422
+
+    img = make_frame(1280, 720, kind="ranking")
+    request = OcrRequest(imageBase64=base64.b64encode(encode_png(img)).decode(), profile="rec")
+    result = asyncio.run(rankings.analyze_ranking(request, BlockFormat(format="json", boxes="quad")))
+    assert result["success"] and result["rows"] and result["columns"]
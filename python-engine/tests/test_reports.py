@@ -0,0 +1,37 @@
+import asyncio
+
+import pytest
+from fastapi import BackgroundTasks
+
+from app.api.routes import reports
+from app.services.image_cache import ImageCache
+from app.services.result_cache import ResultCache, _MemoryBackend
+from benchmarks.synthetic import make_frame
+
+
+@pytest.fixture
+def result_cache(monkeypatch):
+    cache = ResultCache(_MemoryBackend(16 * 1024 * 1024, ttl=60))
+    monkeypatch.setattr(ResultCache, "_instance", cache)
+    return cache
+
+
+def _analyze(img, handle):
+    return asyncio.run(reports.analyze_frame(img, handle, False, BackgroundTasks()))
+
+
+def test_cache_hit_only_returns_a_processed_handle_that_is_still_held(result_cache):
+    img = make_frame(1280, 720, kind="report")
+    first = _analyze(img, "report-hit")
+    assert ImageCache.get_instance().get(first["processed_image_handle"]) is not None
+
+    second = _analyze(img, "report-hit")
+    assert result_cache.hits == 1
+    assert second["processed_image_handle"] == first["processed_image_handle"]
+
+    images = ImageCache.get_instance()
+    with images._lock:
+        images._drop(first["processed_image_handle"])
+    third = _analyze(img, "report-hit")
+    assert result_cache.hits == 2
+    assert "processed_image_handle" not in third
@@ -0,0 +1,75 @@
+import cv2
+
+from app.services.image_cache import ImageCache
+from app.services.result_cache import ResultCache, _MemoryBackend
+from benchmarks.synthetic import make_frame
+
+PARAMS = {"max_width": 1920}
+
+
+def _cache(use_phash):
+    return ResultCache(_MemoryBackend(1024 * 1024, ttl=60), use_phash=use_phash)
+
+
+def _report_pair():
+    """A report and the same report with one figure changed."""
+    img = make_frame(1920, 1080, kind="report")
+    changed = img.copy()
+    cv2.rectangle(changed, (420, 180), (620, 215), (170, 205, 225), -1)
+    cv2.putText(changed, "123,456", (420, 205), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (40, 40, 40), 2, cv2.LINE_AA)
+    return img, changed
+
+
+def test_content_key_depends_on_route_image_and_params():
+    cache = _cache(use_phash=False)
+    img = make_frame(640, 360, kind="inventory")
+    key = cache.make_key("inventory", img, "aaa", PARAMS)
+    assert key == cache.make_key("inventory", img, "aaa", dict(PARAMS))
+    assert key != cache.make_key("inventory", img, "bbb", PARAMS)
+    assert key != cache.make_key("governor", img, "aaa", PARAMS)
+    assert key != cache.make_key("inventory", img, "aaa", {"max_width": 1280})
+
+
+def test_content_key_roundtrip():
+    cache = _cache(use_phash=False)
+    img = make_frame(640, 360, kind="inventory")
+    key = cache.make_key("inventory", img, "aaa", PARAMS)
+    assert cache.get(key) is None
+    cache.put(key, {"success": True, "blocks": []}, "aaa")
+    assert cache.get(key) == {"success": True, "blocks": []}
+    assert cache.get(key, is_valid=lambda result: False) is None
+
+
+def test_phash_candidate_with_a_changed_figure_is_not_served():
+    cache = _cache(use_phash=True)
+    img, changed = _report_pair()
+    assert cache.perceptual_hash(img) == cache.perceptual_hash(changed)  # Same candidate...
+    ImageCache.get_instance().put("old", img)
+    ImageCache.get_instance().put("new", changed)
+
+    key = cache.make_key("report", img, "old", PARAMS)
+    assert key == cache.make_key("report", changed, "new", PARAMS)
+    cache.put(key, {"full_text": "old figures"}, "old")
+
+    assert cache.get(key, img=changed, content_hash="new") is None  # ...but not the same screen
+    assert cache.get(key, img=img, content_hash="old") == {"full_text": "old figures"}
+
+
+def test_phash_serves_a_recapture_of_an_unchanged_screen():
+    cache = _cache(use_phash=True)
+    img, _ = _report_pair()
+    ok, jpg = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 95])
+    recapture = cv2.imdecode(jpg, cv2.IMREAD_COLOR)
+    ImageCache.get_instance().put("png", img)
+
+    key = cache.make_key("report", img, "png", PARAMS)
+    cache.put(key, {"full_text": "same"}, "png")
+    assert cache.get(key, img=recapture, content_hash="jpg") == {"full_text": "same"}
+
+
+def test_phash_candidate_whose_capture_expired_is_a_miss():
+    cache = _cache(use_phash=True)
+    img, _ = _report_pair()
+    key = cache.make_key("report", img, "gone", PARAMS)
+    cache.put(key, {"full_text": "x"}, "gone")
+    assert cache.get(key, img=img, content_hash="other") is None
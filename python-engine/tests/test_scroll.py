@@ -0,0 +1,81 @@
+import asyncio
+import zipfile
+
+import numpy as np
+import pytest
+from fastapi import HTTPException
+
+from app.api import dispatch
+from app.core.config import settings
+from app.services import pipelines
+from app.services.scroll import ArchiveTooLarge, ScrollTracker, open_frames
+from benchmarks.synthetic import encode_png
+
+
+def _keyframe(frame, offset, band=(100, 1000), segment=0):
+    return {"frame": frame, "offset": offset, "segment": segment, "band": band}
+
+
+def _block(text, y0, y1, conf=0.9, x0=0, x1=100):
+    return {"text": text, "box": [[x0, y0], [x1, y0], [x1, y1], [x0, y1]], "conf": conf}
+
+
+def test_rows_seen_on_two_keyframes_are_kept_once_in_content_coordinates():
+    keyframes = [_keyframe(0, 0.0), _keyframe(5, 300.0)]
+    results = [
+        {"blocks": [_block("Header", 20, 60), _block("row A", 400, 440), _block("row B", 700, 740)]},
+        {"blocks": [_block("Header", 20, 60), _block("row B", 400, 440, conf=0.95), _block("row C", 700, 740)]},
+    ]
+    blocks = ScrollTracker.merge(keyframes, results)
+
+    assert [b["text"] for b in blocks] == ["Header", "row A", "row B", "row C"]
+    row_b = blocks[2]
+    assert row_b["frame"] == 5 and row_b["conf"] == 0.95  # The more confident read
+    assert row_b["box"][0][1] == 700  # 400 + the keyframe's offset
+    assert blocks[0]["area"] == "static" and row_b["area"] == "scroll"
+
+
+def test_replaced_rows_are_matched_at_their_new_position():
+    # Each read overlaps the previous one (IoU 0.5) and is more confident, so it takes its slot;
+    # the last one lies entirely below the first read's 32px row bands
+    keyframes = [_keyframe(i, 0.0, band=None) for i in range(5)]
+    results = [{"blocks": [_block("row", 16 * i, 16 * i + 48, conf=0.5 + 0.1 * i)]} for i in range(5)]
+    blocks = ScrollTracker.merge(keyframes, results)
+
+    assert len(blocks) == 1
+    assert blocks[0]["frame"] == 4
+
+
+def test_frames_past_the_cap_are_neither_decoded_nor_picked():
+    rng = np.random.default_rng(0)
+    decoded = []
+
+    def frames():
+        for i in range(200):
+            decoded.append(i)
+            # Unrelated screens: every frame starts a segment and is picked
+            yield i, rng.integers(0, 255, (90, 160, 3), dtype=np.uint8)
+
+    source, tracker, keyframes = frames(), ScrollTracker(), []
+    while picked := dispatch._next_keyframes(source, tracker, max_frames=40):
+        keyframes += picked
+
+    assert len(decoded) == tracker.frames == 40
+    assert len(keyframes) <= 40 and keyframes[-1][0]["frame"] <= 39
+
+
+def test_zip_bomb_scroll_captures_are_refused_before_decoding(tmp_path, monkeypatch):
+    path = str(tmp_path / "capture.zip")
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("0.png", encode_png(np.zeros((90, 160, 3), np.uint8)))
+        zf.writestr("1.png", b"\0" * (4 * 1024 * 1024))
+
+    with pytest.raises(ArchiveTooLarge):
+        next(open_frames(path, 10, max_bytes=(None, 1024 * 1024)))
+    with pytest.raises(ArchiveTooLarge):
+        next(open_frames(path, 10, max_bytes=(2 * 1024 * 1024, None)))
+
+    monkeypatch.setattr(settings, "SCROLL_MAX_IMAGE_MB", 1)
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(dispatch.scroll_inference(path, "inventory", pipelines.inventory, "default", 10))
+    assert e.value.status_code == 413
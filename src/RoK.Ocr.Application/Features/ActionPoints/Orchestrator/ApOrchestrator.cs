@@ -42,21 +42,38 @@ public class ApOrchestrator
         var itemTracker = new Dictionary<string, ApItemEntry>();
         var rawTextBuilder = new System.Text.StringBuilder();
 
+        // 1. Save every screenshot first: the whole scroll session is OCR'd in ONE streamed request
+        var tempPaths = new string?[images.Count];
+        var saveErrors = new Exception?[images.Count];
+        for (int i = 0; i < images.Count; i++)
+        {
+            try
+            {
+                using var stream = images[i].OpenReadStream();
+                tempPaths[i] = await _storage.SaveImageAsync(stream, images[i].FileName);
+            }
+            catch (Exception ex)
+            {
+                saveErrors[i] = ex;
+            }
+        }
+
+        // 2. OCR Python (frames are pipelined on the engine; results are in frame order)
+        var savedPaths = tempPaths.OfType<string>().ToList();
+        var ocrResults = await _ocrService.AnalyzeInventorySessionAsync(savedPaths);
+        int frame = 0;
+
         int imageIndex = 0;
 
         foreach (var imageFile in images)
         {
             imageIndex++;
-            string tempPath = "";
+            string tempPath = tempPaths[imageIndex - 1] ?? "";
             try
             {
-                using (var stream = imageFile.OpenReadStream())
-                {
-                    tempPath = await _storage.SaveImageAsync(stream, imageFile.FileName);
-                }
+                if (saveErrors[imageIndex - 1] is { } saveError) throw saveError;
 
-                // 2. OCR Python
-                var (rawBlocks, fullText) = await _ocrService.AnalyzeInventoryAsync(tempPath);
+                var (rawBlocks, fullText) = ocrResults[frame++];
                 
                 if (rawTextBuilder.Length > 0) rawTextBuilder.Append(" | ");
                 rawTextBuilder.Append($"[IMG {imageIndex}] {fullText}");
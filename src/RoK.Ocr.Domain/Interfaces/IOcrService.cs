@@ -10,4 +10,5 @@ public interface IOcrService
     Task<(List<OcrBlock> Blocks, double Width, double Height, bool IsIsolated, string ProcessedPath)> AnalyzeReportAsync(string imagePath);
     Task<List<OcrBlock>> AnalyzeBatchAsync(string imagePath, List<(string Id, int[] Box, string Strategy)> regions);
     Task<(List<OcrBlock> Blocks, string FullText)> AnalyzeInventoryAsync(string imagePath);
+    Task<List<(List<OcrBlock> Blocks, string FullText)>> AnalyzeInventorySessionAsync(List<string> imagePaths);
 }
\ No newline at end of file
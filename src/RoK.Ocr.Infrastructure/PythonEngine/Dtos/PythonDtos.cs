@@ -17,6 +17,18 @@ public class PythonOcrResponse
 
     [JsonPropertyName("detail")]
     public string? ErrorDetail { get; set; }
+
+    // Content hash of the decoded screenshot, accepted by /batch/process instead of the image
+    [JsonPropertyName("image_handle")]
+    public string? ImageHandle { get; set; }
+}
+
+// --- INVENTORY SESSION (one NDJSON line per frame, then a final "done" line) ---
+public class PythonSessionFrame : PythonOcrResponse
+{
+    [JsonPropertyName("frame")] public int? Frame { get; set; }
+    [JsonPropertyName("done")] public bool Done { get; set; }
+    [JsonPropertyName("error")] public string? Error { get; set; }
 }
 
 public class PythonBlockDto
@@ -41,6 +53,8 @@ public class PythonReportResponse
     [JsonPropertyName("blocks")] public List<PythonBlockDto> Blocks { get; set; } = new();
     [JsonPropertyName("container")] public PythonContainerDto Container { get; set; } = null!;
     [JsonPropertyName("processed_image_path")] public string ProcessedImagePath { get; set; } = string.Empty;
+    [JsonPropertyName("image_handle")] public string? ImageHandle { get; set; }
+    [JsonPropertyName("processed_image_handle")] public string? ProcessedImageHandle { get; set; }
 }
 
 public class PythonContainerDto
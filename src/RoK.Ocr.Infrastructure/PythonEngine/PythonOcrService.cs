@@ -1,9 +1,14 @@
 using System;
+using System.Buffers.Binary;
+using System.Collections.Concurrent;
 using System.Collections.Generic;
 using System.IO;
 using System.Linq;
+using System.Net;
 using System.Net.Http;
+using System.Net.Http.Headers;
 using System.Net.Http.Json;
+using System.Text.Json;
 using System.Threading.Tasks;
 using Microsoft.Extensions.Logging;
 using RoK.Ocr.Domain.Interfaces;
@@ -17,6 +22,10 @@ public class PythonOcrService : IOcrService
     private readonly HttpClient _httpClient;
     private readonly ILogger<PythonOcrService> _logger;
 
+    // Screenshots the Python engine already decoded ("image_handle"), keyed by local path.
+    // Static because the typed HttpClient service is transient.
+    private static readonly ConcurrentDictionary<string, string> ImageHandles = new();
+
     public PythonOcrService(HttpClient httpClient, ILogger<PythonOcrService> logger)
     {
         _httpClient = httpClient;
@@ -27,20 +36,12 @@ public class PythonOcrService : IOcrService
     {
         try
         {
-            string base64String;
-            if (preLoadedBytes != null && preLoadedBytes.Length > 0)
-            {
-                base64String = Convert.ToBase64String(preLoadedBytes);
-            }
-            else
-            {
-                byte[] fileBytes = await File.ReadAllBytesAsync(imagePath);
-                base64String = Convert.ToBase64String(fileBytes);
-            }
+            byte[] fileBytes = (preLoadedBytes != null && preLoadedBytes.Length > 0)
+                ? preLoadedBytes
+                : await File.ReadAllBytesAsync(imagePath);
 
-            var payload = new { imageBase64 = base64String };
-            // Calls the Generic OCR endpoint
-            var response = await _httpClient.PostAsJsonAsync("governor/analyze", payload);
+            // Calls the Generic OCR endpoint (binary body, no Base64)
+            var response = await _httpClient.PostAsync("governor/analyze/raw", ImageContent(fileBytes));
 
             if (!response.IsSuccessStatusCode)
             {
@@ -54,6 +55,7 @@ public class PythonOcrService : IOcrService
                 _logger.LogWarning("Failed to deserialize Python response or Success is false.");
                 return (new List<OcrBlock>(), string.Empty);
             }
+            RememberHandle(imagePath, result.ImageHandle);
 
             // Map DTO to Domain
             var domainBlocks = result.Blocks.Select(b => new OcrBlock
@@ -77,10 +79,9 @@ public class PythonOcrService : IOcrService
         try
         {
             byte[] fileBytes = await File.ReadAllBytesAsync(imagePath);
-            var payload = new { imageBase64 = Convert.ToBase64String(fileBytes) };
 
-            // Calls the Report OCR endpoint
-            var response = await _httpClient.PostAsJsonAsync("reports/analyze", payload);
+            // Calls the Report OCR endpoint (binary body, no Base64)
+            var response = await _httpClient.PostAsync("reports/analyze/raw", ImageContent(fileBytes));
             if (!response.IsSuccessStatusCode)
             {
                 _logger.LogWarning("Report API returned non-success status code: {StatusCode}", response.StatusCode);
@@ -94,6 +95,12 @@ public class PythonOcrService : IOcrService
                 _logger.LogWarning("Failed to deserialize Report response or Success is false.");
                 return (new(), 0, 0, false, string.Empty);
             }
+            RememberHandle(imagePath, result.ImageHandle);
+            if (!string.IsNullOrEmpty(result.ProcessedImagePath) && !string.IsNullOrEmpty(result.ProcessedImageHandle))
+            {
+                // The processed image is written after the response: Magnifier rescans use its handle instead
+                ImageHandles[result.ProcessedImagePath] = result.ProcessedImageHandle;
+            }
 
             var blocks = result.Blocks.Select(b => new OcrBlock
             {
@@ -119,23 +126,46 @@ public class PythonOcrService : IOcrService
     {
         try
         {
-            // Reads the image from disk ONCE
-            byte[] fileBytes = await File.ReadAllBytesAsync(imagePath);
-            string base64String = Convert.ToBase64String(fileBytes);
+            var regionsPayload = regions.Select(r => new
+            {
+                id = r.Id,
+                box = r.Box, // [x, y, w, h]
+                strategy = r.Strategy
+            }).ToList();
+            string regionsJson = JsonSerializer.Serialize(regionsPayload);
+
+            HttpResponseMessage? response = null;
 
-            var payload = new
+            // Fast path: the engine still holds the decoded screenshot -> no upload, no decode
+            string key = Path.GetFullPath(imagePath);
+            if (!ImageHandles.ContainsKey(key)) key = Path.GetFileName(imagePath); // Processed report images (proc_*)
+            if (ImageHandles.TryGetValue(key, out var handle))
             {
-                imageBase64 = base64String,
-                regions = regions.Select(r => new
+                using var handleForm = new MultipartFormDataContent();
+                handleForm.Add(new StringContent(handle), "imageHandle");
+                handleForm.Add(new StringContent(regionsJson), "regions");
+
+                response = await _httpClient.PostAsync("batch/process/raw", handleForm);
+                if (response.StatusCode == HttpStatusCode.Gone)
                 {
-                    id = r.Id,
-                    box = r.Box, // [x, y, w, h]
-                    strategy = r.Strategy
-                }).ToList()
-            };
+                    // Expired on the engine side: resend the image
+                    ImageHandles.TryRemove(key, out _);
+                    response = null;
+                }
+            }
 
-            // SINGLE POST Request
-            var response = await _httpClient.PostAsJsonAsync("batch/process", payload);
+            if (response == null)
+            {
+                // Reads the image from disk ONCE
+                byte[] fileBytes = await File.ReadAllBytesAsync(imagePath);
+
+                // SINGLE POST Request: image as a binary part + regions as a small JSON part
+                using var form = new MultipartFormDataContent();
+                form.Add(ImageContent(fileBytes), "image", Path.GetFileName(imagePath));
+                form.Add(new StringContent(regionsJson), "regions");
+
+                response = await _httpClient.PostAsync("batch/process/raw", form);
+            }
 
             if (!response.IsSuccessStatusCode) return new List<OcrBlock>();
 
@@ -163,12 +193,9 @@ public class PythonOcrService : IOcrService
         try
         {
             byte[] fileBytes = await File.ReadAllBytesAsync(imagePath);
-            string base64String = Convert.ToBase64String(fileBytes);
-
-            var payload = new { imageBase64 = base64String };
 
-            // Calls the new route /inventory/analyze
-            var response = await _httpClient.PostAsJsonAsync("inventory/analyze", payload);
+            // Calls the new route /inventory/analyze (binary body, no Base64)
+            var response = await _httpClient.PostAsync("inventory/analyze/raw", ImageContent(fileBytes));
 
             if (!response.IsSuccessStatusCode)
             {
@@ -178,14 +205,9 @@ public class PythonOcrService : IOcrService
 
             var result = await response.Content.ReadFromJsonAsync<PythonOcrResponse>();
             if (result == null || !result.Success) return (new List<OcrBlock>(), string.Empty);
+            RememberHandle(imagePath, result.ImageHandle);
 
-            var domainBlocks = result.Blocks.Select(b => new OcrBlock
-            {
-                Text = b.Text,
-                Confidence = b.Confidence,
-                Box = b.Box,
-                DominantColor = b.Color // Mapping
-            }).ToList();
+            var domainBlocks = result.Blocks.Select(ToInventoryBlock).ToList();
 
             return (domainBlocks, result.FullText);
         }
@@ -195,4 +217,115 @@ public class PythonOcrService : IOcrService
             return (new List<OcrBlock>(), string.Empty);
         }
     }
+
+    public async Task<List<(List<OcrBlock> Blocks, string FullText)>> AnalyzeInventorySessionAsync(List<string> imagePaths)
+    {
+        var frames = imagePaths.Select(_ => (Blocks: new List<OcrBlock>(), FullText: string.Empty)).ToList();
+        if (imagePaths.Count == 0) return frames;
+
+        try
+        {
+            // ONE request for the whole scroll session: frames are uploaded as a stream and the engine
+            // answers one NDJSON line per frame while it is still working on the next ones
+            using var request = new HttpRequestMessage(HttpMethod.Post, "inventory/session")
+            {
+                Content = new FrameStreamContent(imagePaths)
+            };
+            using var response = await _httpClient.SendAsync(request, HttpCompletionOption.ResponseHeadersRead);
+
+            if (!response.IsSuccessStatusCode)
+            {
+                _logger.LogWarning("Inventory session returned error: {StatusCode}", response.StatusCode);
+                return frames;
+            }
+
+            using var reader = new StreamReader(await response.Content.ReadAsStreamAsync());
+            string? line;
+            while ((line = await reader.ReadLineAsync()) != null)
+            {
+                if (string.IsNullOrWhiteSpace(line)) continue;
+
+                var result = JsonSerializer.Deserialize<PythonSessionFrame>(line);
+                if (result == null) continue;
+                if (result.Done)
+                {
+                    if (result.Error != null) _logger.LogWarning("Inventory session ended early: {Error}", result.Error);
+                    break;
+                }
+                if (result.Frame is not int index || index < 0 || index >= frames.Count) continue;
+
+                if (!result.Success)
+                {
+                    _logger.LogWarning("Inventory frame {Index} failed: {Error}", index, result.Error);
+                    continue;
+                }
+
+                RememberHandle(imagePaths[index], result.ImageHandle);
+                frames[index] = (result.Blocks.Select(ToInventoryBlock).ToList(), result.FullText);
+            }
+        }
+        catch (Exception ex)
+        {
+            _logger.LogError(ex, "Error in AnalyzeInventorySessionAsync");
+        }
+
+        return frames;
+    }
+
+    private static OcrBlock ToInventoryBlock(PythonBlockDto b) => new OcrBlock
+    {
+        Text = b.Text,
+        Confidence = b.Confidence,
+        Box = b.Box,
+        DominantColor = b.Color // Mapping
+    };
+
+    private static void RememberHandle(string imagePath, string? handle)
+    {
+        if (string.IsNullOrEmpty(handle)) return;
+
+        // Handles expire on the engine after a few minutes: a coarse bound is enough here
+        if (ImageHandles.Count > 1000) ImageHandles.Clear();
+        ImageHandles[Path.GetFullPath(imagePath)] = handle;
+    }
+
+    // Raw image bytes: avoids the +33% Base64 payload and the JSON parse on the Python side
+    private static ByteArrayContent ImageContent(byte[] bytes)
+    {
+        var content = new ByteArrayContent(bytes);
+        content.Headers.ContentType = new MediaTypeHeaderValue("application/octet-stream");
+        return content;
+    }
+
+    // Length-prefixed frames (4-byte big-endian size + image bytes), read from disk one at a time
+    // and sent chunked, so the engine starts on the first frame before the last one is uploaded
+    private sealed class FrameStreamContent : HttpContent
+    {
+        private readonly List<string> _imagePaths;
+
+        public FrameStreamContent(List<string> imagePaths)
+        {
+            _imagePaths = imagePaths;
+            Headers.ContentType = new MediaTypeHeaderValue("application/octet-stream");
+        }
+
+        protected override async Task SerializeToStreamAsync(Stream stream, TransportContext? context)
+        {
+            var prefix = new byte[4];
+            foreach (var path in _imagePaths)
+            {
+                byte[] bytes = await File.ReadAllBytesAsync(path);
+                BinaryPrimitives.WriteUInt32BigEndian(prefix, (uint)bytes.Length);
+                await stream.WriteAsync(prefix);
+                await stream.WriteAsync(bytes);
+                await stream.FlushAsync();
+            }
+        }
+
+        protected override bool TryComputeLength(out long length)
+        {
+            length = 0;
+            return false;
+        }
+    }
 }
\ No newline at end of file